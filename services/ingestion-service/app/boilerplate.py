@@ -0,0 +1,122 @@
+"""Document-level removal of repeated page headers/footers.
+
+Announcements and regulations carry the same letterhead, page number and
+footer on every page. Detected per document over the cleaned page texts,
+before paragraphs are split, so the noise never reaches chunks/embeddings.
+"""
+
+import math
+import re
+from difflib import SequenceMatcher
+from typing import List, Dict, Tuple
+
+from .config import HEADER_SCAN_LINES, HEADER_MIN_PAGE_RATIO, HEADER_FUZZ_RATIO, HEADER_MIN_PAGES
+
+_DIGITS = re.compile(r'[0-9๐-๙]+')  # Arabic + Thai digits
+_NOISE = re.compile(r'[\s\.\-_|:,;/\\()\[\]]+')
+# a line that is only a page number: "3", "- 3 -", "หน้า 3", "Page 3", "3/12", "หน้า 3 จาก 12"
+_PAGE_NO = re.compile(r'^(?:หน้า|หน้าที่|page|p)?#(?:(?:of|จาก)?#)?$')
+
+
+def _line_key(line: str) -> str:
+    """Fold punctuation and spacing so OCR variants collide.
+
+    Digits are folded only on page-number lines: article headings such as
+    'ข้อ 1' / 'ข้อ 2' or 'หมวด 1' must stay distinct keys.
+    """
+    k = _NOISE.sub('', line.lower())
+    folded = _DIGITS.sub('#', k)
+    return folded if _PAGE_NO.match(folded) else k
+
+
+def _edge_lines(text: str, n: int) -> List[Tuple[int, str, str]]:
+    """Return (line_index, position, key) for the first/last n non-empty lines."""
+    lines = text.split('\n')
+    idxs = [i for i, ln in enumerate(lines) if ln.strip()]
+    # short pages: keep the edge zones from swallowing the body
+    n = min(n, max(1, len(idxs) // 3))
+    out = []
+    seen = set()
+    for pos, chosen in (('top', idxs[:n]), ('bottom', idxs[-n:] if n else [])):
+        for i in chosen:
+            if i in seen:
+                continue
+            seen.add(i)
+            key = _line_key(lines[i])
+            if key:
+                out.append((i, pos, key))
+    return out
+
+
+def _similar(a: str, b: str, fuzz: float) -> bool:
+    if a == b:
+        return True
+    # 'ข้อ1' vs 'ข้อ2' is one character apart but a different article
+    if _DIGITS.findall(a) != _DIGITS.findall(b):
+        return False
+    # cheap length bound before the O(n*m) ratio
+    if min(len(a), len(b)) / max(len(a), len(b)) < fuzz:
+        return False
+    sm = SequenceMatcher(None, a, b, autojunk=False)
+    return sm.quick_ratio() >= fuzz and sm.ratio() >= fuzz
+
+
+def find_repeated_lines(pages: List[str],
+                        scan_lines: int = HEADER_SCAN_LINES,
+                        min_ratio: float = HEADER_MIN_PAGE_RATIO,
+                        fuzz: float = HEADER_FUZZ_RATIO) -> Dict[str, List[str]]:
+    """Cluster edge lines across pages; return repeated keys per position."""
+    clusters: Dict[str, List[Tuple[str, set]]] = {'top': [], 'bottom': []}
+    exact: Dict[Tuple[str, str], int] = {}
+    for pno, text in enumerate(pages):
+        for _, pos, key in _edge_lines(text or '', scan_lines):
+            hit = exact.get((pos, key))
+            if hit is None:
+                for ci, (rep, _) in enumerate(clusters[pos]):
+                    if _similar(rep, key, fuzz):
+                        hit = ci
+                        break
+            if hit is None:
+                clusters[pos].append((key, set()))
+                hit = len(clusters[pos]) - 1
+            exact[(pos, key)] = hit
+            clusters[pos][hit][1].add(pno)
+    need = max(2, int(math.ceil(min_ratio * len(pages))))
+    return {pos: [rep for rep, seen in cl if len(seen) >= need] for pos, cl in clusters.items()}
+
+
+def strip_repeated_lines(pages: List[str],
+                         scan_lines: int = HEADER_SCAN_LINES,
+                         min_ratio: float = HEADER_MIN_PAGE_RATIO,
+                         fuzz: float = HEADER_FUZZ_RATIO,
+                         min_pages: int = HEADER_MIN_PAGES) -> Tuple[List[str], Dict]:
+    """Remove recurring header/footer lines from page texts.
+
+    Returns the cleaned pages and a stats dict with removed line count and
+    bytes saved (UTF-8) for the document.
+    """
+    stats = {'pages': len(pages), 'lines_removed': 0, 'bytes_before': 0, 'bytes_after': 0, 'bytes_saved': 0}
+    stats['bytes_before'] = sum(len((p or '').encode('utf-8')) for p in pages)
+    if len(pages) < max(2, min_pages):
+        stats['bytes_after'] = stats['bytes_before']
+        return list(pages), stats
+
+    repeated = find_repeated_lines(pages, scan_lines, min_ratio, fuzz)
+    out: List[str] = []
+    for text in pages:
+        if not text:
+            out.append(text)
+            continue
+        lines = text.split('\n')
+        drop = set()
+        for i, pos, key in _edge_lines(text, scan_lines):
+            if any(_similar(rep, key, fuzz) for rep in repeated[pos]):
+                drop.add(i)
+        if drop:
+            stats['lines_removed'] += len(drop)
+            kept = [ln for i, ln in enumerate(lines) if i not in drop]
+            text = re.sub(r'\n{3,}', '\n\n', '\n'.join(kept)).strip()
+        out.append(text)
+    stats['bytes_after'] = sum(len((p or '').encode('utf-8')) for p in out)
+    stats['bytes_saved'] = stats['bytes_before'] - stats['bytes_after']
+    return out, stats
@@ -1,26 +1,48 @@
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+import hashlib
 import os
-
-import chromadb
-from chromadb.config import Settings
+import threading
 
 from .config import CHROMA_DIR, EMBEDDING_MODEL, EMBED_BATCH, EMBEDDING_API_BASE, EMBEDDING_API_KEY
 
-try:
-    from sentence_transformers import SentenceTransformer
-except Exception:
-    SentenceTransformer = None  # type: ignore
+# chromadb and the embedding model are opened on first use, not at import:
+# --no-embed runs and the review scripts never pay for them.
+_collection = None
+_embedder = None
+_embedder_tried = False
+_load_lock = threading.Lock()
+
 
-_client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(anonymized_telemetry=False))
-_collection = _client.get_or_create_collection(name="documents")
+def _get_collection():
+    global _collection
+    if _collection is None:
+        with _load_lock:
+            if _collection is None:
+                import chromadb
+                from chromadb.config import Settings
+                client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(anonymized_telemetry=False))
+                _collection = client.get_or_create_collection(name="documents")
+    return _collection
 
-_embedder = None
-if SentenceTransformer and EMBEDDING_MODEL and not EMBEDDING_API_BASE:
-    try:
-        _embedder = SentenceTransformer(EMBEDDING_MODEL)
-    except Exception as e:
-        print("Embedding model load failed, will fallback to API if configured:", e)
+
+def _get_embedder():
+    global _embedder, _embedder_tried
+    if _embedder_tried:
+        return _embedder
+    with _load_lock:
+        if not _embedder_tried and EMBEDDING_MODEL and not EMBEDDING_API_BASE:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except Exception:
+                SentenceTransformer = None  # type: ignore
+            if SentenceTransformer is not None:
+                try:
+                    _embedder = SentenceTransformer(EMBEDDING_MODEL)
+                except Exception as e:
+                    print("Embedding model load failed, will fallback to API if configured:", e)
+        _embedder_tried = True
+    return _embedder
 
 
 def _fallback_vec(text: str, dim: int) -> List[float]:
@@ -34,11 +56,25 @@ def _fallback_vec(text: str, dim: int) -> List[float]:
     return out
 
 
-def _embed_texts(texts: List[str]) -> List[List[float]]:
+_HASH_MODEL = 'hash'  # model id of _fallback_vec vectors
+
+
+def embedding_model_id() -> str:
+    """Id of the embedder fresh vectors come from; stored with every vector."""
+    if _get_embedder() is not None:
+        return f"st:{EMBEDDING_MODEL}"
+    if EMBEDDING_API_BASE and EMBEDDING_API_KEY:
+        return f"api:{EMBEDDING_MODEL}"
+    return _HASH_MODEL
+
+
+def _embed_texts(texts: List[str]) -> Tuple[List[List[float]], List[str]]:
+    """Embeddings plus the model id that produced each one (fallback vectors are 'hash')."""
     # Local model
-    if _embedder:
+    embedder = _get_embedder()
+    if embedder:
         try:
-            embs = _embedder.encode(texts, batch_size=EMBED_BATCH, normalize_embeddings=True).tolist()  # type: ignore
+            embs = embedder.encode(texts, batch_size=EMBED_BATCH, normalize_embeddings=True).tolist()  # type: ignore
         except Exception as e:
             print("Local embedding encode failed, falling back to hashing:", e)
             embs = []
@@ -48,11 +84,12 @@ def _embed_texts(texts: List[str]) -> List[List[float]]:
             if dim == 0:
                 embs = []
         if embs:
-            return embs
+            return embs, [f"st:{EMBEDDING_MODEL}"] * len(embs)
     # Remote API
     if EMBEDDING_API_BASE and EMBEDDING_API_KEY:
         import requests
         out: List[List[float]] = []
+        models: List[str] = []
         dim_detected = None
         for t in texts:
             try:
@@ -71,42 +108,129 @@ def _embed_texts(texts: List[str]) -> List[List[float]]:
                 if dim_detected is None:
                     dim_detected = len(vec)
                 out.append(vec)
+                models.append(f"api:{EMBEDDING_MODEL}")
             else:
                 if dim_detected is None:
                     dim_detected = 32
                 out.append(_fallback_vec(t, dim_detected))
-        return out
+                models.append(_HASH_MODEL)
+        return out, models
     # Final deterministic fallback (hash-based) with fixed dim
-    return [_fallback_vec(t, 32) for t in texts]
+    return [_fallback_vec(t, 32) for t in texts], [_HASH_MODEL] * len(texts)
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1((text or '').encode('utf-8', 'ignore')).hexdigest()
+
+
+def cache_key(model: str, text: str) -> str:
+    return f"{model}|{text_key(text)}"
+
 
+def cached_embeddings(page_size: int = 1000) -> Dict[str, List[float]]:
+    """Map cache_key(model, text) -> stored embedding for everything already in the collection.
 
-def upsert_chunks(chunks: List[Dict[str, Any]]):
+    Vectors stored without an 'embed_model' (or with a dim that disagrees
+    with their metadata) are left out, so they are re-encoded.
+    """
+    out: Dict[str, List[float]] = {}
+    offset = 0
+    while True:
+        res = _get_collection().get(include=['documents', 'embeddings', 'metadatas'], limit=page_size, offset=offset)
+        ids = res.get('ids') or []
+        if not ids:
+            break
+        docs = res.get('documents') or []
+        embs = res.get('embeddings')
+        if embs is None:
+            embs = []
+        metas = res.get('metadatas') or [None] * len(ids)
+        for doc, emb, meta in zip(docs, embs, metas):
+            if doc is None or emb is None or not meta or not meta.get('embed_model'):
+                continue
+            if meta.get('embed_dim') != len(emb):
+                continue
+            out[cache_key(meta['embed_model'], doc)] = [float(x) for x in emb]
+        if len(ids) < page_size:
+            break
+        offset += page_size
+    return out
+
+
+def _stored_dim() -> Optional[int]:
+    res = _get_collection().get(include=['embeddings'], limit=1)
+    embs = res.get('embeddings')
+    if embs is None or len(embs) == 0:
+        return None
+    return len(embs[0])
+
+
+def _reset_collection():
+    global _collection
+    import chromadb
+    from chromadb.config import Settings
+    with _load_lock:
+        client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(anonymized_telemetry=False))
+        client.delete_collection(name="documents")
+        _collection = client.get_or_create_collection(name="documents")
+
+
+def _chunk_id(c: Dict[str, Any], i: int) -> str:
+    return c.get('doc_id') or f"{c.get('source','')}-{i}"
+
+
+def upsert_chunks(chunks: List[Dict[str, Any]], cache: Optional[Dict[str, List[float]]] = None,
+                  rebuild: bool = False):
+    """Embed and upsert chunks; `cache` (from cached_embeddings) supplies vectors of unchanged texts.
+
+    A cached vector is only reused if it came from the current embedding
+    model. With rebuild=True a collection holding vectors of another
+    dimension is dropped and recreated; otherwise such an upsert is refused.
+    """
     if not chunks:
         print("No chunks to embed; skipping upsert.")
         return
     texts = [c.get('text','') for c in chunks]
-    embeddings = _embed_texts(texts)
+    ids = [_chunk_id(c, i) for i, c in enumerate(chunks)]
+    cache = cache or {}
+    model = embedding_model_id()
+    keys = [cache_key(model, t) for t in texts]
+    missing = [i for i, k in enumerate(keys) if k not in cache]
+    embeddings: List[List[float]] = [cache.get(k, []) for k in keys]
+    models: List[str] = [model] * len(texts)
+    if missing:
+        fresh, fresh_models = _embed_texts([texts[i] for i in missing])
+        for i, e, m in zip(missing, fresh, fresh_models):
+            embeddings[i], models[i] = e, m
+    reused = len(texts) - len(missing)
     if not embeddings or any(len(e) == 0 for e in embeddings):
         print("Embeddings empty after fallback; skipping upsert to avoid error.")
         return
-    # enforce consistent dimension
-    dim = len(embeddings[0])
-    fixed = []
-    for e in embeddings:
-        if len(e) != dim:
-            # resize by truncating or padding with mean value
-            if len(e) > dim:
-                e = e[:dim]
-            else:
-                meanv = sum(e) / (len(e) or 1)
-                e = e + [meanv] * (dim - len(e))
-        fixed.append(e)
-    ids: List[str] = []
+    # vectors of another dimension (e.g. hash fallback after an API error) are re-encoded once, never resized
+    dim = max(set(len(e) for e in embeddings), key=lambda d: sum(1 for e in embeddings if len(e) == d))
+    odd = [i for i, e in enumerate(embeddings) if len(e) != dim]
+    if odd:
+        retry, retry_models = _embed_texts([texts[i] for i in odd])
+        for i, e, m in zip(odd, retry, retry_models):
+            embeddings[i], models[i] = e, m
+        dropped = {i for i in odd if len(embeddings[i]) != dim}
+        if dropped:
+            print(f"Skipping {len(dropped)} chunk(s) whose embedding dimension is not {dim}.")
+            chunks = [c for i, c in enumerate(chunks) if i not in dropped]
+            ids = [d for i, d in enumerate(ids) if i not in dropped]
+            embeddings = [e for i, e in enumerate(embeddings) if i not in dropped]
+            models = [m for i, m in enumerate(models) if i not in dropped]
+    stored = _stored_dim()
+    if stored is not None and stored != dim:
+        if not rebuild:
+            print(f"Chroma holds {stored}-dim vectors but the embedder gives {dim}; "
+                  f"run --rechunk to rebuild the collection. Skipping upsert.")
+            return
+        print(f"Embedding dimension changed ({stored} -> {dim}); recreating the Chroma collection.")
+        _reset_collection()
     metadatas: List[Dict[str, Any]] = []
     documents: List[str] = []
     for i, c in enumerate(chunks):
-        cid = f"{c.get('doc_id') or c.get('source','')}-{i}"
-        ids.append(cid)
         metadatas.append({
             'source': c.get('source'),
             'path': c.get('path'),
@@ -114,14 +238,46 @@ def upsert_chunks(chunks: List[Dict[str, Any]]):
             'page_end': c.get('page_end'),
             'file_type': c.get('file_type'),
             'status': c.get('status'),
+            # filterable from rag-service (RagFilter -> Chroma where)
+            'owner': c.get('owner'),
+            'sensitivity': c.get('sensitivity'),
+            'updated_at': c.get('updated_at'),
+            # which embedder produced the vector, so a model change is never served from cache
+            'embed_model': models[i],
+            'embed_dim': dim,
         })
         documents.append(c.get('text',''))
-    _collection.upsert(ids=ids, embeddings=fixed, documents=documents, metadatas=metadatas)  # type: ignore[arg-type]
-    print(f"Upserted {len(ids)} chunks into Chroma (dim={dim}).")
+    _get_collection().upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)  # type: ignore[arg-type]
+    print(f"Upserted {len(ids)} chunks into Chroma (model={model}, dim={dim}, reused={reused} cached embeddings).")
+
+
+def delete_chunks(ids: Iterable[str]):
+    ids = [i for i in ids if i]
+    if ids:
+        _get_collection().delete(ids=ids)
+
+
+def prune_collection(keep_ids: Iterable[str], page_size: int = 1000) -> int:
+    """Delete every vector whose id is not in keep_ids; returns deleted count."""
+    keep = set(keep_ids)
+    stale: List[str] = []
+    offset = 0
+    while True:
+        res = _get_collection().get(include=[], limit=page_size, offset=offset)
+        ids = res.get('ids') or []
+        stale.extend(i for i in ids if i not in keep)
+        if len(ids) < page_size:
+            break
+        offset += page_size
+    for i in range(0, len(stale), page_size):
+        _get_collection().delete(ids=stale[i:i + page_size])
+    if stale:
+        print(f"Pruned {len(stale)} stale vectors from Chroma.")
+    return len(stale)
 
 
 def semantic_search(query: str, n_results: int = 10) -> List[Dict[str, Any]]:
-    res = _collection.query(query_texts=[query], n_results=n_results)
+    res = _get_collection().query(query_texts=[query], n_results=n_results)
     ids_list = res.get('ids') or [[]]
     docs_list = res.get('documents') or [[]]
     meta_list = res.get('metadatas') or [[]]
@@ -1,6 +1,6 @@
 import math, time, re
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable
 
 from .config import CHUNK_MIN_TOKENS, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_RATIO, CHAR_PER_TOKEN
 from .utils import split_paragraphs_smart
@@ -43,7 +43,7 @@ def group_bullets(paragraphs: List[Dict]) -> List[Dict]:
     return grouped
 
 
-def paragraphs_from_records(records: List[Dict]) -> List[Dict]:
+def paragraphs_from_records(records: Iterable[Dict]) -> List[Dict]:
     out = []
     for r in records:
         page_raw = r.get('page_no')
@@ -15,6 +15,8 @@ TEXT_DIR = DATA_DIR / 'text'
 DB_DIR = DATA_DIR / 'db'
 CHROMA_DIR = DATA_DIR / 'chroma'
 SQLITE_PATH = DB_DIR / 'ingestion.db'
+# bumped after every successful store/embed; rag-service drops cached results on change
+INDEX_VERSION_PATH = DB_DIR / 'index_version'
 
 # Environment overrides
 OCR_LANG_DEFAULT = os.getenv('OCR_LANG', 'tha')  # "tha" or "tha+eng"
@@ -26,6 +28,13 @@ CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '800'))
 CHUNK_OVERLAP_RATIO = float(os.getenv('CHUNK_OVERLAP_RATIO', '0.12'))
 CHAR_PER_TOKEN = float(os.getenv('CHAR_PER_TOKEN', '4.0'))
 
+# Repeated header/footer stripping (document-level, before paragraph split)
+HEADER_STRIP_ENABLE = os.getenv('HEADER_STRIP_ENABLE', 'true').lower() in ('1','true','yes')
+HEADER_SCAN_LINES = int(os.getenv('HEADER_SCAN_LINES', '3'))  # lines checked at top/bottom of each page
+HEADER_MIN_PAGE_RATIO = float(os.getenv('HEADER_MIN_PAGE_RATIO', '0.6'))  # share of pages a line must recur on
+HEADER_FUZZ_RATIO = float(os.getenv('HEADER_FUZZ_RATIO', '0.85'))  # similarity to count as the same line
+HEADER_MIN_PAGES = int(os.getenv('HEADER_MIN_PAGES', '3'))
+
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'BAAI/bge-m3')
 EMBED_BATCH = int(os.getenv('EMBED_BATCH', '32'))
 
@@ -1,8 +1,11 @@
+import json
+import os
 import sqlite3
+import time
 from pathlib import Path
-from typing import Iterable, Dict, Any, List
+from typing import Iterable, Dict, Any, List, Iterator, Optional
 
-from .config import SQLITE_PATH
+from .config import SQLITE_PATH, INDEX_VERSION_PATH
 
 # New schema: explicit chunk metadata + separate FTS table + OCR quality log
 SCHEMA = """
@@ -37,8 +40,39 @@ CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
   content,
   doc_id UNINDEXED
 );
+
+CREATE TABLE IF NOT EXISTS review_queue (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  doc_id TEXT UNIQUE,
+  run_id TEXT,
+  source TEXT,
+  path TEXT,
+  page_start INTEGER,
+  page_end INTEGER,
+  chunk_id INTEGER,
+  engine TEXT,
+  quality_score REAL,
+  status TEXT NOT NULL DEFAULT 'pending',
+  text TEXT,
+  created_at INTEGER,
+  updated_at INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_review_status ON review_queue(status, path, page_start);
+
+CREATE INDEX IF NOT EXISTS idx_review_run ON review_queue(run_id);
+
+CREATE INDEX IF NOT EXISTS idx_review_engine ON review_queue(engine);
+
+-- filtered keyword search probes documents by doc_id (the UNIQUE index) per FTS hit;
+-- the former filter/sensitivity indexes were never chosen by the planner
+DROP INDEX IF EXISTS idx_documents_filter;
+
+DROP INDEX IF EXISTS idx_documents_sensitivity
 """
 
+REVIEW_STATUSES = ('pending', 'reprocessed', 'accepted')
+
 
 def get_conn():
   SQLITE_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -81,6 +115,132 @@ def insert_chunks(chunks: Iterable[Dict[str, Any]]):
   conn.close()
 
 
+def replace_chunks(chunks: Iterable[Dict[str, Any]], drop_doc_ids: Iterable[str] = ()):
+  """Overwrite chunks in place by doc_id (documents + FTS) and drop obsolete ids."""
+  conn = get_conn()
+  cur = conn.cursor()
+  for c in chunks:
+    cur.execute("DELETE FROM docs_fts WHERE doc_id = ?", (c.get('doc_id'),))
+    cur.execute(
+      """
+      INSERT OR REPLACE INTO documents(doc_id,source,path,file_type,page_start,page_end,chunk_id,owner,sensitivity,updated_at,tokens_est,text)
+      VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+      """,
+      (
+        c.get('doc_id'), c.get('source'), c.get('path'), c.get('file_type'),
+        c.get('page_start'), c.get('page_end'), c.get('chunk_id'), c.get('owner'),
+        c.get('sensitivity'), c.get('updated_at'), c.get('tokens_est'), c.get('text')
+      )
+    )
+    cur.execute(
+      "INSERT INTO docs_fts(content, doc_id) VALUES (?,?)",
+      (c.get('text'), c.get('doc_id'))
+    )
+  for d in drop_doc_ids:
+    cur.execute("DELETE FROM documents WHERE doc_id = ?", (d,))
+    cur.execute("DELETE FROM docs_fts WHERE doc_id = ?", (d,))
+  conn.commit()
+  conn.close()
+
+
+def chunks_for_path(path: str) -> List[Dict[str, Any]]:
+  """Stored chunks of one source file in chunk order."""
+  conn = get_conn()
+  try:
+    cur = conn.execute(
+      "SELECT doc_id, path, page_start, page_end, chunk_id, text FROM documents WHERE path = ? ORDER BY chunk_id",
+      (path,)
+    )
+    cols = [c[0] for c in cur.description]
+    return [dict(zip(cols, row)) for row in cur.fetchall()]
+  finally:
+    conn.close()
+
+
+def reset_documents() -> List[tuple]:
+  """Drop all chunk rows (documents + FTS) ahead of a full rebuild.
+
+  Returns the old (doc_id, path, page_start, page_end) layout so review queue
+  and OCR quality rows, which are keyed by doc_id, can be moved onto the
+  rebuilt chunks with remap_doc_ids().
+  """
+  conn = get_conn()
+  cur = conn.cursor()
+  layout = cur.execute("SELECT doc_id, path, page_start, page_end FROM documents").fetchall()
+  cur.execute("DELETE FROM documents")
+  cur.execute("DELETE FROM docs_fts")
+  conn.commit()
+  conn.close()
+  return layout
+
+
+_STATUS_RANK = {s: i for i, s in enumerate(REVIEW_STATUSES)}
+
+
+def remap_doc_ids(layout: Iterable[tuple]) -> Dict[str, int]:
+  """Point review_queue/ocr_quality rows of the old layout at the rebuilt chunks.
+
+  An old doc_id maps to the new chunk with the same (path, page_start,
+  page_end), else to the first chunk of that path covering its page_start.
+  Rows whose pages no longer exist are dropped; rows of ids that were not in
+  the old layout are left alone.
+  """
+  conn = get_conn()
+  cur = conn.cursor()
+  remap: Dict[str, Optional[tuple]] = {}
+  for doc_id, path, page_start, page_end in layout:
+    row = cur.execute(
+      "SELECT doc_id, page_start, page_end, chunk_id FROM documents WHERE path = ? AND page_start = ? AND page_end = ? "
+      "ORDER BY chunk_id LIMIT 1", (path, page_start, page_end)).fetchone()
+    if row is None:
+      row = cur.execute(
+        "SELECT doc_id, page_start, page_end, chunk_id FROM documents WHERE path = ? AND page_start <= ? AND page_end >= ? "
+        "ORDER BY chunk_id LIMIT 1", (path, page_start, page_start)).fetchone()
+    remap[doc_id] = row
+
+  # review_queue.doc_id is UNIQUE and old/new ids overlap, so move rows by
+  # delete + re-insert; when several old rows land on one chunk the most
+  # advanced status (then the latest update) wins
+  cols = ['doc_id', 'run_id', 'source', 'path', 'page_start', 'page_end', 'chunk_id', 'engine',
+          'quality_score', 'status', 'text', 'created_at', 'updated_at']
+  moved: Dict[str, Dict[str, Any]] = {}
+  dropped = 0
+  ids = list(remap)
+  for i in range(0, len(ids), 500):
+    part = ids[i:i + 500]
+    marks = ','.join('?' for _ in part)
+    rows = cur.execute(f"SELECT {','.join(cols)} FROM review_queue WHERE doc_id IN ({marks})", part).fetchall()
+    cur.execute(f"DELETE FROM review_queue WHERE doc_id IN ({marks})", part)
+    for row in rows:
+      r = dict(zip(cols, row))
+      target = remap[r['doc_id']]
+      if target is None:
+        dropped += 1
+        continue
+      r['doc_id'], r['page_start'], r['page_end'], r['chunk_id'] = target
+      prev = moved.get(r['doc_id'])
+      if prev is None or (_STATUS_RANK.get(r['status'], 0), r['updated_at'] or 0) > \
+              (_STATUS_RANK.get(prev['status'], 0), prev['updated_at'] or 0):
+        moved[r['doc_id']] = r
+  cur.executemany(
+    f"INSERT OR REPLACE INTO review_queue({','.join(cols)}) VALUES ({','.join('?' for _ in cols)})",
+    [tuple(r[c] for c in cols) for r in moved.values()]
+  )
+
+  # ocr_quality has no unique key: one UPDATE through a temp map avoids chained remaps
+  cur.execute("CREATE TEMP TABLE doc_remap (old TEXT PRIMARY KEY, new TEXT)")
+  cur.executemany("INSERT INTO doc_remap(old, new) VALUES (?, ?)",
+                  [(old, t[0] if t else None) for old, t in remap.items()])
+  cur.execute("DELETE FROM ocr_quality WHERE doc_id IN (SELECT old FROM doc_remap WHERE new IS NULL)")
+  cur.execute("""
+    UPDATE ocr_quality SET doc_id = (SELECT new FROM doc_remap WHERE old = ocr_quality.doc_id)
+    WHERE doc_id IN (SELECT old FROM doc_remap)
+  """)
+  conn.commit()
+  conn.close()
+  return {'review_kept': len(moved), 'review_dropped': dropped}
+
+
 def log_ocr_quality(entries: Iterable[Dict[str, Any]]):
   conn = get_conn()
   cur = conn.cursor()
@@ -116,3 +276,135 @@ def keyword_search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
   out = [dict(zip(cols, row)) for row in cur.fetchall()]
   conn.close()
   return out
+
+
+def enqueue_review(chunks: Iterable[Dict[str, Any]], run_id: str, engine: str = 'auto',
+                   keep_status: bool = False) -> int:
+  """Add flagged chunks to the review queue; re-flagged doc_ids go back to pending.
+
+  keep_status leaves the status of existing rows as is (a rebuild re-flags
+  chunks that were already reviewed).
+  """
+  from .quality import ocr_quality_score
+  now = int(time.time())
+  rows = [(
+    c.get('doc_id'), run_id, c.get('source'), c.get('path'), c.get('page_start'), c.get('page_end'),
+    c.get('chunk_id'), engine, ocr_quality_score(c.get('text') or ''), c.get('text'), now, now
+  ) for c in chunks]
+  if not rows:
+    return 0
+  conn = get_conn()
+  conn.executemany("""
+    INSERT INTO review_queue(doc_id,run_id,source,path,page_start,page_end,chunk_id,engine,quality_score,status,text,created_at,updated_at)
+    VALUES (?,?,?,?,?,?,?,?,?,'pending',?,?,?)
+    ON CONFLICT(doc_id) DO UPDATE SET
+      run_id=excluded.run_id, source=excluded.source, path=excluded.path,
+      page_start=excluded.page_start, page_end=excluded.page_end, chunk_id=excluded.chunk_id,
+      engine=excluded.engine, quality_score=excluded.quality_score,
+      status=CASE WHEN ? THEN review_queue.status ELSE 'pending' END,
+      text=excluded.text, updated_at=excluded.updated_at
+  """, [r + (int(keep_status),) for r in rows])
+  conn.commit()
+  conn.close()
+  return len(rows)
+
+
+def import_review_jsonl(review_file: str) -> int:
+  """Load a legacy data/db/review/flagged_<ts>.jsonl file into the queue."""
+  run_id = Path(review_file).stem.replace('flagged_', '')
+  with open(review_file, 'r', encoding='utf-8') as f:
+    chunks = [json.loads(line) for line in f if line.strip()]
+  return enqueue_review(chunks, run_id)
+
+
+def _review_where(status: Optional[str] = None, run_id: Optional[str] = None, live_only: bool = False):
+  clauses, params = [], []
+  if live_only:
+    clauses.append("doc_id IN (SELECT doc_id FROM documents)")
+  if status:
+    clauses.append("status = ?")
+    params.append(status)
+  if run_id:
+    clauses.append("run_id = ?")
+    params.append(run_id)
+  return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def iter_review(status: Optional[str] = 'pending', run_id: Optional[str] = None,
+                batch: int = 500, live_only: bool = False) -> Iterator[Dict[str, Any]]:
+  """Stream queue rows without loading the whole queue into memory.
+
+  live_only skips rows whose doc_id is no longer in `documents` (e.g. queued
+  before a rebuild), so they are not written back as chunks.
+  """
+  where, params = _review_where(status, run_id, live_only)
+  conn = get_conn()
+  try:
+    cur = conn.execute(
+      "SELECT doc_id, run_id, source, path, page_start, page_end, chunk_id, engine, quality_score, status, text "
+      f"FROM review_queue{where} ORDER BY path, page_start, chunk_id", params
+    )
+    cols = [c[0] for c in cur.description]
+    while True:
+      rows = cur.fetchmany(batch)
+      if not rows:
+        break
+      for row in rows:
+        yield dict(zip(cols, row))
+  finally:
+    conn.close()
+
+
+def review_summary(status: Optional[str] = None, run_id: Optional[str] = None, top: int = 10) -> Dict[str, Any]:
+  """Aggregate queue statistics with SQL (no row materialisation)."""
+  where, params = _review_where(status, run_id)
+  conn = get_conn()
+  cur = conn.cursor()
+  out: Dict[str, Any] = {}
+  out['by_status'] = dict(cur.execute(
+    f"SELECT status, COUNT(*) FROM review_queue{where} GROUP BY status", params).fetchall())
+  out['by_engine'] = dict(cur.execute(
+    f"SELECT engine, COUNT(*) FROM review_queue{where} GROUP BY engine", params).fetchall())
+  out['runs'] = cur.execute(
+    f"SELECT COUNT(DISTINCT run_id) FROM review_queue{where}", params).fetchone()[0]
+  out['files'] = cur.execute(
+    f"SELECT COUNT(DISTINCT path) FROM review_queue{where}", params).fetchone()[0]
+  out['top_files'] = cur.execute(
+    f"SELECT path, COUNT(*) AS n FROM review_queue{where} GROUP BY path ORDER BY n DESC LIMIT ?",
+    params + [top]).fetchall()
+  row = cur.execute(
+    "SELECT COUNT(*), MIN(LENGTH(text)), MAX(LENGTH(text)), AVG(LENGTH(text)), "
+    "SUM(CASE WHEN text IS NULL OR text = '' THEN 1 ELSE 0 END), AVG(quality_score) "
+    f"FROM review_queue{where}", params).fetchone()
+  out.update(dict(zip(['total', 'len_min', 'len_max', 'len_avg', 'empty', 'quality_avg'], row)))
+  conn.close()
+  return out
+
+
+def set_review_status(doc_ids: Iterable[str], status: str, engine: Optional[str] = None,
+                      quality_score: Optional[float] = None) -> int:
+  """Move queue entries to pending/reprocessed/accepted."""
+  if status not in REVIEW_STATUSES:
+    raise ValueError(f"unknown review status {status!r}; expected one of {REVIEW_STATUSES}")
+  now = int(time.time())
+  rows = [(status, engine, quality_score, now, d) for d in doc_ids]
+  conn = get_conn()
+  cur = conn.executemany("""
+    UPDATE review_queue
+    SET status = ?, engine = COALESCE(?, engine), quality_score = COALESCE(?, quality_score), updated_at = ?
+    WHERE doc_id = ?
+  """, rows)
+  conn.commit()
+  n = cur.rowcount
+  conn.close()
+  return n
+
+
+def bump_index_version() -> str:
+  """Write a new index version (atomic replace) so query-side caches invalidate."""
+  version = str(time.time_ns())
+  INDEX_VERSION_PATH.parent.mkdir(parents=True, exist_ok=True)
+  tmp = INDEX_VERSION_PATH.with_name(INDEX_VERSION_PATH.name + '.tmp')
+  tmp.write_text(version, encoding='utf-8')
+  os.replace(tmp, INDEX_VERSION_PATH)
+  return version
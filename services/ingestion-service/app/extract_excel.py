@@ -1,11 +1,13 @@
 from pathlib import Path
-from typing import List
-import pandas as pd
+from typing import List, TYPE_CHECKING
 
 from .utils import clean_for_index
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-def _df_to_sheet_text(df: pd.DataFrame) -> str:
+
+def _df_to_sheet_text(df: 'pd.DataFrame') -> str:
     if df is None or df.empty:
         return ''
     df = df.fillna('')
@@ -17,6 +19,7 @@ def _df_to_sheet_text(df: pd.DataFrame) -> str:
 
 def extract_excel_to_records(xl_path: str) -> List[dict]:
     """Return list of records similar to page records for chunking."""
+    import pandas as pd
     p = Path(xl_path)
     records = []
     try:
@@ -1,20 +1,22 @@
 from typing import List, Optional
 from difflib import SequenceMatcher
-import fitz  # PyMuPDF
-from pdf2image import convert_from_path
-import pytesseract
 
 from .config import POPPLER_PATH, TESSERACT_PATH, OCR_LANG_DEFAULT, OCR_DPI, TY_OCR_ENABLE
 from .validation import text_quality_score
 from .utils import choose_ocr_lang_for_text, clean_for_index
 from .typhoon_ocr import ocr_pdf_typhoon_pages, ocr_pdf_typhoon_full
 
-# Set Tesseract path if configured
-if TESSERACT_PATH:
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+
+def load_tesseract():
+    """pytesseract, imported on first OCR use and pointed at TESSERACT_PATH if configured."""
+    import pytesseract
+    if TESSERACT_PATH:
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+    return pytesseract
 
 
 def extract_text_mupdf(pdf_path: str) -> str:
+    import fitz  # PyMuPDF
     texts: List[str] = []
     with fitz.open(str(pdf_path)) as doc:
         for page in doc:
@@ -29,25 +31,33 @@ def extract_text_mupdf(pdf_path: str) -> str:
 
 
 def ocr_page_images(pdf_path: str, page_index: int, dpi: int = OCR_DPI, lang: str = 'tha+eng') -> str:
+    from pdf2image import convert_from_path
     kwargs = {}
     if POPPLER_PATH:
         kwargs['poppler_path'] = POPPLER_PATH
     images = convert_from_path(pdf_path, dpi=dpi, first_page=page_index + 1, last_page=page_index + 1, **kwargs)
     if not images:
         return ''
-    return pytesseract.image_to_string(images[0], lang=lang) or ''
+    return load_tesseract().image_to_string(images[0], lang=lang) or ''
 
 
 def extract_pages_with_fallback(pdf_path: str,
                                 min_length: int = 50,
                                 min_score: float = 0.2,
-                                dynamic_lang: bool = True) -> List[str]:
+                                dynamic_lang: bool = True,
+                                page_indices: Optional[List[int]] = None) -> List[str]:
     """Return list of cleaned page texts with OCR fallback.
     Priority: MuPDF -> Typhoon OCR (if enabled) -> Tesseract.
+    With page_indices (0-based) only those pages are read/OCR'd, in that order.
     """
+    import fitz  # PyMuPDF
     raw_pages: List[str] = []
     with fitz.open(pdf_path) as doc:
-        for p in range(doc.page_count):
+        if page_indices is None:
+            indices = list(range(doc.page_count))
+        else:
+            indices = [i for i in page_indices if 0 <= i < doc.page_count]
+        for p in indices:
             try:
                 txt = doc.load_page(p).get_text('text') or ''
             except Exception:
@@ -61,7 +71,7 @@ def extract_pages_with_fallback(pdf_path: str,
 
     cleaned_pages: List[str] = []
     need_indices = []
-    for idx, txt in enumerate(raw_pages):
+    for idx, txt in zip(indices, raw_pages):
         score = text_quality_score(txt)
         decide = (not txt.strip()) or (len(txt.strip()) < min_length) or (score < min_score)
         if decide:
@@ -69,7 +79,7 @@ def extract_pages_with_fallback(pdf_path: str,
     typhoon_results = {}
     if TY_OCR_ENABLE and need_indices:
         typhoon_results = ocr_pdf_typhoon_pages(pdf_path, need_indices)
-    for idx, txt in enumerate(raw_pages):
+    for idx, txt in zip(indices, raw_pages):
         score = text_quality_score(txt)
         decide = (not txt.strip()) or (len(txt.strip()) < min_length) or (score < min_score)
         if decide:
@@ -113,9 +123,11 @@ def extract_pdf_full(pdf_path: str) -> str:
         ty_full = ocr_pdf_typhoon_full(pdf_path, strip_md=True)
         if ty_full.strip():
             return clean_for_index(ty_full)
+    from pdf2image import convert_from_path
     kwargs = {}
     if POPPLER_PATH:
         kwargs['poppler_path'] = POPPLER_PATH
     images = convert_from_path(pdf_path, dpi=OCR_DPI, **kwargs)
-    texts = [pytesseract.image_to_string(img, lang=OCR_LANG_DEFAULT) for img in images]
+    tesseract = load_tesseract()
+    texts = [tesseract.image_to_string(img, lang=OCR_LANG_DEFAULT) for img in images]
     return clean_for_index('\n'.join(texts))
@@ -1,14 +1,15 @@
 import argparse
 import json
 import hashlib
+from itertools import groupby
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Tuple
 from datetime import datetime
 
-from .ocr_pipeline import ingest_pdf, ingest_excel, write_jsonl
+from .ocr_pipeline import ingest_pdf, ingest_excel, write_jsonl, read_jsonl
 from .chunking import paragraphs_from_records, make_chunks
-from .db import init_db, insert_chunks, log_ocr_quality
-from .chroma_client import upsert_chunks
+from .db import init_db, insert_chunks, log_ocr_quality, reset_documents, remap_doc_ids, enqueue_review, bump_index_version
+from .chroma_client import upsert_chunks, cached_embeddings, prune_collection
 from .quality import is_valid_ocr, make_quality_entry
 from .config import EMBED_FLAGGED
 
@@ -35,23 +36,22 @@ def _gen_doc_id(path: str, page: int, chunk_id: int) -> str:
     return hashlib.sha1(basis.encode('utf-8', 'ignore')).hexdigest()[:32]
 
 
-def run_ingest(input_dir: str, jsonl_out: str, chunk_out: str, store: bool = True, embed: bool = True):
-    files = gather_files(input_dir)
-    all_records: List[dict] = []
-    quality_entries: List[Dict] = []
+def chunk_records(records: Iterable[dict]) -> List[Dict]:
+    """Chunk records document by document so each chunk keeps its own file path.
 
-    # ingest raw pages/sheets
-    for f in files:
-        recs = process_file(f)
-        all_records.extend(recs)
-    write_jsonl(all_records, jsonl_out)
+    Records are written grouped per source file, so this streams: only one
+    document's paragraphs are held at a time.
+    """
+    chunks: List[Dict] = []
+    for source, recs in groupby(records, key=lambda r: r.get('source', '')):
+        chunks.extend(make_chunks(paragraphs_from_records(recs), source_path=source))
+    return chunks
 
-    # build paragraphs then chunks
-    paragraphs = paragraphs_from_records(all_records)
-    raw_chunks = make_chunks(paragraphs, source_path=input_dir)
 
-    # enrich chunks with doc_id + file_type + chunk_id and quality status (page-level)
+def enrich_chunks(raw_chunks: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Attach doc_id + file_type + chunk_id and quality status (page-level)."""
     enriched_chunks: List[Dict] = []
+    quality_entries: List[Dict] = []
     for idx, ch in enumerate(raw_chunks):
         # ensure page integer
         page_raw = ch.get('page_start')
@@ -65,42 +65,99 @@ def run_ingest(input_dir: str, jsonl_out: str, chunk_out: str, store: bool = Tru
         quality_entries.append(make_quality_entry(doc_id, page, ch.get('text',''), 'auto', status))
         ch.update({'doc_id': doc_id, 'file_type': file_type, 'chunk_id': idx, 'status': status})
         enriched_chunks.append(ch)
+    return enriched_chunks, quality_entries
 
-    write_jsonl(enriched_chunks, chunk_out)
 
+def _store_and_embed(enriched_chunks: List[Dict], quality_entries: List[Dict],
+                     store: bool, embed: bool, rebuild: bool = False) -> Tuple[int, int]:
+    """Persist chunks to SQLite/Chroma; with rebuild=True existing rows/vectors are replaced."""
     if store:
         init_db()
+        layout = reset_documents() if rebuild else None
         insert_chunks(enriched_chunks)
+        if layout:
+            # review decisions and OCR history follow their pages onto the new doc_ids
+            moved = remap_doc_ids(layout)
+            print(f"Review queue: kept {moved['review_kept']} row(s), dropped {moved['review_dropped']} for pages that no longer exist")
         log_ocr_quality(quality_entries)
-    # Prepare review file for flagged chunks when not embedding them
+    # Queue flagged chunks for review when not embedding them
     flagged_chunks = [c for c in enriched_chunks if c.get('status') == 'flagged']
     embed_candidates = enriched_chunks if EMBED_FLAGGED else [c for c in enriched_chunks if c.get('status') != 'flagged']
 
     if flagged_chunks and not EMBED_FLAGGED:
-        review_dir = Path('data/db/review')
-        review_dir.mkdir(parents=True, exist_ok=True)
-        review_path = review_dir / f"flagged_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.jsonl"
-        with review_path.open('w', encoding='utf-8') as rf:
-            for c in flagged_chunks:
-                rf.write(json.dumps(c, ensure_ascii=False) + '\n')
-        print(f"Wrote flagged review file: {review_path}")
+        run_id = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        if store:
+            n = enqueue_review(flagged_chunks, run_id, keep_status=rebuild)
+            print(f"Queued {n} flagged chunk(s) for review (run {run_id}) in review_queue")
+        else:
+            # no database in this run: fall back to a review file
+            review_dir = Path('data/db/review')
+            review_dir.mkdir(parents=True, exist_ok=True)
+            review_path = review_dir / f"flagged_{run_id}.jsonl"
+            with review_path.open('w', encoding='utf-8') as rf:
+                for c in flagged_chunks:
+                    rf.write(json.dumps(c, ensure_ascii=False) + '\n')
+            print(f"Wrote flagged review file: {review_path}")
 
     if embed:
-        upsert_chunks(embed_candidates)
+        if rebuild:
+            # unchanged chunk texts keep their vectors; only new/changed texts are encoded
+            cache = cached_embeddings()
+            upsert_chunks(embed_candidates, cache=cache, rebuild=True)
+            prune_collection(c['doc_id'] for c in embed_candidates)
+        else:
+            upsert_chunks(embed_candidates)
 
-    flagged = len(flagged_chunks)
-    embedded = len(embed_candidates) if embed else 0
+    if store or embed:
+        bump_index_version()
+    return len(flagged_chunks), (len(embed_candidates) if embed else 0)
+
+
+def run_ingest(input_dir: str, jsonl_out: str, chunk_out: str, store: bool = True, embed: bool = True):
+    files = gather_files(input_dir)
+    all_records: List[dict] = []
+
+    # ingest raw pages/sheets
+    for f in files:
+        recs = process_file(f)
+        all_records.extend(recs)
+    write_jsonl(all_records, jsonl_out)
+
+    # build paragraphs then chunks
+    enriched_chunks, quality_entries = enrich_chunks(chunk_records(all_records))
+    write_jsonl(enriched_chunks, chunk_out)
+
+    flagged, embedded = _store_and_embed(enriched_chunks, quality_entries, store, embed)
     print(f"Ingested {len(files)} file(s), {len(all_records)} page/sheet records, {len(enriched_chunks)} chunks (flagged={flagged}, embedded={embedded}).")
 
 
+def run_rechunk(jsonl_in: str, chunk_out: str, store: bool = True, embed: bool = True):
+    """Rebuild chunks + indexes from an existing records JSONL (no extraction/OCR)."""
+    if not Path(jsonl_in).exists():
+        print(f"Records file not found: {jsonl_in}")
+        return
+    enriched_chunks, quality_entries = enrich_chunks(chunk_records(read_jsonl(jsonl_in)))
+    write_jsonl(enriched_chunks, chunk_out)
+
+    flagged, embedded = _store_and_embed(enriched_chunks, quality_entries, store, embed, rebuild=True)
+    print(f"Re-chunked {jsonl_in}: {len(enriched_chunks)} chunks (flagged={flagged}, embedded={embedded}).")
+
+
 def cli():
     p = argparse.ArgumentParser(description='Ingestion Service CLI')
-    p.add_argument('--input', required=True, help='Input directory containing PDF/Excel files')
+    p.add_argument('--input', help='Input directory containing PDF/Excel files')
     p.add_argument('--records-jsonl', default='data/db/records.jsonl')
     p.add_argument('--chunks-jsonl', default='data/db/chunks.jsonl')
+    p.add_argument('--rechunk', action='store_true',
+                   help='Skip extraction; rebuild chunks/SQLite/Chroma from --records-jsonl')
     p.add_argument('--no-store', action='store_true')
     p.add_argument('--no-embed', action='store_true')
     args = p.parse_args()
+    if args.rechunk:
+        run_rechunk(args.records_jsonl, args.chunks_jsonl, store=not args.no_store, embed=not args.no_embed)
+        return
+    if not args.input:
+        p.error('--input is required unless --rechunk is given')
     run_ingest(args.input, args.records_jsonl, args.chunks_jsonl, store=not args.no_store, embed=not args.no_embed)
 
 if __name__ == '__main__':
@@ -1,23 +1,21 @@
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterator
 import json
-import fitz  # PyMuPDF
-from pdf2image import convert_from_path
-import pytesseract
 from datetime import datetime
 
-from .extract_pdf import extract_pages_with_fallback, extract_text_mupdf, ocr_page_images
+from .extract_pdf import extract_pages_with_fallback, extract_text_mupdf, ocr_page_images, load_tesseract
 from .extract_excel import extract_excel_to_records
 from .utils import split_paragraphs_smart, clean_for_index
 from .typhoon_ocr import ocr_pdf_typhoon_pages
-from .config import OCR_ENGINE, TY_OCR_ENABLE, POPPLER_PATH, TESSERACT_PATH, OCR_DPI, OCR_LANG_DEFAULT
+from .boilerplate import strip_repeated_lines
+from .config import OCR_ENGINE, TY_OCR_ENABLE, POPPLER_PATH, OCR_DPI, OCR_LANG_DEFAULT, HEADER_STRIP_ENABLE
 
-# Set Tesseract path if configured
-if TESSERACT_PATH:
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+# fitz / pdf2image / pytesseract are imported inside the functions that use them,
+# so importing this module (e.g. for --no-embed runs or the scripts) stays cheap.
 
 
 def _pages_poppler(pdf_path: str) -> List[str]:
+    import fitz  # PyMuPDF
     pages: List[str] = []
     with fitz.open(pdf_path) as doc:
         for p in doc:
@@ -32,18 +30,21 @@ def _pages_poppler(pdf_path: str) -> List[str]:
 
 
 def _pages_tesseract(pdf_path: str) -> List[str]:
+    from pdf2image import convert_from_path
     kwargs = {}
     if POPPLER_PATH:
         kwargs['poppler_path'] = POPPLER_PATH
     images = convert_from_path(pdf_path, dpi=OCR_DPI, **kwargs)
+    tesseract = load_tesseract()
     out: List[str] = []
     for img in images:
-        txt = pytesseract.image_to_string(img, lang=OCR_LANG_DEFAULT) or ''
+        txt = tesseract.image_to_string(img, lang=OCR_LANG_DEFAULT) or ''
         out.append(clean_for_index(txt))
     return out
 
 
 def _pages_typhoon(pdf_path: str) -> List[str]:
+    import fitz  # PyMuPDF
     pages: List[str] = []
     with fitz.open(pdf_path) as doc:
         indices = list(range(doc.page_count))
@@ -53,6 +54,32 @@ def _pages_typhoon(pdf_path: str) -> List[str]:
     return pages
 
 
+def ocr_pages(pdf_path: str, page_indices: List[int], engine: str = OCR_ENGINE) -> Dict[int, str]:
+    """OCR only the given 0-based pages with one engine; returns {index: cleaned text}."""
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        indices = sorted({i for i in page_indices if 0 <= i < doc.page_count})
+        if engine == 'poppler':
+            out: Dict[int, str] = {}
+            for i in indices:
+                page = doc.load_page(i)
+                try:
+                    txt = page.get_text('text') or ''
+                except Exception:
+                    txt = page.get_text() or ''
+                out[i] = clean_for_index(txt if isinstance(txt, str) else str(txt))
+            return out
+    if not indices:
+        return {}
+    if engine == 'tesseract':
+        return {i: clean_for_index(ocr_page_images(pdf_path, i, lang=OCR_LANG_DEFAULT)) for i in indices}
+    if engine == 'typhoon' and TY_OCR_ENABLE:
+        results = ocr_pdf_typhoon_pages(pdf_path, indices)
+        return {i: clean_for_index(results.get(i, '')) for i in indices}
+    # auto: same per-page decision chain as a full ingest
+    return dict(zip(indices, extract_pages_with_fallback(pdf_path, page_indices=indices)))
+
+
 def ingest_pdf(pdf_path: str) -> List[Dict]:
     engine = OCR_ENGINE  # auto | poppler | tesseract | typhoon
     if engine not in ('auto', 'poppler', 'tesseract', 'typhoon'):
@@ -72,6 +99,13 @@ def ingest_pdf(pdf_path: str) -> List[Dict]:
         pages = extract_pages_with_fallback(pdf_path)
         method = 'pdf-auto'
 
+    if HEADER_STRIP_ENABLE:
+        pages, stats = strip_repeated_lines(pages)
+        if stats['lines_removed']:
+            pct = 100.0 * stats['bytes_saved'] / max(1, stats['bytes_before'])
+            print(f"{Path(pdf_path).name}: stripped {stats['lines_removed']} header/footer line(s), "
+                  f"saved {stats['bytes_saved']} bytes ({pct:.1f}%)")
+
     records = []
     for i, ptxt in enumerate(pages, start=1):
         records.append({
@@ -95,3 +129,11 @@ def write_jsonl(records: List[Dict], out_path: str) -> str:
         for r in records:
             f.write(json.dumps(r, ensure_ascii=False) + '\n')
     return str(p)
+
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    """Stream records from a JSONL file one line at a time."""
+    with Path(path).open('r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -1,8 +1,6 @@
 import re, time, hashlib
 from typing import Dict
 
-from langdetect import detect
-
 WEIRD_CHAR_PATTERN = re.compile(r"[^\wก-ฮะ-์\s.,;:!?()\[\]/\-]")
 
 
@@ -19,6 +17,7 @@ def is_valid_ocr(text: str, expected_lang: str = 'th', min_score: float = 0.7, m
     if not text or len(text.strip()) < min_length:
         return False
     try:
+        from langdetect import detect
         lang = detect(text)
     except Exception:
         return False
@@ -13,7 +13,6 @@ Environment variables used (loaded in config):
 from typing import List, Dict, Optional
 import re
 import json
-import requests
 from .config import TY_OCR_ENABLE, TY_OCR_API_KEY, TY_OCR_MODEL, TY_OCR_BASE
 
 MD_HEADING = re.compile(r"^#{1,6}\s+", re.MULTILINE)
@@ -45,6 +44,7 @@ def _api_call(file_path: str, pages: Optional[List[int]] = None) -> List[str]:
     if pages:
         data['pages'] = json.dumps(pages)  # API expects JSON string
     headers = {'Authorization': f'Bearer {TY_OCR_API_KEY}'}
+    import requests
     try:
         with open(file_path, 'rb') as f:
             files = {'file': f}
@@ -1,5 +1,6 @@
 import re
 import unicodedata
+from collections import namedtuple
 from typing import List
 from .validation import script_ratios
 
@@ -8,17 +9,21 @@ _TH_PAIR = re.compile(rf'([{_TH_CHR}])\s+([{_TH_CHR}])')
 _SENT_SPLIT = re.compile(r"(?<=[\.!?…\u0E2F\u0E5B\u0E46])\s+")
 _BULLET_START = re.compile(r"^([\-\•\–\*]|\d+[\.)]|[ก-ฮ]\)|\([0-9]+\)|\([ก-ฮ]\))\s+")
 
-try:
-    from pythainlp.util import normalize as th_normalize
-    from pythainlp.tokenize import word_tokenize, sent_tokenize
-    from pythainlp.util import isthai
-    _HAS_THAI = True
-except Exception:
-    _HAS_THAI = False
-    def th_normalize(x: str) -> str: return x
-    def word_tokenize(x: str, **kwargs) -> List[str]: return x.split()
-    def sent_tokenize(x: str, **kwargs) -> List[str]: return [x]
-    def isthai(x: str) -> bool: return False
+_ThaiNLP = namedtuple('_ThaiNLP', ['normalize', 'word_tokenize', 'sent_tokenize'])
+_THAI = None  # _ThaiNLP once pythainlp is imported (on first use), False if it is not installed
+
+
+def _thai():
+    """pythainlp functions as a _ThaiNLP tuple, or None when pythainlp is not installed."""
+    global _THAI
+    if _THAI is None:
+        try:
+            from pythainlp.util import normalize
+            from pythainlp.tokenize import word_tokenize, sent_tokenize
+            _THAI = _ThaiNLP(normalize, word_tokenize, sent_tokenize)
+        except Exception:
+            _THAI = False
+    return _THAI or None
 
 
 def normalize_text(text: str, preserve_newlines: bool = True) -> str:
@@ -46,8 +51,9 @@ def tidy_thai_spacing(text: str) -> str:
 
 def thai_postprocess(text: str) -> str:
     t = tidy_thai_spacing(text)
-    if _HAS_THAI:
-        try: t = th_normalize(t)
+    thai = _thai()
+    if thai:
+        try: t = thai.normalize(t)
         except Exception: pass
     return t
 
@@ -72,10 +78,11 @@ def clean_for_index(text: str) -> str:
 
 def tokenize_thai_words(text: str) -> List[str]:
     """Tokenize Thai text into words using PythaiNLP."""
-    if not text or not _HAS_THAI:
+    thai = _thai() if text else None
+    if not thai:
         return text.split()
     try:
-        return word_tokenize(text, engine='newmm', keep_whitespace=False)
+        return thai.word_tokenize(text, engine='newmm', keep_whitespace=False)
     except Exception:
         return text.split()
 
@@ -84,11 +91,12 @@ def segment_sentences_thai(text: str) -> List[str]:
     """Segment Thai text into sentences using PythaiNLP."""
     if not text:
         return []
-    if not _HAS_THAI:
+    thai = _thai()
+    if not thai:
         return [s.strip() for s in _SENT_SPLIT.split(text) if s.strip()]
     try:
         # Use PythaiNLP sentence tokenizer for better Thai handling
-        sents = sent_tokenize(text, engine='crfcut')
+        sents = thai.sent_tokenize(text, engine='crfcut')
         return [s.strip() for s in sents if s.strip()]
     except Exception:
         return [s.strip() for s in _SENT_SPLIT.split(text) if s.strip()]
@@ -115,7 +123,7 @@ def split_paragraphs_smart(text: str, use_thai_sent: bool = True) -> List[str]:
             para = '\n'.join(buf).strip()
             if len(para) > 1200:
                 # Use PythaiNLP sentence segmentation if available and enabled
-                if use_thai_sent and _HAS_THAI:
+                if use_thai_sent and _thai():
                     sents = segment_sentences_thai(para)
                 else:
                     sents = [s.strip() for s in _SENT_SPLIT.split(para) if s.strip()]
@@ -1,61 +1,73 @@
-﻿"""Analyze flagged chunks from review JSONL files."""
+"""Analyze flagged chunks from the review queue in ingestion.db."""
 
-import json
 import sys
 from pathlib import Path
-from collections import defaultdict, Counter
-from typing import List, Dict
-
-def analyze_flagged(review_file: str):
-    '''Analyze and report statistics of flagged chunks.'''
-    
-    if not Path(review_file).exists():
-        print(f'Error: File not found: {review_file}')
-        return
-    
-    with open(review_file, 'r', encoding='utf-8') as f:
-        chunks = [json.loads(line) for line in f if line.strip()]
-    
-    if not chunks:
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db import init_db, review_summary, iter_review, set_review_status, import_review_jsonl, REVIEW_STATUSES
+
+
+def analyze_flagged(status: str = None, run_id: str = None):
+    '''Analyze and report statistics of flagged chunks across all runs.'''
+
+    init_db()
+    stats = review_summary(status=status, run_id=run_id)
+
+    if not stats['total']:
         print('No flagged chunks found.')
         return
-    
+
     print(f'\n=== Flagged Chunks Analysis ===')
-    print(f'Total flagged: {len(chunks)}')
-    
-    # Group by source file
-    by_file = defaultdict(list)
-    for chunk in chunks:
-        path = chunk.get('path', chunk.get('source', 'unknown'))
-        by_file[path].append(chunk)
-    
-    print(f'\nFiles with flagged chunks: {len(by_file)}')
+    print(f'Total flagged: {stats["total"]} (runs: {stats["runs"]})')
+    print('By status: ' + ', '.join(f'{k}={v}' for k, v in sorted(stats['by_status'].items())))
+    print('By engine: ' + ', '.join(f'{k}={v}' for k, v in sorted(stats['by_engine'].items(), key=lambda x: str(x[0]))))
+
+    print(f'\nFiles with flagged chunks: {stats["files"]}')
     print('\nTop files by flagged count:')
-    file_counts = [(path, len(chs)) for path, chs in by_file.items()]
-    for path, count in sorted(file_counts, key=lambda x: -x[1])[:10]:
-        print(f'  {count:3d} chunks - {Path(path).name}')
-    
+    for path, count in stats['top_files']:
+        print(f'  {count:3d} chunks - {Path(path or "unknown").name}')
+
     # Analyze text length
-    lengths = [len(chunk.get('text', '')) for chunk in chunks]
     print(f'\nText length statistics:')
-    print(f'  Min: {min(lengths)} chars')
-    print(f'  Max: {max(lengths)} chars')
-    print(f'  Avg: {sum(lengths) // len(lengths)} chars')
-    print(f'  Empty: {sum(1 for l in lengths if l == 0)} chunks')
-    
+    print(f'  Min: {stats["len_min"] or 0} chars')
+    print(f'  Max: {stats["len_max"] or 0} chars')
+    print(f'  Avg: {int(stats["len_avg"] or 0)} chars')
+    print(f'  Empty: {stats["empty"] or 0} chunks')
+    print(f'  Avg quality: {stats["quality_avg"] or 0:.2f}')
+
     # Sample preview
     print(f'\n=== Sample Flagged Chunks (first 3) ===')
-    for i, chunk in enumerate(chunks[:3], 1):
-        print(f'\n[{i}] {Path(chunk.get("path", "?")).name} - Page {chunk.get("page_start", "?")}')
-        text = chunk.get('text', '')
+    for i, chunk in enumerate(iter_review(status=status, run_id=run_id, batch=3), 1):
+        print(f'\n[{i}] {Path(chunk.get("path") or "?").name} - Page {chunk.get("page_start", "?")}')
+        text = chunk.get('text') or ''
         preview = text[:150] + '...' if len(text) > 150 else text
         print(f'Text: {preview}')
-        print(f'Length: {len(text)} chars, Method: {chunk.get("method", "?")}, Status: {chunk.get("status", "?")}')
+        print(f'Length: {len(text)} chars, Engine: {chunk.get("engine", "?")}, Status: {chunk.get("status", "?")}')
+        if i >= 3:
+            break
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print('Usage: python analyze_flagged.py <review_jsonl_file>')
-        print('Example: python analyze_flagged.py data/db/review/flagged_20251121111219.jsonl')
-        sys.exit(1)
-    
-    analyze_flagged(sys.argv[1])
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Analyze the flagged-chunk review queue')
+    parser.add_argument('--status', choices=REVIEW_STATUSES, help='Only entries with this status (default: all)')
+    parser.add_argument('--run', help='Only entries from this ingest run id (e.g. 20251121111219)')
+    parser.add_argument('--import', dest='import_files', nargs='+', metavar='JSONL',
+                        help='Load legacy flagged_*.jsonl review files into the queue first')
+    parser.add_argument('--mark', choices=REVIEW_STATUSES, help='Set status for --doc-id entries and exit')
+    parser.add_argument('--doc-id', nargs='+', default=[], help='doc_id(s) to update with --mark')
+
+    args = parser.parse_args()
+
+    init_db()
+    for f in args.import_files or []:
+        print(f'Imported {import_review_jsonl(f)} chunk(s) from {f}')
+    if args.mark:
+        if not args.doc_id:
+            parser.error('--mark requires --doc-id')
+        print(f'Updated {set_review_status(args.doc_id, args.mark)} entr(ies) to {args.mark}')
+        sys.exit(0)
+
+    analyze_flagged(args.status, args.run)
@@ -0,0 +1,82 @@
+"""Import-time budget for the ingestion CLI and scripts.
+
+Runs each entry point with `python -X importtime ... --help` in a fresh
+interpreter, sums the import time of everything it loaded and fails (exit 1)
+when a command goes over the budget or imports one of the heavy libraries
+that must only load on the code path that needs them (OCR, Excel, Chroma,
+embedding model). test_import_time.py runs the same check under pytest.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SERVICE_DIR = Path(__file__).parent.parent
+
+COMMANDS = [
+    ['-m', 'app.main', '--help'],
+    ['scripts/reprocess_flagged.py', '--help'],
+    ['scripts/analyze_flagged.py', '--help'],
+    ['scripts/export_flagged_images.py', '--help'],
+]
+
+BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', '300'))
+CLI_BUDGET_MS = float(os.getenv('CLI_BUDGET_MS', '1000'))
+
+HEAVY = ['chromadb', 'sentence_transformers', 'torch', 'transformers', 'fitz', 'pdf2image', 'pytesseract',
+         'pandas', 'langdetect', 'pythainlp']
+
+
+def parse_importtime(stderr: str) -> Tuple[int, Dict[str, int]]:
+    '''(total us of top-level imports, {module: cumulative us}) from -X importtime output.'''
+    total = 0
+    modules: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cum_us, name = line.split('|', 2)
+        cum = int(cum_us)
+        modules[name.strip()] = cum
+        # nested imports are indented two spaces per level
+        if not name.startswith('  '):
+            total += cum
+    return total, modules
+
+
+def check(cmd: List[str], budget_ms: float = BUDGET_MS, cli_budget_ms: float = CLI_BUDGET_MS, top: int = 5) -> bool:
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', *cmd], cwd=SERVICE_DIR,
+                          capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    total_us, modules = parse_importtime(proc.stderr)
+    heavy = sorted({m.split('.')[0] for m in modules} & set(HEAVY))
+    import_ms = total_us / 1000.0
+    ok = proc.returncode == 0 and not heavy and import_ms <= budget_ms and wall_ms <= cli_budget_ms
+
+    print(f"{'OK  ' if ok else 'FAIL'} {' '.join(cmd)}: imports {import_ms:.0f} ms (budget {budget_ms:.0f}), "
+          f"wall {wall_ms:.0f} ms (budget {cli_budget_ms:.0f})")
+    if proc.returncode != 0:
+        print(f'     exit code {proc.returncode}: {proc.stderr.strip().splitlines()[-1:]}')
+    if heavy:
+        print(f'     heavy modules imported: {", ".join(heavy)}')
+    for name, us in sorted(modules.items(), key=lambda kv: -kv[1])[:top]:
+        print(f'     {us / 1000.0:8.1f} ms  {name}')
+    return ok
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Check import time of the ingestion CLI and scripts')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS,
+                        help='Max summed import time per command (default: 300, env IMPORT_BUDGET_MS)')
+    parser.add_argument('--cli-budget-ms', type=float, default=CLI_BUDGET_MS,
+                        help='Max wall time of `<command> --help` incl. interpreter start (default: 1000)')
+    parser.add_argument('--top', type=int, default=5, help='Slowest imports to list per command')
+    args = parser.parse_args()
+
+    results = [check(cmd, args.budget_ms, args.cli_budget_ms, args.top) for cmd in COMMANDS]
+    sys.exit(0 if all(results) else 1)
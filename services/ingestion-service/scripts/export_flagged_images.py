@@ -1,11 +1,20 @@
-﻿"""Export flagged pages as images for manual review."""
+"""Export flagged pages as images for manual review.
+
+Chunks are grouped by (pdf, page) so each page is rendered once; each PDF is
+opened once and rendered in-process with PyMuPDF inside a process pool.
+"""
 
 import json
 import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from pdf2image import convert_from_path
+from typing import Dict, Iterable, List, Optional, Tuple
 import os
 
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
 # Load .env if available
 try:
     from dotenv import load_dotenv
@@ -13,114 +22,183 @@ try:
 except ImportError:
     pass
 
-def export_flagged_images(review_file: str, output_dir: str = None, max_pages: int = None):
-    '''Export flagged PDF pages as PNG images.'''
-    
-    if not Path(review_file).exists():
+from app.config import DB_DIR
+from app.db import init_db, iter_review, REVIEW_STATUSES
+
+
+def resolve_pdf_path(path_raw: str, source_raw: str) -> Optional[Path]:
+    '''Map a chunk's path/source fields to an existing PDF file.'''
+    # If path is a directory and source is a filename, combine them
+    pdf_path = Path(path_raw)
+    if pdf_path.is_dir() and source_raw:
+        # Try appending source to path
+        pdf_path = pdf_path / source_raw
+
+    # If source looks like a better candidate, use it
+    if not pdf_path.exists() and source_raw and not Path(source_raw).is_dir():
+        pdf_path = Path(source_raw)
+
+    # Still not found? Search in directory
+    if not pdf_path.exists() and path_raw and Path(path_raw).is_dir():
+        # Find PDF files in that directory
+        pdf_files = sorted(Path(path_raw).glob('*.pdf'))
+        if pdf_files:
+            # Use first PDF found (heuristic: probably the source)
+            pdf_path = pdf_files[0]
+            print(f'⚠ Using {pdf_path.name} from directory {path_raw}')
+
+    return pdf_path if pdf_path.is_file() else None
+
+
+def group_pages(chunks: Iterable[Dict]) -> Tuple[Dict[str, List[int]], int]:
+    '''Dedupe flagged chunks into {pdf: sorted pages}; returns (groups, unresolved).'''
+    resolved: Dict[Tuple[str, str], Optional[Path]] = {}
+    pages = defaultdict(set)
+    missing = 0
+    for chunk in chunks:
+        key = (chunk.get('path', chunk.get('source', '')) or '', chunk.get('source', '') or '')
+        if key not in resolved:
+            resolved[key] = resolve_pdf_path(*key)
+        pdf = resolved[key]
+        if pdf is None:
+            missing += 1
+            continue
+        start = int(chunk.get('page_start') or 1)
+        end = int(chunk.get('page_end') or start)
+        pages[str(pdf)].update(range(start, max(start, end) + 1))
+    return {pdf: sorted(p) for pdf, p in pages.items()}, missing
+
+
+def _save(pix, out_file: Path, fmt: str):
+    if fmt == 'png':
+        pix.save(str(out_file))
+        return
+    # PyMuPDF cannot encode WebP; hand the raw samples to Pillow
+    from PIL import Image
+    mode = 'RGBA' if pix.alpha else 'RGB'
+    Image.frombytes(mode, (pix.width, pix.height), pix.samples).save(str(out_file), 'WEBP', quality=90)
+
+
+def render_pdf_pages(pdf_path: str, pages: List[int], out_dir: str, dpi: int = 300,
+                     fmt: str = 'png', thumb_dpi: int = 0) -> Tuple[List[str], List[str]]:
+    '''Open one PDF once and write every requested page; returns (written, errors), one entry per page.'''
+    import fitz  # PyMuPDF
+    written: List[str] = []
+    errors: List[str] = []
+    stem = Path(pdf_path).stem
+    out = Path(out_dir)
+    with fitz.open(pdf_path) as doc:
+        for page_no in pages:
+            if page_no < 1 or page_no > doc.page_count:
+                errors.append(f'{stem}: page {page_no} exceeds total pages ({doc.page_count})')
+                continue
+            try:
+                page = doc.load_page(page_no - 1)
+                target = out / f'{stem}_page{page_no}.{fmt}'
+                _save(page.get_pixmap(dpi=dpi), target, fmt)
+                if thumb_dpi:
+                    thumb = out / f'{stem}_page{page_no}_thumb.{fmt}'
+                    _save(page.get_pixmap(dpi=thumb_dpi), thumb, fmt)
+                # a page counts once: written, or an error if any of its images failed
+                written.append(target.name)
+            except Exception as e:
+                errors.append(f'{stem}: page {page_no}: {e}')
+    return written, errors
+
+
+def export_flagged_images(review_file: str = None, output_dir: str = None, max_pages: int = None,
+                          dpi: int = 300, fmt: str = 'png', thumb_dpi: int = 0, workers: int = None,
+                          status: str = 'pending'):
+    '''Export flagged PDF pages as PNG/WebP images (review queue, or a legacy JSONL file).'''
+    if review_file and not Path(review_file).exists():
         print(f'Error: File not found: {review_file}')
         return
-    
+
     # Default output directory
     if output_dir is None:
-        output_dir = str(Path(review_file).parent / 'flagged_images')
-    
+        base = Path(review_file).parent if review_file else DB_DIR / 'review'
+        output_dir = str(base / 'flagged_images')
+
     out_path = Path(output_dir)
     out_path.mkdir(parents=True, exist_ok=True)
-    
-    with open(review_file, 'r', encoding='utf-8') as f:
-        chunks = [json.loads(line) for line in f if line.strip()]
-    
-    if not chunks:
+
+    if review_file:
+        with open(review_file, 'r', encoding='utf-8') as f:
+            chunks = [json.loads(line) for line in f if line.strip()]
+        n_chunks = len(chunks)
+    else:
+        init_db()
+        n_chunks = 0
+
+        def _counted(rows):
+            nonlocal n_chunks
+            for r in rows:
+                n_chunks += 1
+                yield r
+        chunks = _counted(iter_review(status=status, live_only=True))
+
+    # chunks whose PDF was not found vs pages that failed to render: different units, kept apart
+    groups, missing_chunks = group_pages(chunks)
+    if not n_chunks:
         print('No flagged chunks found.')
         return
-    
-    print(f'Found {len(chunks)} flagged chunks.')
+    total = sum(len(p) for p in groups.values())
+    print(f'Found {n_chunks} flagged chunks -> {total} unique pages in {len(groups)} PDF(s).')
+    if missing_chunks:
+        print(f'✗ {missing_chunks} chunk(s) reference files that were not found')
     if max_pages:
-        chunks = chunks[:max_pages]
+        budget = max_pages
+        for pdf in list(groups):
+            groups[pdf] = groups[pdf][:budget]
+            budget -= len(groups[pdf])
+            if not groups[pdf]:
+                del groups[pdf]
         print(f'Processing first {max_pages} pages only.')
-    
-    poppler_path = os.environ.get('POPPLER_PATH')
-    kwargs = {'poppler_path': poppler_path} if poppler_path else {}
-    
+
     exported = 0
-    errors = 0
-    
-    for i, chunk in enumerate(chunks, 1):
-        # Try to construct valid PDF path
-        path_raw = chunk.get('path', chunk.get('source', ''))
-        source_raw = chunk.get('source', '')
-        page_no = chunk.get('page_start', 1)
-        
-        # If path is a directory and source is a filename, combine them
-        pdf_path = Path(path_raw)
-        if pdf_path.is_dir() and source_raw:
-            # Try appending source to path
-            pdf_path = pdf_path / source_raw
-        
-        # If source looks like a better candidate, use it
-        if not pdf_path.exists() and source_raw and not Path(source_raw).is_dir():
-            pdf_path = Path(source_raw)
-        
-        # Still not found? Search in directory
-        if not pdf_path.exists() and Path(path_raw).is_dir():
-            # Find PDF files in that directory
-            pdf_files = list(Path(path_raw).glob('*.pdf'))
-            if pdf_files:
-                # Use first PDF found (heuristic: probably the source)
-                pdf_path = pdf_files[0]
-                print(f'[{i}/{len(chunks)}] ⚠ Using {pdf_path.name} from directory')
-        
-        if not pdf_path.exists():
-            print(f'[{i}/{len(chunks)}] ✗ File not found: {path_raw}')
-            errors += 1
-            continue
-        
-        try:
-            # Check if page exists first
-            import fitz
-            with fitz.open(str(pdf_path)) as doc:
-                total_pages = doc.page_count
-            
-            if page_no > total_pages:
-                print(f'[{i}/{len(chunks)}] ✗ Page {page_no} exceeds total pages ({total_pages})')
-                errors += 1
+    page_errors = 0
+    workers = workers or min(len(groups), os.cpu_count() or 1) or 1
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {
+            ex.submit(render_pdf_pages, pdf, pages, str(out_path), dpi, fmt, thumb_dpi): pdf
+            for pdf, pages in groups.items()
+        }
+        for fut in as_completed(futures):
+            name = Path(futures[fut]).name
+            try:
+                written, errs = fut.result()
+            except Exception as e:
+                print(f'✗ {name}: {e}')
+                page_errors += len(groups[futures[fut]])
                 continue
-            
-            images = convert_from_path(
-                str(pdf_path),
-                first_page=page_no,
-                last_page=page_no,
-                dpi=300,
-                **kwargs
-            )
-            
-            if images:
-                filename = f'{Path(pdf_path).stem}_page{page_no}.png'
-                img_path = out_path / filename
-                images[0].save(img_path, 'PNG')
-                print(f'[{i}/{len(chunks)}] ✓ {filename}')
-                exported += 1
-            else:
-                print(f'[{i}/{len(chunks)}] ✗ No image rendered')
-                errors += 1
-                
-        except Exception as e:
-            print(f'[{i}/{len(chunks)}] ✗ Error: {e}')
-            errors += 1
-    
+            exported += len(written)
+            page_errors += len(errs)
+            print(f'✓ {name}: {len(written)} page(s)')
+            for msg in errs:
+                print(f'  ✗ {msg}')
+
     print(f'\nExported: {exported} images')
-    print(f'Errors: {errors}')
+    print(f'Page errors: {page_errors}')
+    print(f'Chunks with missing files: {missing_chunks}')
     print(f'Output: {out_path}')
 
 
 if __name__ == '__main__':
     import argparse
-    
+
     parser = argparse.ArgumentParser(description='Export flagged pages as images')
-    parser.add_argument('review_file', help='Path to flagged review JSONL')
-    parser.add_argument('--output', '-o', help='Output directory (default: review_file_dir/flagged_images)')
+    parser.add_argument('review_file', nargs='?', help='Legacy flagged review JSONL (default: review queue in ingestion.db)')
+    parser.add_argument('--status', choices=REVIEW_STATUSES, default='pending',
+                        help='Queue entries to export (default: pending)')
+    parser.add_argument('--output', '-o', help='Output directory (default: data/db/review/flagged_images)')
     parser.add_argument('--max-pages', '-n', type=int, help='Maximum pages to export')
-    
+    parser.add_argument('--dpi', type=int, default=300, help='Render DPI (default: 300)')
+    parser.add_argument('--format', choices=['png', 'webp'], default='png', help='Image format (default: png)')
+    parser.add_argument('--thumb-dpi', type=int, default=0, help='Also write <name>_thumb images at this DPI (e.g. 40)')
+    parser.add_argument('--workers', '-j', type=int, help='Process pool size (default: CPU count)')
+
     args = parser.parse_args()
-    
-    export_flagged_images(args.review_file, args.output, args.max_pages)
+
+    export_flagged_images(args.review_file, args.output, args.max_pages,
+                          dpi=args.dpi, fmt=args.format, thumb_dpi=args.thumb_dpi, workers=args.workers,
+                          status=args.status)
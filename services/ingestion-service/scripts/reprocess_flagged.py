@@ -1,170 +1,309 @@
-﻿"""Reprocess flagged chunks with alternative OCR engines."""
+"""Reprocess flagged chunks with alternative OCR engines.
+
+Only the flagged pages are re-OCR'd (files in parallel). Each flagged span is
+widened to the stored chunks that share its pages and re-chunked as a whole;
+the new chunks overwrite those doc_ids in SQLite/FTS/Chroma. Unflagged pages
+in the span keep their ingest-time text from records.jsonl.
+"""
 
 import json
 import sys
-import os
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Tuple
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.extract_pdf import extract_pages_with_fallback
+from app.ocr_pipeline import ocr_pages, read_jsonl
+from app.boilerplate import strip_repeated_lines
 from app.quality import ocr_quality_score, is_valid_ocr, make_quality_entry
 from app.utils import split_paragraphs_smart
 from app.chunking import make_chunks, paragraphs_from_records
-from app.db import init_db, insert_chunks, log_ocr_quality
-from app.chroma_client import upsert_chunks
-from app.config import OCR_ENGINE, TY_OCR_ENABLE
+from app.db import init_db, chunks_for_path, replace_chunks, log_ocr_quality, iter_review, set_review_status, bump_index_version
+from app.chroma_client import upsert_chunks, delete_chunks
+from app.config import HEADER_STRIP_ENABLE, DB_DIR
+
+
+def load_flagged(review_file: str = None) -> List[Dict]:
+    '''Load flagged chunks from a legacy review JSONL, else pending entries of the review queue.'''
+    if review_file:
+        with open(review_file, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    init_db()
+    return list(iter_review(status='pending', live_only=True))
+
+
+def _chunk_pages(chunk: Dict) -> List[int]:
+    start = int(chunk.get('page_start') or 1)
+    end = int(chunk.get('page_end') or start)
+    return list(range(start, max(start, end) + 1))
+
+
+def group_spans(flagged: List[Dict]) -> Dict[str, List[Dict]]:
+    '''Group flagged chunks per PDF into spans of overlapping page ranges.'''
+    by_file = defaultdict(list)
+    for chunk in flagged:
+        path = chunk.get('path', chunk.get('source', ''))
+        if path:
+            by_file[path].append(chunk)
+    spans: Dict[str, List[Dict]] = {}
+    for path, chunks in by_file.items():
+        chunks.sort(key=lambda c: (_chunk_pages(c)[0], c.get('chunk_id') or 0))
+        out: List[Dict] = []
+        for c in chunks:
+            pages = set(_chunk_pages(c))
+            if out and min(pages) <= max(out[-1]['pages']):
+                out[-1]['pages'] |= pages
+                out[-1]['chunks'].append(c)
+            else:
+                out.append({'pages': pages, 'chunks': [c]})
+        spans[path] = out
+    return spans
+
 
+def load_page_texts(records_jsonl: Path, paths: Iterable[str]) -> Dict[str, Dict[int, str]]:
+    '''Ingest-time page texts {path: {page_no: text}} for the given files from records.jsonl.'''
+    wanted = set(paths)
+    out: Dict[str, Dict[int, str]] = defaultdict(dict)
+    if not records_jsonl or not Path(records_jsonl).is_file():
+        print(f'No records file at {records_jsonl}; unflagged pages are re-read with MuPDF.')
+        return out
+    for rec in read_jsonl(str(records_jsonl)):
+        if rec.get('source') in wanted and rec.get('page_no'):
+            out[rec['source']][int(rec['page_no'])] = rec.get('text') or ''
+    return out
 
-def load_flagged(review_file: str) -> List[Dict]:
-    '''Load flagged chunks from review JSONL.'''
-    with open(review_file, 'r', encoding='utf-8') as f:
-        return [json.loads(line) for line in f if line.strip()]
 
+def close_spans(spans: List[Dict], stored: List[Dict]) -> List[Dict]:
+    '''Widen spans to whole stored chunks and merge spans that meet.
 
-def reprocess_with_engine(pdf_path: str, engine: str = 'typhoon') -> List[str]:
-    '''Reprocess PDF with specified engine.'''
-    # Temporarily override OCR_ENGINE
-    original = os.environ.get('OCR_ENGINE', 'auto')
-    os.environ['OCR_ENGINE'] = engine
-    
-    try:
-        from app.ocr_pipeline import ingest_pdf
-        records = ingest_pdf(pdf_path)
-        return [rec.get('text', '') for rec in records]
-    finally:
-        os.environ['OCR_ENGINE'] = original
+    A page is usually shared with neighbouring `ok` chunks; re-chunking only
+    the flagged chunks would leave that text in both. The widened span is
+    re-chunked as a unit and replaces every chunk inside it.
+    '''
+    ranges = [(_chunk_pages(c)[0], _chunk_pages(c)[-1]) for c in stored]
+    out: List[Dict] = []
+    for span in sorted(spans, key=lambda s: min(s['pages'])):
+        lo, hi, flagged = min(span['pages']), max(span['pages']), list(span['chunks'])
+        grown = True
+        while grown:
+            grown = False
+            for a, b in ranges:
+                if a <= hi and b >= lo and (a < lo or b > hi):
+                    lo, hi, grown = min(lo, a), max(hi, b), True
+        flagged_pages = set(span['pages'])
+        # two closed ranges that overlap form a closed range
+        while out and lo <= out[-1]['hi']:
+            prev = out.pop()
+            lo, hi = min(lo, prev['lo']), max(hi, prev['hi'])
+            flagged += prev['flagged']
+            flagged_pages |= prev['flagged_pages']
+        out.append({'lo': lo, 'hi': hi, 'flagged': flagged, 'flagged_pages': flagged_pages})
+    for group in out:
+        ids = {c.get('doc_id') for c in group['flagged']}
+        group['covered'] = [c for c in stored if group['lo'] <= _chunk_pages(c)[0] <= group['hi']
+                            and c.get('doc_id') not in ids] + group['flagged']
+        group['covered'].sort(key=lambda c: c.get('chunk_id') or 0)
+    return out
 
 
-def reprocess_flagged(review_file: str, engine: str = 'typhoon',
+def _strip_like_ingest(pdf_path: str, texts: Dict[int, str], n_pages: int) -> Dict[int, str]:
+    '''Strip headers/footers from re-OCR'd pages with the lines repeated across the whole document.'''
+    base = ocr_pages(pdf_path, [i for i in range(n_pages) if i not in texts], 'poppler')
+    full = [texts[i] if i in texts else base.get(i, '') for i in range(n_pages)]
+    stripped, _ = strip_repeated_lines(full)
+    return {i: stripped[i] for i in texts}
+
+
+def reprocess_file(pdf_path: str, spans: List[Dict], engine: str, quality_threshold: float,
+                   ingest_texts: Dict[int, str]) -> Tuple[List[Dict], List[str], List[Dict], List[str], int]:
+    '''OCR the flagged pages of one PDF; return (replacements, dropped ids, quality log, improved ids, still_flagged).'''
+    stored = chunks_for_path(pdf_path)
+    groups = close_spans(spans, stored)
+    pages = sorted({p for g in groups for p in g['flagged_pages']})
+    texts = ocr_pages(pdf_path, [p - 1 for p in pages], engine)
+    n_pages = max([max(ingest_texts, default=0)] + [g['hi'] for g in groups])
+    if HEADER_STRIP_ENABLE and texts:
+        texts = _strip_like_ingest(pdf_path, texts, n_pages)
+    # unflagged pages inside a widened span keep their ingest-time text
+    missing = [p - 1 for g in groups for p in range(g['lo'], g['hi'] + 1)
+               if p not in g['flagged_pages'] and p not in ingest_texts]
+    fallback = ocr_pages(pdf_path, missing, 'poppler') if missing else {}
+
+    replacements: List[Dict] = []
+    dropped: List[str] = []
+    quality_entries: List[Dict] = []
+    improved: List[str] = []
+    still_flagged = 0
+    name = Path(pdf_path).name
+    for group in groups:
+        originals = sorted(group['flagged'], key=lambda c: c.get('chunk_id') or 0)
+        anchor = originals[0].get('doc_id')
+        ok_pages = []
+        for page_no in sorted(group['flagged_pages']):
+            before = '\n'.join(c.get('text') or '' for c in originals if page_no in _chunk_pages(c))
+            after = texts.get(page_no - 1, '')
+            quality = ocr_quality_score(after)
+            good = quality >= quality_threshold and is_valid_ocr(after)
+            quality_entries.append(make_quality_entry(anchor, page_no, before, 'auto', 'flagged', notes='before'))
+            quality_entries.append(make_quality_entry(
+                anchor, page_no, after, f'reprocess-{engine}', 'ok' if good else 'flagged', notes='after'))
+            mark = '✓' if good else '✗'
+            print(f'  {mark} {name} page {page_no}: quality {ocr_quality_score(before):.2f} -> {quality:.2f}')
+            if good:
+                ok_pages.append(page_no)
+        if len(ok_pages) != len(group['flagged_pages']):
+            still_flagged += len(originals)
+            continue
+
+        records = []
+        for p in range(group['lo'], group['hi'] + 1):
+            if p in group['flagged_pages']:
+                text = texts.get(p - 1, '')
+            else:
+                text = ingest_texts.get(p, fallback.get(p - 1, ''))
+            records.append({
+                'source': pdf_path,
+                'page_no': p,
+                'method': f'reprocess-{engine}' if p in group['flagged_pages'] else 'ingest',
+                'text': text,
+                'paragraphs': split_paragraphs_smart(text),
+            })
+        new_chunks = make_chunks(paragraphs_from_records(records), source_path=pdf_path)
+        covered = group['covered']
+        for k, ch in enumerate(new_chunks):
+            if k < len(covered):
+                # reuse the replaced chunks' identities so the index is updated in place
+                doc_id = covered[k].get('doc_id')
+                chunk_id = covered[k].get('chunk_id')
+            else:
+                doc_id = f'{anchor}-r{k}'
+                chunk_id = covered[-1].get('chunk_id')
+            ch.update({
+                'doc_id': doc_id,
+                'file_type': Path(pdf_path).suffix.lower().lstrip('.') or 'pdf',
+                'chunk_id': chunk_id,
+                'status': 'ok',
+            })
+            replacements.append(ch)
+        dropped.extend(c.get('doc_id') for c in covered[len(new_chunks):])
+        improved.extend(c.get('doc_id') for c in originals)
+    return replacements, dropped, quality_entries, improved, still_flagged
+
+
+def reprocess_flagged(review_file: str = None, engine: str = 'typhoon',
                      store: bool = True, embed: bool = True,
-                     quality_threshold: float = 0.3):
+                     quality_threshold: float = 0.3, workers: int = 4,
+                     records_jsonl: Path = DB_DIR / 'records.jsonl'):
     '''Reprocess flagged chunks with alternative OCR engine.'''
-    
-    print(f'Loading flagged chunks from {review_file}...')
+
+    print(f'Loading flagged chunks from {review_file or "review queue"}...')
     flagged = load_flagged(review_file)
-    
+
     if not flagged:
         print('No flagged chunks found.')
         return
-    
+
     print(f'Found {len(flagged)} flagged chunks.')
-    print(f'Reprocessing with engine={engine}, quality_threshold={quality_threshold}')
-    
-    # Group by source file
-    by_file = defaultdict(set)
-    for chunk in flagged:
-        path = chunk.get('path', chunk.get('source', ''))
-        page = chunk.get('page_start', 1)
-        if path:
-            by_file[path].add(page)
-    
-    improved_records = []
-    improved_count = 0
+    print(f'Reprocessing with engine={engine}, quality_threshold={quality_threshold}, workers={workers}')
+
+    spans = group_spans(flagged)
+    init_db()
+    page_texts = load_page_texts(records_jsonl, spans)
+    jobs = {}
+    improved_chunks: List[Dict] = []
+    dropped_ids: List[str] = []
+    quality_entries: List[Dict] = []
+    improved_ids: List[str] = []
     still_flagged = 0
-    
-    for pdf_path, pages in by_file.items():
-        if not Path(pdf_path).exists():
-            print(f'Skipping {pdf_path} (not found)')
-            continue
-        
-        print(f'\nProcessing {Path(pdf_path).name} ({len(pages)} pages)...')
-        
-        try:
-            page_texts = reprocess_with_engine(pdf_path, engine)
-            
-            for page_no in sorted(pages):
-                idx = page_no - 1
-                if idx >= len(page_texts):
-                    continue
-                    
-                text = page_texts[idx]
-                quality = ocr_quality_score(text)
-                
-                if quality >= quality_threshold and is_valid_ocr(text):
-                    improved_records.append({
-                        'source': pdf_path,
-                        'page_no': page_no,
-                        'method': f'reprocess-{engine}',
-                        'text': text,
-                        'paragraphs': split_paragraphs_smart(text)
-                    })
-                    improved_count += 1
-                    print(f'  ✓ Page {page_no}: quality {quality:.2f}')
-                else:
-                    still_flagged += 1
-                    print(f'  ✗ Page {page_no}: still low ({quality:.2f})')
-                    
-        except Exception as e:
-            print(f'  Error: {e}')
-            still_flagged += len(pages)
-    
-    if not improved_records:
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        for pdf_path, file_spans in spans.items():
+            if not Path(pdf_path).is_file():
+                print(f'Skipping {pdf_path} (not a file)')
+                still_flagged += sum(len(s['chunks']) for s in file_spans)
+                continue
+            n_pages = len({p for s in file_spans for p in s['pages']})
+            print(f'Queued {Path(pdf_path).name} ({n_pages} pages)')
+            jobs[ex.submit(reprocess_file, pdf_path, file_spans, engine, quality_threshold,
+                            page_texts.get(pdf_path, {}))] = pdf_path
+        for fut in as_completed(jobs):
+            try:
+                repl, drops, qlog, ok, bad = fut.result()
+            except Exception as e:
+                print(f'  Error in {Path(jobs[fut]).name}: {e}')
+                still_flagged += sum(len(s['chunks']) for s in spans[jobs[fut]])
+                continue
+            improved_chunks.extend(repl)
+            dropped_ids.extend(drops)
+            quality_entries.extend(qlog)
+            improved_ids.extend(ok)
+            still_flagged += bad
+
+    if store and quality_entries:
+        init_db()
+        log_ocr_quality(quality_entries)
+
+    if not improved_chunks:
         print(f'\nNo improvements. {still_flagged} chunks still flagged.')
         return
-    
-    print(f'\n✓ Improved: {improved_count}, Still flagged: {still_flagged}')
-    
-    # Rebuild chunks
-    paragraphs = paragraphs_from_records(improved_records)
-    new_chunks = make_chunks(paragraphs, source_path='')
-    
-    enriched = []
-    quality_entries = []
-    for idx, ch in enumerate(new_chunks):
-        doc_id = f'reprocess_{engine}_{idx}'
-        ch.update({
-            'doc_id': doc_id,
-            'file_type': 'pdf',
-            'chunk_id': idx,
-            'status': 'ok'
-        })
-        enriched.append(ch)
-        quality_entries.append(make_quality_entry(
-            doc_id, ch.get('page_start', 0), ch.get('text', ''),
-            f'reprocess-{engine}', 'ok'
-        ))
-    
+
+    print(f'\n✓ Improved: {len(improved_ids)}, Still flagged: {still_flagged}')
+
     # Save improved chunks
-    out_dir = Path(review_file).parent
-    out_file = out_dir / f'improved_{engine}_{Path(review_file).stem}.jsonl'
+    if review_file:
+        out_file = Path(review_file).parent / f'improved_{engine}_{Path(review_file).stem}.jsonl'
+    else:
+        out_dir = DB_DIR / 'review'
+        out_dir.mkdir(parents=True, exist_ok=True)
+        out_file = out_dir / f"improved_{engine}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.jsonl"
     with out_file.open('w', encoding='utf-8') as f:
-        for ch in enriched:
+        for ch in improved_chunks:
             f.write(json.dumps(ch, ensure_ascii=False) + '\n')
-    print(f'Saved {len(enriched)} improved chunks to {out_file}')
-    
+    print(f'Saved {len(improved_chunks)} improved chunks to {out_file}')
+
     if store:
-        init_db()
-        insert_chunks(enriched)
-        log_ocr_quality(quality_entries)
-        print(f'✓ Stored to database')
-    
+        replace_chunks(improved_chunks, dropped_ids)
+        print(f'✓ Replaced {len(improved_chunks)} chunks in database (dropped {len(dropped_ids)})')
+        n = set_review_status(improved_ids, 'reprocessed', engine=f'reprocess-{engine}')
+        print(f'✓ Marked {n} review entries as reprocessed')
+
     if embed:
-        upsert_chunks(enriched)
+        delete_chunks(dropped_ids)
+        upsert_chunks(improved_chunks)
         print(f'✓ Embedded to Chroma')
 
+    if store or embed:
+        bump_index_version()
+
 
 if __name__ == '__main__':
     import argparse
-    
+
     parser = argparse.ArgumentParser(description='Reprocess flagged chunks')
-    parser.add_argument('review_file', help='Path to flagged review JSONL')
+    parser.add_argument('review_file', nargs='?', help='Legacy flagged review JSONL (default: pending entries in review queue)')
     parser.add_argument('--engine', choices=['auto', 'typhoon', 'tesseract', 'poppler'],
                        default='typhoon', help='OCR engine (default: typhoon)')
     parser.add_argument('--no-store', action='store_true', help='Skip database')
     parser.add_argument('--no-embed', action='store_true', help='Skip embedding')
     parser.add_argument('--quality-threshold', type=float, default=0.3,
                        help='Min quality score (default: 0.3)')
-    
+    parser.add_argument('--workers', '-j', type=int, default=4,
+                       help='Files processed in parallel (default: 4)')
+    parser.add_argument('--records-jsonl', default=str(DB_DIR / 'records.jsonl'),
+                       help='Ingest page records, source of unflagged page text (default: data/db/records.jsonl)')
+
     args = parser.parse_args()
-    
+
     reprocess_flagged(
         args.review_file,
         engine=args.engine,
         store=not args.no_store,
         embed=not args.no_embed,
-        quality_threshold=args.quality_threshold
+        quality_threshold=args.quality_threshold,
+        workers=args.workers,
+        records_jsonl=Path(args.records_jsonl)
     )
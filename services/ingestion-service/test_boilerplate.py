@@ -0,0 +1,80 @@
+"""
+Header/footer stripping (pytest test_boilerplate.py, or run directly).
+
+Repeated letterheads and page numbers are removed even with OCR noise,
+while numbered article headings (ข้อ 1 / ข้อ 2) that sit at the top of a
+page are kept.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.boilerplate import _line_key, _similar, strip_repeated_lines
+
+HEADER = 'ประกาศคณะวิศวกรรมศาสตร์ มหาวิทยาลัยเชียงใหม่'
+# what OCR makes of the same letterhead on different pages
+NOISY_HEADERS = [
+    HEADER,
+    'ประกาศคณะวิศวกรรมศาสตร มหาวิทยาลัยเชียงใหม่',
+    'ประกาศ คณะวิศวกรรมศาสตร์ มหาวิทยาลัยเชียงใหม่.',
+    'ประกาศคณะวิศวกรรมศาสตร์ มหาวิทยาลัยเซียงใหม่',
+    'ประกาศคณะวิศวกรรมศาสดร์ | มหาวิทยาลัยเชียงใหม่',
+]
+
+
+def _page(n: int, header: str, footer: str) -> str:
+    body = [f'ข้อ {n} การลงทะเบียนเรียนในภาคการศึกษาที่ {n}'] + \
+           [f'รายละเอียดบรรทัดที่ {i} ของหน้า {n} เกี่ยวกับค่าธรรมเนียมและกำหนดการ' for i in range(5)]
+    return '\n'.join([header, *body, footer])
+
+
+def _strip(pages):
+    return strip_repeated_lines(pages, scan_lines=3, min_ratio=0.6, fuzz=0.85, min_pages=3)
+
+
+def test_header_and_footer_are_stripped():
+    pages = [_page(n, HEADER, f'หน้า {n} จาก 5') for n in range(1, 6)]
+    out, stats = _strip(pages)
+    assert stats['lines_removed'] == 10
+    assert stats['bytes_saved'] > 0
+    for n, text in enumerate(out, 1):
+        assert HEADER not in text
+        assert 'จาก 5' not in text
+        assert f'รายละเอียดบรรทัดที่ 4 ของหน้า {n}' in text
+
+
+def test_ocr_noisy_variants_cluster():
+    pages = [_page(n, h, f'- {n} -') for n, h in enumerate(NOISY_HEADERS, 1)]
+    out, stats = _strip(pages)
+    assert stats['lines_removed'] == 10
+    for text, header in zip(out, NOISY_HEADERS):
+        assert header not in text
+
+
+def test_page_number_lines_fold():
+    for variants in (['3', '12'], ['- 3 -', '- 12 -'], ['หน้า 3', 'หน้า ๑๒'], ['Page 3', 'page 12'],
+                     ['3/12', '11/12'], ['หน้า 3 จาก 12', 'หน้า 4 จาก 12']):
+        assert len({_line_key(v) for v in variants}) == 1, variants
+    pages = [_page(n, HEADER, footer) for n, footer in
+             enumerate(['Page 1', 'Page 2', 'page 3', 'Page 4', 'Page 5'], 1)]
+    out, _ = _strip(pages)
+    assert not any('age ' in text.split('\n')[-1] for text in out)
+
+
+def test_numbered_articles_are_kept():
+    assert _line_key('ข้อ 1') != _line_key('ข้อ 2')
+    assert not _similar(_line_key('ข้อ 1'), _line_key('ข้อ 2'), 0.85)
+    assert not _similar(_line_key('หมวด 1 เรื่อง'), _line_key('หมวด 2 เรื่อง'), 0.85)
+    pages = [_page(n, HEADER, f'หน้า {n}') for n in range(1, 6)]
+    out, _ = _strip(pages)
+    for n, text in enumerate(out, 1):
+        assert text.startswith(f'ข้อ {n} การลงทะเบียนเรียน')
+
+
+if __name__ == '__main__':
+    test_header_and_footer_are_stripped()
+    test_ocr_noisy_variants_cluster()
+    test_page_number_lines_fold()
+    test_numbered_articles_are_kept()
+    print("boilerplate stripping OK")
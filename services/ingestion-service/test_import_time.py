@@ -0,0 +1,23 @@
+"""
+Import-time budget for the ingestion CLI and scripts (pytest test_import_time.py, or run directly).
+
+Fails when `python -X importtime <command> --help` pulls in a heavy library
+(chromadb, sentence-transformers, PyMuPDF, pdf2image, pytesseract, pandas,
+langdetect, pythainlp) or exceeds IMPORT_BUDGET_MS / CLI_BUDGET_MS.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+
+from check_import_time import COMMANDS, check
+
+
+def test_import_time_budget():
+    failed = [' '.join(cmd) for cmd in COMMANDS if not check(cmd)]
+    assert not failed, f"over import budget or importing heavy modules: {failed}"
+
+
+if __name__ == '__main__':
+    test_import_time_budget()
+    print("import-time budget OK")
@@ -0,0 +1,74 @@
+"""
+Review decisions survive `--rechunk` (pytest test_rechunk_review.py, or run directly).
+
+A rebuild reassigns doc_ids; review_queue / ocr_quality rows must follow
+their pages to the new ids instead of being dropped.
+"""
+import json
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import db, main
+
+
+def _records(paths):
+    return [{'source': p, 'page_no': 1, 'text': f'เนื้อหาของเอกสาร {p} หน้าแรก'} for p in paths]
+
+
+def _rechunk(tmp: Path, paths):
+    records = tmp / 'records.jsonl'
+    records.write_text(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in _records(paths)), encoding='utf-8')
+    main.run_rechunk(str(records), str(tmp / 'chunks.jsonl'), store=True, embed=False)
+
+
+def _review_rows(sqlite_path: Path):
+    conn = sqlite3.connect(str(sqlite_path))
+    try:
+        return {Path(r[0]).name: r[1:] for r in conn.execute("SELECT path, doc_id, status FROM review_queue")}
+    finally:
+        conn.close()
+
+
+def _run(tmp: Path, patch):
+    patch(db, 'SQLITE_PATH', tmp / 'ingestion.db')
+    patch(db, 'INDEX_VERSION_PATH', tmp / 'index_version')
+    patch(main, 'is_valid_ocr', lambda text: False)  # every chunk gets flagged
+
+    _rechunk(tmp, ['b.pdf', 'gone.pdf'])
+    before = _review_rows(tmp / 'ingestion.db')
+    assert db.set_review_status([before['b.pdf'][0]], 'accepted') == 1
+
+    # a new file first shifts every chunk index, so all doc_ids change
+    _rechunk(tmp, ['a.pdf', 'b.pdf'])
+    after = _review_rows(tmp / 'ingestion.db')
+
+    assert after['b.pdf'][0] != before['b.pdf'][0]
+    assert after['b.pdf'][1] == 'accepted'
+    assert after['a.pdf'][1] == 'pending'
+    assert 'gone.pdf' not in after
+    live = {d['doc_id'] for d in db.chunks_for_path(str(Path('b.pdf').resolve()))}
+    assert after['b.pdf'][0] in live
+
+
+def test_reviewed_row_survives_rechunk(tmp_path, monkeypatch):
+    _run(tmp_path, monkeypatch.setattr)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as d:
+        originals = []
+
+        def patch(obj, name, value):
+            originals.append((obj, name, getattr(obj, name)))
+            setattr(obj, name, value)
+
+        try:
+            _run(Path(d), patch)
+        finally:
+            for obj, name, value in reversed(originals):
+                setattr(obj, name, value)
+    print("rechunk review remap OK")
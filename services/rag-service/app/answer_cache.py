@@ -0,0 +1,170 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .chroma_client import embed_query, embedder_ready
+from .sqlite_client import fetch_docs
+from .filters import RagFilter
+from .result_cache import make_key
+from .config import (ANSWER_CACHE_ENABLE, ANSWER_CACHE_SIZE, ANSWER_CACHE_SIM,
+                     ANSWER_CACHE_OVERLAP, ANSWER_CACHE_TTL_S)
+
+
+def doc_fingerprints(doc_ids: Iterable[str]) -> Dict[str, str]:
+    """sha1 of each chunk's current text; ids missing from SQLite are absent."""
+    rows = fetch_docs(list(doc_ids))
+    return {r['doc_id']: hashlib.sha1((r.get('text') or '').encode('utf-8')).hexdigest() for r in rows}
+
+
+class SemanticAnswerCache:
+    """Answers reused across paraphrases.
+
+    A lookup hits when the question embedding is within `sim_threshold` cosine
+    of a cached question AND the Jaccard overlap of the retrieved doc_id sets is
+    at least `overlap_threshold`. An entry is dropped as soon as any of its
+    doc_ids has changed text (or vanished) in SQLite. `scope` (the request's
+    metadata filter) must match exactly.
+
+    Question vectors live in a (max_entries, dim) matrix allocated once; an
+    entry owns one row (slot) and freed slots are reused, so store/drop never
+    copy the matrix. Expired entries are purged on store.
+    """
+
+    def __init__(self, max_entries: int, sim_threshold: float, overlap_threshold: float, ttl_s: float):
+        self.max_entries = max(1, max_entries)
+        self.sim_threshold = sim_threshold
+        self.overlap_threshold = overlap_threshold
+        self.ttl_s = ttl_s
+        # slot -> entry in insertion order; with one TTL that is also expiry order
+        self._entries: 'OrderedDict[int, Dict]' = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._live: Optional[np.ndarray] = None
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._hits = 0
+        self._invalidated = 0
+        self._saved_ms = 0.0
+
+    def _allocate(self, dim: int):
+        self._matrix = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._live = np.zeros(self.max_entries, dtype=bool)
+        self._free = list(range(self.max_entries - 1, -1, -1))
+        self._entries.clear()
+
+    def _release(self, slot: int):
+        self._live[slot] = False
+        self._free.append(slot)
+
+    def _drop(self, entry: Dict):
+        if self._entries.get(entry['slot']) is entry:
+            del self._entries[entry['slot']]
+            self._release(entry['slot'])
+
+    def _purge_expired(self, now: float):
+        while self._entries:
+            slot, entry = next(iter(self._entries.items()))
+            if entry['expires'] >= now:
+                break
+            del self._entries[slot]
+            self._release(slot)
+
+    def lookup(self, qvec: List[float], doc_ids: Iterable[str], scope: Optional[str] = None) -> Optional[str]:
+        ids = set(doc_ids)
+        q = np.asarray(qvec, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            self._lookups += 1
+            if not self._entries or not ids or self._matrix.shape[1] != len(q):
+                return None
+            sims = self._matrix @ q
+            sims[~self._live] = -np.inf
+            order = [int(i) for i in np.argsort(-sims) if sims[i] >= self.sim_threshold]
+            candidates = [self._entries[i] for i in order]
+        for entry in candidates:
+            if entry['expires'] < now or entry['scope'] != scope:
+                continue
+            overlap = len(ids & entry['doc_ids']) / len(ids | entry['doc_ids'])
+            if overlap < self.overlap_threshold:
+                continue
+            if doc_fingerprints(entry['doc_ids']) != entry['fingerprints']:
+                with self._lock:
+                    if self._entries.get(entry['slot']) is entry:
+                        self._drop(entry)
+                        self._invalidated += 1
+                continue
+            with self._lock:
+                self._hits += 1
+                self._saved_ms += entry['gen_ms']
+            return entry['answer']
+        return None
+
+    def store(self, qvec: List[float], doc_ids: Iterable[str], answer: str, gen_ms: float,
+              scope: Optional[str] = None):
+        ids = set(doc_ids)
+        if not ids:
+            return
+        vec = np.asarray(qvec, dtype=np.float32)
+        entry = {
+            'doc_ids': ids,
+            'fingerprints': doc_fingerprints(ids),
+            'answer': answer,
+            'gen_ms': gen_ms,
+            'scope': scope,
+            'expires': time.time() + self.ttl_s,
+        }
+        with self._lock:
+            self._purge_expired(time.time())
+            if self._matrix is None or self._matrix.shape[1] != len(vec):
+                # first store, or the embedding model changed: old vectors are not comparable
+                self._allocate(len(vec))
+            if not self._free:
+                # oldest first out
+                self._drop(next(iter(self._entries.values())))
+            slot = self._free.pop()
+            self._matrix[slot] = vec
+            self._live[slot] = True
+            entry['slot'] = slot
+            self._entries[slot] = entry
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'sim_threshold': self.sim_threshold,
+                'overlap_threshold': self.overlap_threshold,
+                'lookups': self._lookups,
+                'hits': self._hits,
+                'hit_rate': round(self._hits / self._lookups, 4) if self._lookups else 0.0,
+                'invalidated': self._invalidated,
+                'generation_ms_saved': round(self._saved_ms, 1),
+            }
+
+
+answer_cache = SemanticAnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_SIM, ANSWER_CACHE_OVERLAP, ANSWER_CACHE_TTL_S)
+
+
+def _usable(result: Dict) -> bool:
+    # the hash fallback embedder makes every question look identical
+    return ANSWER_CACHE_ENABLE and embedder_ready() and not result.get('degraded')
+
+
+def _scope(filters: Optional[RagFilter]) -> Optional[str]:
+    return make_key(filters.cache_key()) if filters is not None and not filters.is_empty() else None
+
+
+def lookup_answer(question: str, result: Dict, filters: Optional[RagFilter] = None) -> Optional[str]:
+    if not _usable(result):
+        return None
+    return answer_cache.lookup(embed_query(question), (c['doc_id'] for c in result['contexts']), _scope(filters))
+
+
+def store_answer(question: str, result: Dict, answer: str, gen_ms: float, filters: Optional[RagFilter] = None):
+    if _usable(result):
+        answer_cache.store(embed_query(question), (c['doc_id'] for c in result['contexts']), answer, gen_ms,
+                           _scope(filters))
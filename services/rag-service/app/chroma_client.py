@@ -1,41 +1,129 @@
+import threading
+import time
 import chromadb
 from chromadb.config import Settings
-from typing import List
-from .config import CHROMA_DIR, EMBEDDING_MODEL, EMBED_BATCH
+from typing import Dict, List, Optional
+from .config import (CHROMA_DIR, EMBEDDING_MODEL, EMBED_BATCH, QUERY_EMBED_CACHE_SIZE, QUERY_EMBED_CACHE_PATH,
+                     EMBED_BATCHER_ENABLE, EMBED_BATCH_WINDOW_MS, EMBED_BATCH_MAX, VECTOR_BACKEND, VECTOR_INDEX_DIR,
+                     VECTOR_RESCORE)
+from .embed_cache import QueryEmbeddingCache
+from .embed_batcher import EmbeddingBatcher
+from .text_utils import normalize_query
+from .vector_index import make_index
+from .filters import RagFilter
 
 try:
     from sentence_transformers import SentenceTransformer
 except Exception:
     SentenceTransformer = None  # type: ignore
 
-_client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(anonymized_telemetry=False))
-_collection = _client.get_or_create_collection(name='documents')
-
+_client_lock = threading.Lock()
+_embed_lock = threading.Lock()
+_collection = None
 _embedder = None
-if SentenceTransformer and EMBEDDING_MODEL:
-    try:
-        _embedder = SentenceTransformer(EMBEDDING_MODEL)
-    except Exception as e:
-        print('Embedder load failed:', e)
+_embedder_tried = False
+
+
+def collection():
+    """The Chroma collection; the PersistentClient is opened on first use (or by warmup)."""
+    global _collection
+    if _collection is None:
+        with _client_lock:
+            if _collection is None:
+                client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(anonymized_telemetry=False))
+                _collection = client.get_or_create_collection(name='documents')
+    return _collection
+
+
+def load_embedder():
+    """Load the sentence-transformers model once; called by warmup, or lazily by the first embed."""
+    global _embedder, _embedder_tried
+    if _embedder_tried:
+        return
+    with _embed_lock:
+        if _embedder_tried:
+            return
+        if SentenceTransformer and EMBEDDING_MODEL:
+            try:
+                print(f"[embed] Loading {EMBEDDING_MODEL} ...")
+                _embedder = SentenceTransformer(EMBEDDING_MODEL)
+            except Exception as e:
+                print('Embedder load failed:', e)
+        _embedder_tried = True
+
+
+# numpy / int8 / binary: in-process search over an export of the collection (see vector_index.py)
+vector_index = make_index(VECTOR_BACKEND, VECTOR_INDEX_DIR, collection, rescore=VECTOR_RESCORE)
+query_cache = QueryEmbeddingCache(EMBEDDING_MODEL, QUERY_EMBED_CACHE_SIZE, QUERY_EMBED_CACHE_PATH or None)
+
+
+def embedder_ready() -> bool:
+    return _embedder is not None
 
 
 def embed_texts(texts: List[str]) -> List[List[float]]:
+    load_embedder()
     if _embedder:
         return _embedder.encode(texts, batch_size=EMBED_BATCH, normalize_embeddings=True).tolist()  # type: ignore
     return [[float((sum(bytearray(t.encode('utf-8'))) % 100) / 100.0)] for t in texts]
 
 
-def semantic_search(query: str, top_k: int = 12) -> List[dict]:
-    qvec = embed_texts([query])[0]
-    res = _collection.query(query_embeddings=[qvec], n_results=top_k, include=['documents','metadatas','distances'])
-    out = []
-    if not res.get('ids'):
-        return out
-    for i in range(len(res['ids'][0])):
-        out.append({
-            'doc_id': res['ids'][0][i],
-            'text': res['documents'][0][i],
-            **(res['metadatas'][0][i] or {}),
-            'distance': (res.get('distances') or [[None]])[0][i]
-        })
-    return out
+embed_batcher = EmbeddingBatcher(embed_texts, EMBED_BATCH_WINDOW_MS, EMBED_BATCH_MAX) if EMBED_BATCHER_ENABLE else None
+
+
+def embed_query(query: str) -> List[float]:
+    text = normalize_query(query)
+    load_embedder()
+    if _embedder is None:
+        # the hash fallback is cheap and its vectors must never answer for the real model
+        return embed_texts([text])[0]
+    vec = query_cache.get(text)
+    if vec is None:
+        t0 = time.perf_counter()
+        vec = embed_batcher.embed(text) if embed_batcher else embed_texts([text])[0]
+        query_cache.put(text, vec, (time.perf_counter() - t0) * 1000.0)
+    return vec
+
+
+def _chroma_search(qvecs: List[List[float]], top_k: int, filters: Optional[RagFilter] = None) -> List[List[dict]]:
+    kwargs = {}
+    where = filters.to_chroma_where() if filters is not None else None
+    if where:
+        kwargs['where'] = where
+    res = collection().query(query_embeddings=qvecs, n_results=top_k, include=['documents','metadatas','distances'], **kwargs)
+    ids = res.get('ids') or []
+    blank = [[None] * len(row) for row in ids]
+    rows = zip(ids, res.get('documents') or blank, res.get('metadatas') or blank, res.get('distances') or blank)
+    out = [
+        [{'doc_id': i, 'text': doc, **(meta or {}), 'distance': dist} for i, doc, meta, dist in zip(*row)]
+        for row in rows
+    ]
+    return out or [[] for _ in qvecs]
+
+
+def get_vectors(doc_ids: List[str]) -> Dict[str, List[float]]:
+    """Stored embeddings by doc_id (missing ids are absent)."""
+    if not doc_ids:
+        return {}
+    if vector_index is not None:
+        return vector_index.vectors_for(doc_ids)
+    res = collection().get(ids=list(dict.fromkeys(doc_ids)), include=['embeddings'])
+    embs = res.get('embeddings')
+    return dict(zip(res.get('ids') or [], embs if embs is not None else []))
+
+
+def search_vectors(qvecs: List[List[float]], top_k: int = 12,
+                   filters: Optional[RagFilter] = None) -> List[List[dict]]:
+    """Top-k per query vector from the configured backend (VECTOR_BACKEND)."""
+    if vector_index is not None:
+        return vector_index.search_batch(qvecs, top_k, filters)
+    return _chroma_search(qvecs, top_k, filters)
+
+
+def semantic_search(query: str, top_k: int = 12, filters: Optional[RagFilter] = None) -> List[dict]:
+    return search_vectors([embed_query(query)], top_k, filters)[0]
+
+
+def semantic_search_batch(queries: List[str], top_k: int = 12,
+                          filters: Optional[RagFilter] = None) -> List[List[dict]]:
+    return search_vectors(embed_texts([normalize_query(q) for q in queries]), top_k, filters)
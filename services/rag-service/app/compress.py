@@ -0,0 +1,168 @@
+import math
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .text_utils import est_tokens, normalize_query, tokenize_thai_words, segment_sentences_thai
+from .embed_cache import QueryEmbeddingCache
+from .chroma_client import embed_query, embed_texts, embedder_ready
+from .config import (EMBEDDING_MODEL, COMPRESS_SCORER, COMPRESS_NEIGHBOURS, COMPRESS_SENT_CACHE_SIZE,
+                     COMPRESS_BM25_K1, COMPRESS_BM25_B)
+
+_GAP = ' … '
+
+
+def split_sentences(text: str) -> List[Tuple[int, str]]:
+    """(line number, sentence) pairs, so kept neighbours can be re-joined with their newline."""
+    # lines first: PDF text keeps headings and table rows on their own line
+    return [(ln, s) for ln, line in enumerate(text.split('\n')) for s in segment_sentences_thai(line)]
+
+
+def _terms(text: str) -> List[str]:
+    return [w for w in tokenize_thai_words(normalize_query(text).lower()) if w.strip()]
+
+
+def bm25_scores(query: str, sentences: List[str], k1: float = COMPRESS_BM25_K1, b: float = COMPRESS_BM25_B) -> List[float]:
+    """BM25 of each sentence against the query, IDF taken over the sentences themselves."""
+    docs = [Counter(_terms(s)) for s in sentences]
+    q = set(_terms(query))
+    if not docs or not q:
+        return [0.0] * len(sentences)
+    avg_len = max(1e-9, sum(sum(d.values()) for d in docs) / len(docs))
+    df = {t: sum(1 for d in docs if t in d) for t in q}
+    idf = {t: math.log(1.0 + (len(docs) - n + 0.5) / (n + 0.5)) for t, n in df.items()}
+    out = []
+    for d in docs:
+        norm = k1 * (1.0 - b + b * sum(d.values()) / avg_len)
+        out.append(sum(idf[t] * d[t] * (k1 + 1.0) / (d[t] + norm) for t in q if t in d))
+    return out
+
+
+class ContextCompressor:
+    """Extractive compression of packed blocks down to a token budget.
+
+    Every block keeps at least its best sentence, so the [n] citation numbers
+    assigned by the packer stay valid; the rest of the budget goes to the
+    highest scoring sentences plus `neighbours` sentences either side of each,
+    and whatever is left is filled with the remaining sentences in document
+    order. Sentences keep their original order and line breaks; dropped spans
+    are marked with '…'. If no sentence shares anything with the question
+    the scores carry no signal and the blocks are returned unchanged.
+    """
+
+    def __init__(self, scorer: str, neighbours: int, sent_cache_size: int):
+        self.scorer = scorer
+        self.neighbours = max(0, neighbours)
+        self._sent_cache = QueryEmbeddingCache(EMBEDDING_MODEL, sent_cache_size)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._compressed = 0
+        self._tokens_in = 0
+        self._tokens_out = 0
+        self._ms = 0.0
+
+    def _embed_scores(self, question: str, sentences: List[str]) -> List[float]:
+        vecs = [self._sent_cache.get(s) for s in sentences]
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        if missing:
+            t0 = time.perf_counter()
+            fresh = embed_texts([sentences[i] for i in missing])
+            per_ms = (time.perf_counter() - t0) * 1000.0 / len(missing)
+            for i, v in zip(missing, fresh):
+                self._sent_cache.put(sentences[i], v, per_ms)
+                vecs[i] = v
+        return (np.asarray(vecs, dtype=np.float32) @ np.asarray(embed_query(question), dtype=np.float32)).tolist()
+
+    def score(self, question: str, sentences: List[str]) -> List[float]:
+        # the hash fallback embedder carries no meaning; use bm25 until the model is loaded
+        if self.scorer == 'embed' and embedder_ready():
+            return self._embed_scores(question, sentences)
+        return bm25_scores(question, sentences)
+
+    def compress(self, question: str, blocks: List[Dict], budget_tokens: int) -> List[Dict]:
+        """Blocks (same order, same count) whose text fits budget_tokens."""
+        t0 = time.perf_counter()
+        tokens_in = sum(est_tokens(b['text']) for b in blocks)
+        if tokens_in <= budget_tokens:
+            self._record(t0, tokens_in, tokens_in, False)
+            return blocks
+        split = [split_sentences(b['text']) for b in blocks]
+        sents: List[List[str]] = [[s for _, s in ss] for ss in split]
+        lines: List[List[int]] = [[ln for ln, _ in ss] for ss in split]
+        flat: List[Tuple[int, int]] = [(bi, si) for bi, ss in enumerate(sents) for si in range(len(ss))]
+        scores = dict(zip(flat, self.score(question, [sents[bi][si] for bi, si in flat])))
+        if not any(v > 0 for v in scores.values()):
+            self._record(t0, tokens_in, tokens_in, False)
+            return blocks
+        keep = set()
+        used = 0
+
+        def add(bi: int, si: int, force: bool = False) -> bool:
+            nonlocal used
+            if (bi, si) in keep:
+                return True
+            if si < 0 or si >= len(sents[bi]):
+                return False
+            t = est_tokens(sents[bi][si])
+            if used + t > budget_tokens and not force:
+                return False
+            keep.add((bi, si))
+            used += t
+            return True
+
+        # one sentence per block even past the budget, so no citation number disappears
+        for bi, ss in enumerate(sents):
+            if ss:
+                add(bi, max(range(len(ss)), key=lambda si: scores[(bi, si)]), force=True)
+        for bi, si in sorted(flat, key=lambda k: scores[k], reverse=True):
+            # sentences sharing nothing with the question only come in as neighbours
+            if scores[(bi, si)] > 0 and add(bi, si):
+                for d in range(1, self.neighbours + 1):
+                    add(bi, si - d)
+                    add(bi, si + d)
+        # leftover budget: remaining sentences in document order
+        for bi, si in flat:
+            add(bi, si)
+
+        out = []
+        for bi, b in enumerate(blocks):
+            parts, prev = [], None
+            for si in sorted(si for (k, si) in keep if k == bi):
+                if prev is not None:
+                    if si != prev + 1:
+                        parts.append(_GAP)
+                    else:
+                        parts.append('\n' if lines[bi][si] != lines[bi][prev] else ' ')
+                parts.append(sents[bi][si])
+                prev = si
+            out.append({**b, 'text': ''.join(parts)} if parts else b)
+        self._record(t0, tokens_in, sum(est_tokens(b['text']) for b in out), True)
+        return out
+
+    def _record(self, t0: float, tokens_in: int, tokens_out: int, compressed: bool):
+        with self._lock:
+            self._calls += 1
+            self._compressed += int(compressed)
+            self._tokens_in += tokens_in
+            self._tokens_out += tokens_out
+            self._ms += (time.perf_counter() - t0) * 1000.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'scorer': self.scorer,
+                'neighbours': self.neighbours,
+                'calls': self._calls,
+                'compressed': self._compressed,
+                'tokens_in': self._tokens_in,
+                'tokens_out': self._tokens_out,
+                'token_reduction': round(1.0 - self._tokens_out / self._tokens_in, 4) if self._tokens_in else 0.0,
+                'avg_ms': round(self._ms / self._calls, 2) if self._calls else 0.0,
+                'sentence_cache': self._sent_cache.stats() if self.scorer == 'embed' else None,
+            }
+
+
+compressor = ContextCompressor(COMPRESS_SCORER, COMPRESS_NEIGHBOURS, COMPRESS_SENT_CACHE_SIZE)
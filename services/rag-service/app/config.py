@@ -5,6 +5,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = Path(os.getenv('DATA_DIR', BASE_DIR.parent.parent / 'services' / 'ingestion-service' / 'data'))
 CHROMA_DIR = DATA_DIR / 'chroma'
 SQLITE_PATH = DATA_DIR / 'db' / 'ingestion.db'
+INDEX_VERSION_PATH = DATA_DIR / 'db' / 'index_version'  # bumped by ingestion after each run
 
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'BAAI/bge-m3')
 EMBED_BATCH = int(os.getenv('EMBED_BATCH', '32'))
@@ -18,4 +19,112 @@ LLM_MAX_TOKENS = int(os.getenv('LLM_MAX_TOKENS', '512'))
 LLM_TEMPERATURE = float(os.getenv('LLM_TEMPERATURE', '0.4'))
 LLM_ENABLE = os.getenv('LLM_ENABLE', '0') in ('1', 'true', 'True')
 LLM_4BIT = os.getenv('LLM_4BIT', '1') in ('1','true','True')
+# Speculative decoding: a small draft model with the main model's tokenizer (or a
+# compatible one) proposes LLM_DRAFT_LOOKAHEAD tokens per step; empty = off
+LLM_DRAFT_MODEL = os.getenv('LLM_DRAFT_MODEL', '')
+LLM_DRAFT_LOOKAHEAD = int(os.getenv('LLM_DRAFT_LOOKAHEAD', '5'))
+# Keep the past key/values of the system-instruction prefix (prompts.py) and seed
+# every request from a copy; SYSTEM_PROMPT_PATH overrides the built-in instruction
+LLM_PREFIX_CACHE = os.getenv('LLM_PREFIX_CACHE', '1') in ('1', 'true', 'True')
+SYSTEM_PROMPT_PATH = os.getenv('SYSTEM_PROMPT_PATH', '')
+# In-process generation batches concurrent prompts (see gen_scheduler.py): up to
+# LLM_BATCH_MAX rows and LLM_BATCH_MAX_TOKENS padded tokens (prompt + LLM_MAX_TOKENS each)
+LLM_BATCH_ENABLE = os.getenv('LLM_BATCH_ENABLE', '1') in ('1', 'true', 'True')
+LLM_BATCH_MAX = int(os.getenv('LLM_BATCH_MAX', '8'))
+LLM_BATCH_MAX_TOKENS = int(os.getenv('LLM_BATCH_MAX_TOKENS', '16384'))
+LLM_BATCH_WINDOW_MS = float(os.getenv('LLM_BATCH_WINDOW_MS', '20'))
+# transformers: load LLM_MODEL in-process; openai: call an OpenAI-compatible server
+# (llama.cpp server, vLLM, ...) at LLM_HTTP_URL so the model tier scales on its own
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'transformers').lower()
+LLM_HTTP_URL = os.getenv('LLM_HTTP_URL', 'http://127.0.0.1:8080').rstrip('/')
+LLM_HTTP_MODEL = os.getenv('LLM_HTTP_MODEL', LLM_MODEL)
+LLM_HTTP_API_KEY = os.getenv('LLM_HTTP_API_KEY', '')
+LLM_HTTP_POOL = int(os.getenv('LLM_HTTP_POOL', '16'))
+LLM_HTTP_CONNECT_TIMEOUT_S = float(os.getenv('LLM_HTTP_CONNECT_TIMEOUT_S', '3'))
+LLM_HTTP_READ_TIMEOUT_S = float(os.getenv('LLM_HTTP_READ_TIMEOUT_S', '120'))
+LLM_HTTP_RETRIES = int(os.getenv('LLM_HTTP_RETRIES', '2'))
 
+# Serving executors: blocking retrieval / generation run off the event loop
+RETRIEVAL_WORKERS = int(os.getenv('RETRIEVAL_WORKERS', '4'))
+RETRIEVAL_QUEUE = int(os.getenv('RETRIEVAL_QUEUE', '32'))
+# with batching the generation workers only wait on the scheduler, so allow a full batch
+GENERATION_WORKERS = int(os.getenv('GENERATION_WORKERS', str(LLM_BATCH_MAX) if LLM_BATCH_ENABLE else '1'))
+GENERATION_QUEUE = int(os.getenv('GENERATION_QUEUE', '8'))
+
+# hybrid_retrieve runs the semantic and keyword legs concurrently; a leg that
+# misses its deadline is dropped and the response is marked degraded; legs
+# still queued at the deadline are cancelled, and a full leg queue answers 503
+RETRIEVAL_LEG_WORKERS = int(os.getenv('RETRIEVAL_LEG_WORKERS', '8'))
+RETRIEVAL_LEG_QUEUE = int(os.getenv('RETRIEVAL_LEG_QUEUE', '8'))
+SEMANTIC_TIMEOUT_MS = int(os.getenv('SEMANTIC_TIMEOUT_MS', '3000'))
+KEYWORD_TIMEOUT_MS = int(os.getenv('KEYWORD_TIMEOUT_MS', '1500'))
+
+# Read-only SQLite connections (one per worker thread)
+SQLITE_MMAP_BYTES = int(os.getenv('SQLITE_MMAP_BYTES', str(256 * 1024 * 1024)))
+SQLITE_CACHE_KB = int(os.getenv('SQLITE_CACHE_KB', str(64 * 1024)))
+SQLITE_STMT_CACHE = int(os.getenv('SQLITE_STMT_CACHE', '128'))
+
+# Query embedding LRU (0 disables); set QUERY_EMBED_CACHE_PATH to persist across restarts
+QUERY_EMBED_CACHE_SIZE = int(os.getenv('QUERY_EMBED_CACHE_SIZE', '2048'))
+QUERY_EMBED_CACHE_PATH = os.getenv('QUERY_EMBED_CACHE_PATH', '')
+
+# Retrieval result cache for /rag/query and the retrieval half of /rag/answer.
+# memory = per process, sqlite = file shared by all workers on the host, off = disabled
+RESULT_CACHE_BACKEND = os.getenv('RESULT_CACHE_BACKEND', 'memory').lower()
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '1024'))
+RESULT_CACHE_TTL_S = float(os.getenv('RESULT_CACHE_TTL_S', '900'))
+RESULT_CACHE_PATH = Path(os.getenv('RESULT_CACHE_PATH', BASE_DIR / 'cache' / 'result_cache.db'))
+
+# Semantic answer cache for /rag/answer: reuse an answer when the question embedding
+# (cosine) and the retrieved doc_id set (Jaccard) are both close enough
+ANSWER_CACHE_ENABLE = os.getenv('ANSWER_CACHE_ENABLE', '1') in ('1', 'true', 'True')
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '512'))
+ANSWER_CACHE_SIM = float(os.getenv('ANSWER_CACHE_SIM', '0.92'))
+ANSWER_CACHE_OVERLAP = float(os.getenv('ANSWER_CACHE_OVERLAP', '0.8'))
+ANSWER_CACHE_TTL_S = float(os.getenv('ANSWER_CACHE_TTL_S', '3600'))
+
+# Query embedding micro-batcher: concurrent cache misses within the window share one encode
+EMBED_BATCHER_ENABLE = os.getenv('EMBED_BATCHER_ENABLE', '1') in ('1', 'true', 'True')
+EMBED_BATCH_WINDOW_MS = float(os.getenv('EMBED_BATCH_WINDOW_MS', '5'))
+EMBED_BATCH_MAX = int(os.getenv('EMBED_BATCH_MAX', '32'))
+
+# Vector search backend: chroma (HNSW), numpy (exact, memory-mapped export of the collection),
+# int8 / binary (quantized codes in RAM, shortlist of VECTOR_RESCORE rescored with float vectors)
+VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'chroma').lower()
+VECTOR_INDEX_DIR = Path(os.getenv('VECTOR_INDEX_DIR', BASE_DIR / 'cache' / 'vector_index'))
+VECTOR_RESCORE = int(os.getenv('VECTOR_RESCORE', '100'))
+
+# Optional cross-encoder rerank between hybrid_retrieve and pack_context: the top
+# RERANK_CANDIDATES by RRF are scored and the best RERANK_KEEP are packed. If scoring
+# misses RERANK_BUDGET_MS the RRF order is used (response marked degraded: rerank).
+RERANK_ENABLE = os.getenv('RERANK_ENABLE', '0') in ('1', 'true', 'True')
+RERANK_MODEL = os.getenv('RERANK_MODEL', 'BAAI/bge-reranker-v2-m3')
+RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', '24'))
+RERANK_KEEP = int(os.getenv('RERANK_KEEP', '5'))
+RERANK_BUDGET_MS = float(os.getenv('RERANK_BUDGET_MS', '300'))
+RERANK_CACHE_SIZE = int(os.getenv('RERANK_CACHE_SIZE', '8192'))
+RERANK_BATCH = int(os.getenv('RERANK_BATCH', '32'))
+RERANK_MAX_LENGTH = int(os.getenv('RERANK_MAX_LENGTH', '512'))
+# scoring batches running or waiting for the model; a full queue waits up to the budget
+RERANK_QUEUE = int(os.getenv('RERANK_QUEUE', '4'))
+
+# Context packing: greedy MMR-per-token fill of TOKEN_BUDGET (see packing.py)
+PACK_MMR_LAMBDA = float(os.getenv('PACK_MMR_LAMBDA', '0.7'))
+PACK_DUP_SIM = float(os.getenv('PACK_DUP_SIM', '0.95'))
+PACK_MIN_TOKENS = int(os.getenv('PACK_MIN_TOKENS', '64'))
+
+# Extractive compression of the packed context (see compress.py): when it exceeds
+# COMPRESS_BUDGET tokens, keep the best sentences (bm25, or cached sentence
+# embeddings with COMPRESS_SCORER=embed) and COMPRESS_NEIGHBOURS either side.
+# Opt-in: bm25 needs pythainlp word segmentation to score Thai text.
+COMPRESS_ENABLE = os.getenv('COMPRESS_ENABLE', '0') in ('1', 'true', 'True')
+COMPRESS_BUDGET = int(os.getenv('COMPRESS_BUDGET', '600'))
+COMPRESS_SCORER = os.getenv('COMPRESS_SCORER', 'bm25').lower()
+COMPRESS_NEIGHBOURS = int(os.getenv('COMPRESS_NEIGHBOURS', '1'))
+COMPRESS_SENT_CACHE_SIZE = int(os.getenv('COMPRESS_SENT_CACHE_SIZE', '20000'))
+COMPRESS_BM25_K1 = float(os.getenv('COMPRESS_BM25_K1', '1.5'))
+COMPRESS_BM25_B = float(os.getenv('COMPRESS_BM25_B', '0.75'))
+
+# Startup: load models in the background and run warm-up queries; /ready is 503 until done
+WARMUP_ENABLE = os.getenv('WARMUP_ENABLE', '1') in ('1', 'true', 'True')
+WARMUP_QUESTION = os.getenv('WARMUP_QUESTION', 'ค่าธรรมเนียมการศึกษา')
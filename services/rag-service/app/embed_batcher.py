@@ -0,0 +1,89 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-query encodes into one model call.
+
+    The first query to arrive opens a window of `window_ms`; everything queued
+    before the window closes (up to `max_batch`) is encoded together and each
+    caller gets its own row back. Identical texts in a batch are encoded once.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]], window_ms: float, max_batch: int):
+        self.encode = encode
+        self.window_s = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        self._encode_ms = 0.0
+        self._wait_ms = 0.0
+        self._sizes: Dict[int, int] = {}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name='embed-batcher', daemon=True)
+                    self._thread.start()
+
+    def embed(self, text: str) -> List[float]:
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((text, time.perf_counter(), fut))
+        return fut.result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            texts = list(dict.fromkeys(text for text, _, _ in batch))
+            t0 = time.perf_counter()
+            try:
+                vecs = dict(zip(texts, self.encode(texts)))
+            except Exception as e:
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            done = time.perf_counter()
+            for text, _, fut in batch:
+                fut.set_result(vecs[text])
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._max_seen = max(self._max_seen, len(batch))
+                self._encode_ms += (done - t0) * 1000.0
+                self._wait_ms += sum((t0 - queued) * 1000.0 for _, queued, _ in batch)
+                self._sizes[len(batch)] = self._sizes.get(len(batch), 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'window_ms': self.window_s * 1000.0,
+                'max_batch': self.max_batch,
+                'batches': self._batches,
+                'items': self._items,
+                'avg_batch_size': round(self._items / self._batches, 2) if self._batches else 0.0,
+                'max_batch_seen': self._max_seen,
+                'avg_encode_ms': round(self._encode_ms / self._batches, 2) if self._batches else 0.0,
+                'avg_queue_wait_ms': round(self._wait_ms / self._items, 2) if self._items else 0.0,
+                'batch_sizes': dict(sorted(self._sizes.items())),
+            }
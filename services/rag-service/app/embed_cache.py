@@ -0,0 +1,97 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query vectors keyed by (model id, normalized question).
+
+    Optionally persisted to an .npz file so popular questions stay warm across
+    restarts. Every hit is credited with the running mean cost of a miss.
+    """
+
+    def __init__(self, model_id: str, max_entries: int, persist_path: Optional[str] = None):
+        self.model_id = model_id
+        self.max_entries = max(0, max_entries)
+        self.persist_path = Path(persist_path) if persist_path else None
+        self._data: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._embed_ms_total = 0.0
+        self._saved_ms = 0.0
+        self.load()
+
+    def _key(self, text: str) -> str:
+        return f"{self.model_id}\x00{text}"
+
+    def get(self, text: str) -> Optional[List[float]]:
+        if not self.max_entries:
+            return None
+        key = self._key(text)
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is None:
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            if self._misses:
+                self._saved_ms += self._embed_ms_total / self._misses
+            return vec
+
+    def put(self, text: str, vec: List[float], embed_ms: float):
+        with self._lock:
+            self._misses += 1
+            self._embed_ms_total += embed_ms
+            if not self.max_entries:
+                return
+            self._data[self._key(text)] = vec
+            self._data.move_to_end(self._key(text))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'model': self.model_id,
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'avg_embed_ms': round(self._embed_ms_total / self._misses, 2) if self._misses else 0.0,
+                'saved_ms': round(self._saved_ms, 1),
+            }
+
+    def load(self):
+        if not self.persist_path or not self.max_entries or not self.persist_path.exists():
+            return
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as z:
+                keys, vecs = z['keys'].tolist(), z['vectors']
+            prefix = self._key('')
+            with self._lock:
+                for k, v in zip(keys[-self.max_entries:], vecs[-self.max_entries:]):
+                    if k.startswith(prefix):
+                        self._data[k] = v.tolist()
+            print(f"[embed-cache] loaded {len(self._data)} query vectors from {self.persist_path}")
+        except Exception as e:
+            print(f"[embed-cache] ignoring unreadable cache {self.persist_path}: {e}")
+
+    def save(self):
+        if not self.persist_path or not self._data:
+            return
+        with self._lock:
+            keys = list(self._data.keys())
+            vecs = np.asarray(list(self._data.values()), dtype=np.float32)
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.persist_path.with_name(self.persist_path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, keys=np.asarray(keys), vectors=vecs)
+        os.replace(tmp, self.persist_path)
+        print(f"[embed-cache] saved {len(keys)} query vectors to {self.persist_path}")
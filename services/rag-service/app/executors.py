@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Any
+
+from .config import (RETRIEVAL_WORKERS, RETRIEVAL_QUEUE, GENERATION_WORKERS, GENERATION_QUEUE,
+                     RETRIEVAL_LEG_WORKERS, RETRIEVAL_LEG_QUEUE)
+
+
+class ExecutorBusy(Exception):
+    """Raised when an executor's queue is full; mapped to HTTP 503."""
+
+
+class BoundedExecutor:
+    """Thread pool with a hard cap on queued work, awaitable from the event loop.
+
+    Blocking calls (retrieval, model.generate) run here so the event loop keeps
+    serving /health and other requests while they are in flight.
+    """
+
+    def __init__(self, name: str, workers: int, queue_depth: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._running = 0
+        self._completed = 0
+        self._cancelled = 0
+        self._rejected = 0
+
+    def _call(self, fn: Callable, args, kwargs):
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _done(self, fut: Future):
+        with self._lock:
+            self._inflight -= 1
+            if fut.cancelled():
+                self._cancelled += 1
+            else:
+                self._completed += 1
+        self._slots.release()
+
+    def submit_future(self, fn: Callable, *args, **kwargs) -> Future:
+        """Claim a slot now (ExecutorBusy if none); a plain Future for callers on worker threads.
+
+        Cancelling the future before it starts frees its slot.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorBusy(f"{self.name} executor is full ({self.workers} running + {self.queue_depth} queued)")
+        with self._lock:
+            self._inflight += 1
+        fut = self._pool.submit(self._call, fn, args, kwargs)
+        fut.add_done_callback(self._done)
+        return fut
+
+    def submit(self, fn: Callable, *args, **kwargs) -> 'asyncio.Future':
+        """Claim a slot now (ExecutorBusy if none) and return an awaitable for the result."""
+        return asyncio.wrap_future(self.submit_future(fn, *args, **kwargs))
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        return await self.submit(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'running': self._running,
+                'queued': max(0, self._inflight - self._running),
+                'completed': self._completed,
+                'cancelled': self._cancelled,
+                'rejected': self._rejected,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+retrieval_executor = BoundedExecutor('retrieval', RETRIEVAL_WORKERS, RETRIEVAL_QUEUE)
+generation_executor = BoundedExecutor('generation', GENERATION_WORKERS, GENERATION_QUEUE)
+# semantic/keyword legs of one retrieval, submitted from retrieval workers
+leg_executor = BoundedExecutor('retrieval-leg', RETRIEVAL_LEG_WORKERS, RETRIEVAL_LEG_QUEUE)
@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+# metadata fields that accept a list of allowed values
+_IN_FIELDS = ('source', 'file_type', 'sensitivity', 'owner')
+# (request field, metadata field, operator)
+_RANGE_FIELDS = (
+    ('page_min', 'page_start', '>='),
+    ('page_max', 'page_start', '<='),
+    ('updated_after', 'updated_at', '>='),
+    ('updated_before', 'updated_at', '<'),
+)
+_CHROMA_OPS = {'>=': '$gte', '<=': '$lte', '<': '$lt'}
+
+
+class RagFilter(BaseModel):
+    """Metadata restriction applied inside both retrieval legs.
+
+    List fields match any of the given values; updated_* are epoch seconds
+    (the unit ingestion stores in `updated_at`).
+    """
+    source: Optional[List[str]] = None
+    file_type: Optional[List[str]] = None
+    sensitivity: Optional[List[str]] = None
+    owner: Optional[List[str]] = None
+    page_min: Optional[int] = None
+    page_max: Optional[int] = None
+    updated_after: Optional[int] = None
+    updated_before: Optional[int] = None
+
+    def _conditions(self):
+        for field in _IN_FIELDS:
+            values = getattr(self, field)
+            if values:
+                yield field, 'in', list(values)
+        for attr, field, op in _RANGE_FIELDS:
+            value = getattr(self, attr)
+            if value is not None:
+                yield field, op, value
+
+    def is_empty(self) -> bool:
+        return next(self._conditions(), None) is None
+
+    def cache_key(self) -> List:
+        return [[f, op, v] for f, op, v in self._conditions()]
+
+    def to_chroma_where(self) -> Optional[Dict[str, Any]]:
+        clauses = [{f: {'$in': v} if op == 'in' else {_CHROMA_OPS[op]: v}} for f, op, v in self._conditions()]
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+    def to_sql(self, alias: str = 'd') -> Tuple[str, List[Any]]:
+        """(' AND '-joined predicates on the documents table, params); ('', []) if empty."""
+        clauses, params = [], []
+        for f, op, v in self._conditions():
+            if op == 'in':
+                clauses.append(f"{alias}.{f} IN ({','.join('?' for _ in v)})")
+                params.extend(v)
+            else:
+                clauses.append(f"{alias}.{f} {op} ?")
+                params.append(v)
+        return ' AND '.join(clauses), params
+
+    def matches(self, meta: Dict[str, Any]) -> bool:
+        """Python evaluation of the same predicate, for the in-process vector indexes."""
+        for f, op, v in self._conditions():
+            x = meta.get(f)
+            if op == 'in':
+                if x not in v:
+                    return False
+            elif x is None or not ((op == '>=' and x >= v) or (op == '<=' and x <= v) or (op == '<' and x < v)):
+                return False
+        return True
@@ -0,0 +1,270 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List
+
+try:
+    import torch
+    from transformers import (LogitsProcessorList, RepetitionPenaltyLogitsProcessor, TemperatureLogitsWarper,
+                              TopPLogitsWarper)
+except Exception:
+    torch = None  # type: ignore
+
+from .config import LLM_MAX_TOKENS, LLM_TEMPERATURE, LLM_BATCH_MAX, LLM_BATCH_MAX_TOKENS, LLM_BATCH_WINDOW_MS
+
+
+def _select_rows(past, idx):
+    """Keep only batch rows `idx` of a KV cache (DynamicCache or legacy tuples)."""
+    if hasattr(past, 'batch_select_indices'):
+        past.batch_select_indices(idx)
+        return past
+    return tuple(tuple(t[idx] for t in layer) for layer in past)
+
+
+class GenerationScheduler:
+    """Batches concurrent prompts into one decode loop on a single model thread.
+
+    Queued prompts are grouped into left-padded batches of at most `max_batch`
+    rows and `max_tokens` padded tokens (prompt + LLM_MAX_TOKENS per row).
+    Decoding is done step by step with the KV cache so that a row that hits
+    EOS, its token limit or a cancelled stream is answered immediately and
+    dropped from the cache; the rest of the batch continues with fewer rows.
+    Prompts whose stream was cancelled while queued are never admitted.
+    """
+
+    def __init__(self, engine, max_batch: int = LLM_BATCH_MAX, max_tokens: int = LLM_BATCH_MAX_TOKENS,
+                 window_ms: float = LLM_BATCH_WINDOW_MS):
+        self.engine = engine
+        self.max_batch = max(1, max_batch)
+        self.max_tokens = max_tokens
+        self.window_s = window_ms / 1000.0
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        # a fast tokenizer is not safe to share across threads: encode (submit) and decode (loop) take turns
+        self._tok_lock = threading.Lock()
+        self._thread = None
+        self._processors = None
+        # counters are written by the model thread and read by /stats
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._padded_tokens = 0
+        self._generated = 0
+        self._released_early = 0
+        self._cancelled = 0
+        self._busy_s = 0.0
+        self._max_depth = 0
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='llm-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, prompt: str, stream=None) -> str:
+        """Blocks the calling (generation executor) thread until this prompt's answer is ready.
+
+        The prompt is tokenized here, outside the queue lock, so a tokenizer
+        error fails only this request.
+        """
+        with self._tok_lock:
+            ids = self.engine.tokenizer(prompt)['input_ids']
+        req = {
+            'ids': ids,
+            'stream': stream,
+            'future': Future(),
+            # incremental detokenization window: text of ids[prefix:read] was already streamed
+            'prefix': 0,
+            'read': 0,
+        }
+        with self._cond:
+            self._start()
+            self._queue.append(req)
+            with self._stats_lock:
+                self._max_depth = max(self._max_depth, len(self._queue))
+            self._cond.notify()
+        return req['future'].result()
+
+    def _cost(self, rows: int, width: int) -> int:
+        return rows * (width + LLM_MAX_TOKENS)
+
+    def _drop_cancelled(self):
+        """Answer queued requests whose client already went away instead of decoding them (holds _cond)."""
+        keep = deque()
+        for r in self._queue:
+            if r['stream'] is not None and r['stream'].cancel.is_set():
+                r['future'].set_result("(empty response)")
+                with self._stats_lock:
+                    self._cancelled += 1
+            else:
+                keep.append(r)
+        self._queue = keep
+
+    def _take_batch(self) -> List[Dict]:
+        with self._cond:
+            while True:
+                while not self._queue:
+                    self._cond.wait()
+                # give concurrent arrivals a moment to join
+                deadline = time.monotonic() + self.window_s
+                while len(self._queue) < self.max_batch:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                self._drop_cancelled()
+                if self._queue:
+                    break
+            batch = [self._queue.popleft()]
+            width = len(batch[0]['ids'])
+            while self._queue and len(batch) < self.max_batch:
+                w = max(width, len(self._queue[0]['ids']))
+                if self._cost(len(batch) + 1, w) > self.max_tokens:
+                    break
+                batch.append(self._queue.popleft())
+                width = w
+            return batch
+
+    def _loop(self):
+        # nothing may escape this loop: a dead thread would leave every later submit() waiting forever
+        while True:
+            batch: List[Dict] = []
+            t0 = time.perf_counter()
+            try:
+                batch = self._take_batch()
+                t0 = time.perf_counter()
+                self._run_batch(batch)
+            except Exception as e:
+                print(f"[LLM] batch of {len(batch)} failed: {e}")
+                for r in batch:
+                    if not r['future'].done():
+                        r['future'].set_exception(e)
+            with self._stats_lock:
+                self._busy_s += time.perf_counter() - t0
+
+    def _logits_processors(self):
+        if self._processors is None:
+            self._processors = LogitsProcessorList([
+                RepetitionPenaltyLogitsProcessor(1.1),
+                TemperatureLogitsWarper(LLM_TEMPERATURE),
+                TopPLogitsWarper(0.9),
+            ])
+        return self._processors
+
+    def _eos_ids(self) -> set:
+        eos = getattr(getattr(self.engine.model, 'generation_config', None), 'eos_token_id', None)
+        if eos is None:
+            eos = self.engine.tokenizer.eos_token_id
+        return set(eos if isinstance(eos, (list, tuple)) else [eos])
+
+    def _emit(self, r: Dict, ids: List[int]):
+        """Stream the text of new tokens, decoding only a short window instead of the whole answer.
+
+        ids[prefix:read] is decoded again as context so that tokenizers which
+        render a leading space/byte differently at the start of a slice still
+        yield the right suffix.
+        """
+        if r['stream'] is None:
+            return
+        with self._tok_lock:
+            seen = self.engine.tokenizer.decode(ids[r['prefix']:r['read']], skip_special_tokens=True)
+            text = self.engine.tokenizer.decode(ids[r['prefix']:], skip_special_tokens=True)
+        # a multi-byte character split across tokens decodes as U+FFFD until complete
+        if len(text) > len(seen) and not text.endswith('\ufffd'):
+            r['stream'].push(text[len(seen):])
+            r['prefix'], r['read'] = r['read'], len(ids)
+
+    def _finish(self, r: Dict, ids: List[int]):
+        with self._tok_lock:
+            text = self.engine.tokenizer.decode(ids, skip_special_tokens=True).strip()
+        r['future'].set_result(text or "(empty response)")
+
+    def _run_batch(self, batch: List[Dict]):
+        tok, model = self.engine.tokenizer, self.engine.model
+        device = model.device
+        eos = self._eos_ids()
+        pad = tok.pad_token_id if tok.pad_token_id is not None else next(iter(eos))
+        past, plen = None, 0
+        if self.engine.prefix_cache is not None:
+            # rows are laid out [shared prefix][pads][own suffix]; pads are masked out
+            past, plen = self.engine.prefix_cache.seed([r['ids'] for r in batch])
+        rows = [r['ids'][plen:] for r in batch]
+        n, width = len(batch), max(len(ids) for ids in rows)
+        input_ids = torch.full((n, width), pad, dtype=torch.long)
+        mask = torch.ones((n, plen + width), dtype=torch.long)
+        for i, ids in enumerate(rows):
+            input_ids[i, width - len(ids):] = torch.tensor(ids, dtype=torch.long)
+            mask[i, plen:plen + width - len(ids)] = 0
+        input_ids, mask = input_ids.to(device), mask.to(device)
+        positions = (mask.cumsum(-1) - 1).clamp(min=0)[:, plen:]
+        last_pos = positions[:, -1]
+        # the repetition penalty sees the prefix too, as it does with model.generate
+        seqs = torch.cat([torch.tensor([batch[0]['ids'][:plen]] * n, dtype=torch.long, device=device), input_ids], dim=-1)
+        step_ids = input_ids
+        active = list(range(n))
+        gen: List[List[int]] = [[] for _ in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += n
+            self._padded_tokens += n * width
+        processors = self._logits_processors()
+        with torch.no_grad():
+            for step in range(LLM_MAX_TOKENS):
+                out = model(input_ids=step_ids, attention_mask=mask, position_ids=positions,
+                            past_key_values=past, use_cache=True)
+                past = out.past_key_values
+                scores = processors(seqs, out.logits[:, -1, :].float())
+                next_ids = torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1)
+                seqs = torch.cat([seqs, next_ids], dim=-1)
+                keep = []
+                generated = cancelled_rows = 0
+                for row, i in enumerate(active):
+                    t, r = int(next_ids[row, 0]), batch[i]
+                    if t not in eos:
+                        gen[i].append(t)
+                        generated += 1
+                        self._emit(r, gen[i])
+                    cancelled = r['stream'] is not None and r['stream'].cancel.is_set()
+                    if t in eos or len(gen[i]) >= LLM_MAX_TOKENS or cancelled:
+                        cancelled_rows += int(cancelled)
+                        self._finish(r, gen[i])
+                    else:
+                        keep.append(row)
+                with self._stats_lock:
+                    self._generated += generated
+                    self._cancelled += cancelled_rows
+                    if keep:
+                        self._released_early += len(active) - len(keep)
+                if not keep:
+                    break
+                if len(keep) < len(active):
+                    idx = torch.tensor(keep, device=device)
+                    past = _select_rows(past, idx)
+                    seqs, mask, next_ids, last_pos = seqs[idx], mask[idx], next_ids[idx], last_pos[idx]
+                    active = [active[k] for k in keep]
+                mask = torch.cat([mask, mask.new_ones((len(active), 1))], dim=-1)
+                last_pos = last_pos + 1
+                positions = last_pos.unsqueeze(-1)
+                step_ids = next_ids
+
+    def stats(self) -> Dict:
+        with self._cond:
+            depth = len(self._queue)
+        with self._stats_lock:
+            return self._stats(depth)
+
+    def _stats(self, depth: int) -> Dict:
+        return {
+            'max_batch': self.max_batch,
+            'max_tokens': self.max_tokens,
+            'queue_depth': depth,
+            'max_queue_depth': self._max_depth,
+            'batches': self._batches,
+            'avg_batch_rows': round(self._rows / self._batches, 2) if self._batches else 0.0,
+            'avg_occupancy': round(self._rows / (self._batches * self.max_batch), 4) if self._batches else 0.0,
+            'avg_padded_prompt_tokens': round(self._padded_tokens / self._batches, 1) if self._batches else 0.0,
+            'generated_tokens': self._generated,
+            'tokens_per_s': round(self._generated / self._busy_s, 2) if self._busy_s else 0.0,
+            'released_early': self._released_early,
+            'cancelled': self._cancelled,
+        }
@@ -1,29 +1,148 @@
 import os
-import torch
-from typing import Optional
-from .config import LLM_MODEL, LLM_MAX_TOKENS, LLM_TEMPERATURE, LLM_ENABLE, LLM_4BIT
+import queue
+import threading
+from typing import Dict, Optional
+from .config import (LLM_BACKEND, LLM_MODEL, LLM_MAX_TOKENS, LLM_TEMPERATURE, LLM_ENABLE, LLM_4BIT, LLM_BATCH_ENABLE,
+                     LLM_PREFIX_CACHE, LLM_DRAFT_MODEL)
+from .gen_scheduler import GenerationScheduler
+from .prefix_cache import PrefixKVCache
+from .speculative import DraftModel
 
 try:
-    from transformers import AutoTokenizer, AutoModelForCausalLM
+    import torch
+except Exception:
+    torch = None  # type: ignore
+
+try:
+    from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList, TextStreamer
 except Exception:
     AutoTokenizer = None  # type: ignore
     AutoModelForCausalLM = None  # type: ignore
+    StoppingCriteria = object  # type: ignore
+    StoppingCriteriaList = list  # type: ignore
+    TextStreamer = object  # type: ignore
+
+_END = object()
+
+
+class TokenStream:
+    """Text pieces handed from the generating thread to the response writer.
+
+    `cancel` is checked by the model between decoding steps; setting it (e.g.
+    on client disconnect) ends generation early and frees the generation slot.
+    """
+
+    def __init__(self):
+        self.cancel = threading.Event()
+        self._q: 'queue.Queue' = queue.Queue()
+
+    def push(self, text: str):
+        self._q.put(text)
+
+    def close(self):
+        self._q.put(_END)
+
+    def next(self, timeout: float) -> Optional[str]:
+        """Next piece, '' if none arrived within `timeout`, None at end of stream."""
+        try:
+            item = self._q.get(timeout=timeout)
+        except queue.Empty:
+            return ''
+        return None if item is _END else item
+
+
+class _StreamPusher(TextStreamer):
+    def __init__(self, tokenizer, out: TokenStream):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.out = out
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.out.push(text)
+
+
+class _StopOnCancel(StoppingCriteria):
+    def __init__(self, cancel: threading.Event):
+        self.cancel = cancel
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.cancel.is_set()
+
+class LLMBackend:
+    """What the endpoints need from a generator; `generate` runs on the generation executor."""
+
+    name = 'base'
+
+    def load(self):
+        pass
+
+    @property
+    def ready(self) -> bool:
+        """True when answers come from a real model (not a disabled/unavailable notice)."""
+        raise NotImplementedError
+
+    def generate(self, prompt: str, stream: Optional[TokenStream] = None) -> str:
+        """Full answer text; with `stream`, pieces are also pushed as they are decoded."""
+        try:
+            if not LLM_ENABLE:
+                return self._notice(stream, "(LLM disabled: set LLM_ENABLE=1 to enable generation)")
+            if stream is not None and stream.cancel.is_set():
+                return ''  # client left while the request was queued
+            return self._generate(prompt, stream)
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def _generate(self, prompt: str, stream: Optional[TokenStream]) -> str:
+        raise NotImplementedError
+
+    def warmup(self):
+        """Load and run one tiny generation; raises if the backend cannot generate."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {'backend': self.name, 'enabled': LLM_ENABLE, 'ready': self.ready}
+
+    @staticmethod
+    def _notice(stream: Optional[TokenStream], text: str) -> str:
+        if stream is not None:
+            stream.push(text)
+        return text
+
+
+class TransformersEngine(LLMBackend):
+    """In-process Hugging Face model (LLM_BACKEND=transformers)."""
+
+    name = 'transformers'
 
-class LLMEngine:
     def __init__(self, model_name: str):
         self.model_name = model_name
         self.tokenizer: Optional[object] = None
         self.model: Optional[object] = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = "cuda" if torch is not None and torch.cuda.is_available() else "cpu"
         self._load_error: Optional[str] = None
+        self.scheduler = GenerationScheduler(self) if LLM_BATCH_ENABLE else None
+        self.prefix_cache = PrefixKVCache(self) if LLM_PREFIX_CACHE else None
+        self.draft = DraftModel() if LLM_DRAFT_MODEL else None
+        # several generation workers may call load() at once
+        self._load_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
 
     def load(self):
         if not LLM_ENABLE:
             return
         if self.model is not None:
             return
-        if AutoTokenizer is None or AutoModelForCausalLM is None:
-            self._load_error = "transformers not installed"
+        with self._load_lock:
+            if self.model is None and not self._load_error:
+                self._load()
+
+    def _load(self):
+        if torch is None or AutoTokenizer is None or AutoModelForCausalLM is None:
+            self._load_error = "torch/transformers not installed"
             return
         try:
             print(f"[LLM] Loading model {self.model_name} on {self.device} (4bit={LLM_4BIT}) ...")
@@ -45,15 +164,55 @@ class LLMEngine:
         except Exception as e:
             self._load_error = str(e)
             print(f"[LLM] Load failed: {e}")
+            return
+        if self.draft is not None:
+            self.draft.load(self.model, self.tokenizer, load_kwargs)
+        if self.prefix_cache is not None:
+            try:
+                self.prefix_cache.refresh()
+            except Exception as e:
+                print(f"[LLM] prefix cache disabled: {e}")
+                self.prefix_cache = None
 
-    def generate(self, prompt: str) -> str:
-        if not LLM_ENABLE:
-            return "(LLM disabled: set LLM_ENABLE=1 to enable generation)"
+    def warmup(self):
+        self.load()
+        if self.model is None:
+            raise RuntimeError(self._load_error or 'model not loaded')
+        inputs = self.tokenizer("warmup", return_tensors="pt").to(self.model.device)
+        with torch.no_grad():
+            self.model.generate(**inputs, max_new_tokens=2, do_sample=False)
+
+    def _generate(self, prompt: str, stream: Optional[TokenStream]) -> str:
         self.load()
         if self.model is None or self.tokenizer is None:
-            return f"(LLM unavailable: {self._load_error})"
+            return self._notice(stream, f"(LLM unavailable: {self._load_error})")
+        assisted = self.draft is not None and self.draft.ready
+        # assisted generation is batch-1, so a loaded draft model bypasses the batch scheduler
+        if self.scheduler is not None and not assisted:
+            return self.scheduler.submit(prompt, stream)
+        extra = {}
+        if stream is not None:
+            extra['streamer'] = _StreamPusher(self.tokenizer, stream)
+            extra['stopping_criteria'] = StoppingCriteriaList([_StopOnCancel(stream.cancel)])
         # Basic generation (prompt already contains instruction + context)
         inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        if assisted:
+            extra.update(self.draft.generate_kwargs(self.tokenizer))
+        elif self.prefix_cache is not None:
+            # generate() only prefills the tokens past the seeded cache
+            past, _ = self.prefix_cache.seed([inputs["input_ids"][0].tolist()])
+            if past is not None:
+                extra['past_key_values'] = past
+        if assisted:
+            with self.draft.measure() as m:
+                gen_ids = self._model_generate(inputs, extra)
+                m['generated'] = len(gen_ids)
+        else:
+            gen_ids = self._model_generate(inputs, extra)
+        text = self.tokenizer.decode(gen_ids, skip_special_tokens=True).strip()
+        return text or "(empty response)"
+
+    def _model_generate(self, inputs, extra: Dict):
         with torch.no_grad():
             output_ids = self.model.generate(
                 **inputs,
@@ -61,12 +220,24 @@ class LLMEngine:
                 temperature=LLM_TEMPERATURE,
                 do_sample=True,
                 top_p=0.9,
-                repetition_penalty=1.1
+                repetition_penalty=1.1,
+                **extra
             )[0]
         # Slice only generated part
-        gen_ids = output_ids[inputs["input_ids"].shape[-1]:]
-        text = self.tokenizer.decode(gen_ids, skip_special_tokens=True).strip()
-        return text or "(empty response)"
+        return output_ids[inputs["input_ids"].shape[-1]:]
+
+    def stats(self) -> Dict:
+        return {**super().stats(), 'model': self.model_name, 'device': self.device, 'load_error': self._load_error,
+                'batching': self.scheduler.stats() if self.scheduler is not None else {'enabled': False},
+                'prefix_cache': self.prefix_cache.stats() if self.prefix_cache is not None else {'enabled': False},
+                'speculative': self.draft.stats() if self.draft is not None else {'enabled': False}}
+
+
+def _make_engine() -> LLMBackend:
+    if LLM_BACKEND == 'openai':
+        from .llm_http import OpenAIHttpEngine
+        return OpenAIHttpEngine()
+    return TransformersEngine(LLM_MODEL)
 
 # Singleton
-llm_engine = LLMEngine(LLM_MODEL)
+llm_engine = _make_engine()
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .llm import LLMBackend, TokenStream
+from .config import (LLM_HTTP_URL, LLM_HTTP_MODEL, LLM_HTTP_API_KEY, LLM_HTTP_POOL, LLM_HTTP_CONNECT_TIMEOUT_S,
+                     LLM_HTTP_READ_TIMEOUT_S, LLM_HTTP_RETRIES, LLM_MAX_TOKENS, LLM_TEMPERATURE)
+
+
+class OpenAIHttpEngine(LLMBackend):
+    """Generation through an OpenAI-compatible /v1/chat/completions server.
+
+    One requests.Session with a keep-alive pool of LLM_HTTP_POOL connections is
+    shared by all generation threads. Connection errors and 429/502/503/504
+    are retried with backoff before any output is read; a stream that breaks
+    midway is not retried (its tokens were already sent to the client).
+    """
+
+    name = 'openai'
+
+    def __init__(self, base_url: str = LLM_HTTP_URL, model: str = LLM_HTTP_MODEL, api_key: str = LLM_HTTP_API_KEY):
+        self.url = f"{base_url}/v1/chat/completions"
+        self.model = model
+        self.timeout = (LLM_HTTP_CONNECT_TIMEOUT_S, LLM_HTTP_READ_TIMEOUT_S)
+        self.session = requests.Session()
+        retry = Retry(total=LLM_HTTP_RETRIES, connect=LLM_HTTP_RETRIES, read=0, backoff_factor=0.3,
+                      status_forcelist=(429, 502, 503, 504), allowed_methods=frozenset(['POST']),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLM_HTTP_POOL, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+        self._lock = threading.Lock()
+        self._ok: Optional[bool] = None
+        self._last_error: Optional[str] = None
+        self._requests = 0
+        self._errors = 0
+        self._cancelled = 0
+        self._ms = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._ok)
+
+    def _payload(self, prompt: str, stream: bool, max_tokens: int = LLM_MAX_TOKENS) -> Dict:
+        return {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'max_tokens': max_tokens,
+            'temperature': LLM_TEMPERATURE,
+            'top_p': 0.9,
+            'stream': stream,
+        }
+
+    def warmup(self):
+        r = self.session.post(self.url, json=self._payload('warmup', False, max_tokens=1), timeout=self.timeout)
+        r.raise_for_status()
+        with self._lock:
+            self._ok = True
+
+    def _generate(self, prompt: str, stream: Optional[TokenStream]) -> str:
+        t0 = time.perf_counter()
+        try:
+            text = self._call(prompt, stream)
+        except Exception as e:
+            with self._lock:
+                self._requests += 1
+                self._errors += 1
+                self._ok = False
+                self._last_error = str(e)
+            print(f"[LLM] HTTP backend error: {e}")
+            return self._notice(stream, f"(LLM unavailable: {e})")
+        with self._lock:
+            self._requests += 1
+            self._ok = True
+            self._ms += (time.perf_counter() - t0) * 1000.0
+        return text.strip() or "(empty response)"
+
+    def _call(self, prompt: str, stream: Optional[TokenStream]) -> str:
+        if stream is None:
+            r = self.session.post(self.url, json=self._payload(prompt, False), timeout=self.timeout)
+            r.raise_for_status()
+            return r.json()['choices'][0]['message'].get('content') or ''
+        parts = []
+        with self.session.post(self.url, json=self._payload(prompt, True), timeout=self.timeout, stream=True) as r:
+            r.raise_for_status()
+            # SSE is UTF-8 by spec; requests would guess ISO-8859-1 without a charset
+            for raw in r.iter_lines():
+                line = raw.decode('utf-8')
+                if stream.cancel.is_set():
+                    # leaving the block closes the connection; the server stops generating
+                    with self._lock:
+                        self._cancelled += 1
+                    break
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                piece = (json.loads(data)['choices'][0].get('delta') or {}).get('content')
+                if piece:
+                    parts.append(piece)
+                    stream.push(piece)
+        return ''.join(parts)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            ok = self._requests - self._errors
+            return {
+                **super().stats(),
+                'url': self.url,
+                'model': self.model,
+                'pool_size': LLM_HTTP_POOL,
+                'requests': self._requests,
+                'errors': self._errors,
+                'cancelled': self._cancelled,
+                'last_error': self._last_error,
+                'avg_ms': round(self._ms / ok, 1) if ok else 0.0,
+            }
@@ -1,20 +1,49 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Optional
 from pydantic import BaseModel
 from .rag_logic import rag_query
-from .llm import llm_engine
+from .filters import RagFilter
+from .llm import llm_engine, TokenStream
+from .executors import retrieval_executor, generation_executor, leg_executor, ExecutorBusy
+from .chroma_client import query_cache, embed_batcher, vector_index
+from .result_cache import result_cache
+from .answer_cache import answer_cache, lookup_answer, store_answer
+from .reranker import reranker
+from .compress import compressor
+from .warmup import warmup
+from .config import RERANK_ENABLE, COMPRESS_ENABLE
 
-app = FastAPI(title="RAG Service", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # models load in background threads so the server accepts /health and /ready at once
+    warmup.start()
+    yield
+    retrieval_executor.shutdown()
+    leg_executor.shutdown()
+    generation_executor.shutdown()
+    query_cache.save()
+
+app = FastAPI(title="RAG Service", version="0.1.0", lifespan=lifespan)
 
 class RagRequest(BaseModel):
     question: str
+    filters: Optional[RagFilter] = None
 
 class RagResponse(BaseModel):
     prompt: str
     contexts: list
     token_est: int
+    token_est_raw: Optional[int] = None
+    degraded: list = []
 
 class RagAnswerRequest(BaseModel):
     question: str
+    filters: Optional[RagFilter] = None
 
 class RagAnswerResponse(BaseModel):
     question: str
@@ -22,25 +51,141 @@ class RagAnswerResponse(BaseModel):
     answer: str
     contexts: list
     token_est: int
+    token_est_raw: Optional[int] = None
+    degraded: list = []
+    answer_cached: bool = False
 
 @app.post('/rag/query', response_model=RagResponse)
 async def rag_endpoint(req: RagRequest):
-    result = rag_query(req.question)
+    try:
+        result = await retrieval_executor.run(rag_query, req.question, req.filters)
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return RagResponse(**result)
 
+def _retrieve_for_answer(question: str, filters: Optional[RagFilter]):
+    result = rag_query(question, filters)
+    return result, lookup_answer(question, result, filters)
+
 @app.post('/rag/answer', response_model=RagAnswerResponse)
 async def rag_answer_endpoint(req: RagAnswerRequest):
-    result = rag_query(req.question)
-    # Use combined prompt for generation
-    answer = llm_engine.generate(result['prompt'])
+    try:
+        result, answer = await retrieval_executor.run(_retrieve_for_answer, req.question, req.filters)
+        cached = answer is not None
+        if not cached:
+            # Use combined prompt for generation
+            t0 = time.perf_counter()
+            answer = await generation_executor.run(llm_engine.generate, result['prompt'])
+            gen_ms = (time.perf_counter() - t0) * 1000.0
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not cached and llm_engine.ready:
+        try:
+            await retrieval_executor.run(store_answer, req.question, result, answer, gen_ms, req.filters)
+        except ExecutorBusy:
+            pass  # caching is best effort; the answer is already in hand
     return RagAnswerResponse(
         question=req.question,
         prompt=result['prompt'],
         answer=answer,
         contexts=result['contexts'],
-        token_est=result['token_est']
+        token_est=result['token_est'],
+        token_est_raw=result['token_est_raw'],
+        degraded=result['degraded'],
+        answer_cached=cached
     )
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# how often the stream writer wakes up to check for a client disconnect
+STREAM_POLL_S = 0.5
+
+@app.post('/rag/answer/stream')
+async def rag_answer_stream_endpoint(req: RagAnswerRequest, request: Request):
+    """Server-Sent Events: `contexts` first, then `token` pieces as decoded, then `done`.
+
+    A client disconnect cancels generation (the model stops at the next
+    decoding step) so the generation slot goes to the next request.
+    """
+    stream = None
+    try:
+        result, answer = await retrieval_executor.run(_retrieve_for_answer, req.question, req.filters)
+        if answer is None:
+            stream = TokenStream()
+            t0 = time.perf_counter()
+            # claim the generation slot before the response starts, so a full queue is still a 503
+            generation = generation_executor.submit(llm_engine.generate, result['prompt'], stream)
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def events():
+        yield _sse('contexts', {
+            'question': req.question,
+            'contexts': result['contexts'],
+            'citations': result['citations'],
+            'token_est': result['token_est'],
+            'token_est_raw': result['token_est_raw'],
+            'degraded': result['degraded'],
+        })
+        if stream is None:
+            yield _sse('token', {'text': answer})
+            yield _sse('done', {'answer_cached': True})
+            return
+        finished = False
+        try:
+            while True:
+                piece = await asyncio.to_thread(stream.next, STREAM_POLL_S)
+                if piece is None:
+                    break
+                if piece:
+                    yield _sse('token', {'text': piece})
+                elif await request.is_disconnected():
+                    return
+            try:
+                text = await generation
+            except Exception as e:
+                yield _sse('error', {'detail': str(e)})
+                return
+            finished = True
+        finally:
+            if not finished:
+                stream.cancel.set()
+        gen_ms = (time.perf_counter() - t0) * 1000.0
+        if llm_engine.ready:
+            try:
+                await retrieval_executor.run(store_answer, req.question, result, text, gen_ms, req.filters)
+            except ExecutorBusy:
+                pass
+        yield _sse('done', {'answer_cached': False, 'gen_ms': round(gen_ms, 1)})
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.get('/health')
 async def health():
     return {'status': 'ok'}
+
+@app.get('/ready')
+async def ready():
+    """Per-component warm-up status; 503 until every enabled component is warm."""
+    report = warmup.report()
+    return JSONResponse(report, status_code=200 if report['ready'] else 503)
+
+@app.get('/metrics')
+async def metrics():
+    return {
+        'executors': {
+            'retrieval': retrieval_executor.stats(),
+            'retrieval_leg': leg_executor.stats(),
+            'generation': generation_executor.stats(),
+        },
+        'query_embedding_cache': query_cache.stats(),
+        'vector_index': vector_index.stats() if vector_index is not None else {'backend': 'chroma'},
+        'embed_batcher': embed_batcher.stats() if embed_batcher is not None else {'enabled': False},
+        'result_cache': result_cache.stats() if result_cache is not None else {'backend': 'off'},
+        'answer_cache': answer_cache.stats(),
+        'reranker': reranker.stats() if RERANK_ENABLE else {'enabled': False},
+        'llm': llm_engine.stats(),
+        'compression': compressor.stats() if COMPRESS_ENABLE else {'enabled': False},
+    }
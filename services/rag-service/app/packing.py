@@ -0,0 +1,178 @@
+"""Context packing: retrieved chunks -> numbered blocks that fit TOKEN_BUDGET.
+
+1. Duplicated overlap text is removed and chunks of the same document whose
+   text overlaps (CHUNK_OVERLAP_RATIO tails) are merged into one block.
+2. Blocks are picked greedily by MMR value per token, so one long early chunk
+   no longer blocks shorter relevant ones, and near-duplicates are skipped.
+Similarity uses the stored chunk vectors; pairs without vectors fall back to
+character-trigram Jaccard.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .text_utils import est_tokens
+from .chroma_client import get_vectors
+from .config import PACK_MMR_LAMBDA, PACK_DUP_SIM, PACK_MIN_TOKENS
+
+# "[n] " prefix + blank line between blocks
+_BLOCK_OVERHEAD = 2
+_MIN_OVERLAP_CHARS = 32
+
+
+def dup_prefix_len(text: str, ref: str, min_len: int = _MIN_OVERLAP_CHARS) -> int:
+    """Length of the longest prefix of `text` (at most half of it) found verbatim in `ref`."""
+    hi = min(len(text) // 2, len(ref))
+    if hi < min_len or text[:min_len] not in ref:
+        return 0
+    lo = min_len
+    # "prefix occurs in ref" is monotone in the prefix length
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if text[:mid] in ref:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _relevance(chunks: List[Dict]) -> List[float]:
+    key = 'score_rerank' if chunks and all(c.get('score_rerank') is not None for c in chunks) else 'score_rrf'
+    raw = [float(c.get(key) or 0.0) for c in chunks]
+    lo, hi = min(raw, default=0.0), max(raw, default=0.0)
+    if hi - lo < 1e-12:
+        return [1.0] * len(raw)
+    # keep the weakest candidate slightly above zero so MMR can still rank it
+    return [0.05 + 0.95 * (x - lo) / (hi - lo) for x in raw]
+
+
+def _doc_key(c: Dict) -> Optional[str]:
+    return c.get('path') or c.get('source')
+
+
+def _pages_touch(a: Dict, b: Dict) -> bool:
+    try:
+        return int(b['page_start']) <= int(a['page_end']) + 1 and int(b['page_end']) >= int(a['page_start']) - 1
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def merge_adjacent(chunks: List[Dict], budget_tokens: int) -> List[Dict]:
+    """Chunks (best first) -> blocks with overlap text removed and neighbours merged."""
+    blocks: List[Dict] = []
+    for c, rel in zip(chunks, _relevance(chunks)):
+        text = (c.get('text') or '').strip()
+        # make_chunks prepends an overlap tail that is repeated further down the chunk
+        text = text[dup_prefix_len(text, text[1:]):].lstrip()
+        if not text:
+            continue
+        merged = False
+        for b in blocks:
+            if _doc_key(b) != _doc_key(c) or not _pages_touch(b, c):
+                continue
+            n = dup_prefix_len(text, b['text'])
+            if n:
+                joined = b['text'] + '\n\n' + text[n:].lstrip()
+            else:
+                n = dup_prefix_len(b['text'], text)
+                joined = text + '\n\n' + b['text'][n:].lstrip() if n else ''
+            if not joined or est_tokens(joined) + _BLOCK_OVERHEAD > budget_tokens:
+                continue
+            b['text'] = joined
+            b['doc_ids'].append(c.get('doc_id'))
+            b['score'] = max(b['score'], rel)
+            b['page_start'] = min(b['page_start'], c.get('page_start'))
+            b['page_end'] = max(b['page_end'], c.get('page_end'))
+            merged = True
+            break
+        if not merged:
+            blocks.append({
+                'text': text,
+                'doc_ids': [c.get('doc_id')],
+                'score': rel,
+                'source': c.get('source'),
+                'path': c.get('path'),
+                'page_start': c.get('page_start'),
+                'page_end': c.get('page_end'),
+            })
+    for b in blocks:
+        b['tokens'] = est_tokens(b['text']) + _BLOCK_OVERHEAD
+    return blocks
+
+
+def _trigrams(text: str) -> set:
+    t = ''.join(text.split())
+    return {t[i:i + 3] for i in range(max(0, len(t) - 2))}
+
+
+def _block_vectors(blocks: List[Dict]) -> List[Optional[np.ndarray]]:
+    try:
+        vecs = get_vectors([d for b in blocks for d in b['doc_ids']])
+    except Exception as e:
+        print(f"[pack] vector lookup failed, using text similarity: {e}")
+        vecs = {}
+    out = []
+    for b in blocks:
+        rows = [np.asarray(vecs[d], dtype=np.float32) for d in b['doc_ids'] if d in vecs]
+        if not rows:
+            out.append(None)
+            continue
+        v = np.mean(rows, axis=0)
+        out.append(v / max(float(np.linalg.norm(v)), 1e-12))
+    return out
+
+
+def select_contexts(chunks: List[Dict], budget_tokens: int,
+                    mmr_lambda: float = PACK_MMR_LAMBDA, dup_sim: float = PACK_DUP_SIM,
+                    min_tokens: int = PACK_MIN_TOKENS) -> List[Dict]:
+    """Greedy MMR-per-token fill of the budget; returns blocks best first.
+
+    The best-valued block is taken even when its MMR is negative (weakly
+    relevant and partly redundant): the fill stops only when no remaining
+    block fits the budget; near-duplicates (>= dup_sim) are never taken.
+    """
+    blocks = merge_adjacent(chunks, budget_tokens)
+    vecs = _block_vectors(blocks)
+    grams: Dict[int, set] = {}
+
+    def sim(i: int, j: int) -> float:
+        if vecs[i] is not None and vecs[j] is not None:
+            return float(vecs[i] @ vecs[j])
+        for k in (i, j):
+            if k not in grams:
+                grams[k] = _trigrams(blocks[k]['text'])
+        union = grams[i] | grams[j]
+        return len(grams[i] & grams[j]) / len(union) if union else 0.0
+
+    selected: List[int] = []
+    remaining = list(range(len(blocks)))
+    used = 0
+    while remaining:
+        best, best_value = None, float('-inf')
+        for i in list(remaining):
+            if used + blocks[i]['tokens'] > budget_tokens:
+                continue
+            redundancy = max((sim(i, j) for j in selected), default=0.0)
+            if redundancy >= dup_sim:
+                remaining.remove(i)
+                continue
+            mmr = mmr_lambda * blocks[i]['score'] - (1.0 - mmr_lambda) * redundancy
+            # value per prompt token; tiny fragments are priced as min_tokens
+            value = mmr / max(blocks[i]['tokens'], min_tokens)
+            if value > best_value:
+                best, best_value = i, value
+        if best is None:
+            break
+        selected.append(best)
+        remaining.remove(best)
+        used += blocks[best]['tokens']
+    return sorted((blocks[i] for i in selected), key=lambda b: b['score'], reverse=True)
+
+
+def format_blocks(blocks: List[Dict]) -> Tuple[str, Dict[int, str]]:
+    """Numbered context text and {n: 'source:page'} citations."""
+    parts, cites = [], {}
+    for i, b in enumerate(blocks, 1):
+        parts.append(f"[{i}] {b['text']}")
+        cites[i] = f"{b.get('source') or b.get('path')}:{b.get('page_start')}"
+    return '\n\n'.join(parts), cites
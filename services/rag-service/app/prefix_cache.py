@@ -0,0 +1,89 @@
+import copy
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .prompts import system_instruction
+
+try:
+    import torch
+except Exception:
+    torch = None  # type: ignore
+
+
+def expand_rows(past, n: int):
+    """Repeat a batch-1 KV cache to n rows (DynamicCache or legacy tuples); the input is left untouched."""
+    past = copy.deepcopy(past)
+    if n == 1:
+        return past
+    if hasattr(past, 'batch_repeat_interleave'):
+        past.batch_repeat_interleave(n)
+        return past
+    return tuple(tuple(t.repeat_interleave(n, dim=0) for t in layer) for layer in past)
+
+
+class PrefixKVCache:
+    """Past key/values of the constant system-instruction prefix.
+
+    Built once at model load and rebuilt when system_instruction() returns
+    different text. The last prefix token is left out of the cache because
+    the tokenizer may merge it with the first characters of the question;
+    a prompt is seeded only if its token ids start with the cached ids, so a
+    mismatch falls back to a full prefill rather than a wrong cache.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._text: Optional[str] = None
+        self._ids: List[int] = []
+        self._past = None
+        self._build_ms = 0.0
+        self._builds = 0
+        self._hits = 0
+        self._misses = 0
+        self._saved_tokens = 0
+
+    def _build(self, text: str):
+        tok, model = self.engine.tokenizer, self.engine.model
+        ids = tok(text)['input_ids'][:-1]
+        t0 = time.perf_counter()
+        with torch.no_grad():
+            out = model(input_ids=torch.tensor([ids], device=model.device), use_cache=True)
+        self._text, self._ids, self._past = text, ids, out.past_key_values
+        self._build_ms = (time.perf_counter() - t0) * 1000.0
+        self._builds += 1
+        print(f"[LLM] prefix cache: {len(ids)} tokens in {self._build_ms:.0f} ms")
+
+    def refresh(self):
+        """Rebuild if the instruction text changed (called at load and per lookup)."""
+        text = system_instruction()
+        with self._lock:
+            if text != self._text:
+                self._build(text)
+
+    def _match(self, ids: List[int]) -> bool:
+        n = len(self._ids)
+        return n > 0 and len(ids) > n and ids[:n] == self._ids
+
+    def seed(self, ids_batch: List[List[int]]) -> Tuple[Optional[object], int]:
+        """(copy of the prefix cache expanded to len(ids_batch) rows, prefix length) or (None, 0)."""
+        self.refresh()
+        with self._lock:
+            if not all(self._match(ids) for ids in ids_batch):
+                self._misses += len(ids_batch)
+                return None, 0
+            self._hits += len(ids_batch)
+            self._saved_tokens += len(self._ids) * len(ids_batch)
+            return expand_rows(self._past, len(ids_batch)), len(self._ids)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'prefix_tokens': len(self._ids),
+                'builds': self._builds,
+                'build_ms': round(self._build_ms, 1),
+                'hits': self._hits,
+                'misses': self._misses,
+                'prefill_tokens_saved': self._saved_tokens,
+            }
@@ -0,0 +1,42 @@
+"""Prompt text shared by build_prompt and the LLM prefix KV cache.
+
+Every prompt starts with system_instruction(), so the model can reuse the
+key/values of that prefix (see prefix_cache.py). With SYSTEM_PROMPT_PATH set
+the instruction is read from that file and re-read when it changes; the
+prefix cache notices the new text and rebuilds itself.
+"""
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from .config import SYSTEM_PROMPT_PATH
+
+DEFAULT_SYSTEM_INSTRUCTION = (
+    "คุณคือผู้ช่วยของภาควิชาวิศวกรรมคอมพิวเตอร์ ใช้เฉพาะข้อมูลอ้างอิงในการตอบ ถ้าไม่มีข้อมูลให้ตอบว่าไม่พบ.\n\n"
+)
+
+_lock = threading.Lock()
+_loaded: Optional[Tuple[float, str]] = None
+
+
+def system_instruction() -> str:
+    global _loaded
+    if not SYSTEM_PROMPT_PATH:
+        return DEFAULT_SYSTEM_INSTRUCTION
+    try:
+        mtime = os.stat(SYSTEM_PROMPT_PATH).st_mtime
+    except OSError:
+        return DEFAULT_SYSTEM_INSTRUCTION
+    with _lock:
+        if _loaded is None or _loaded[0] != mtime:
+            text = open(SYSTEM_PROMPT_PATH, encoding='utf-8').read().strip()
+            _loaded = (mtime, text + '\n\n' if text else DEFAULT_SYSTEM_INSTRUCTION)
+        return _loaded[1]
+
+
+def build_prompt(question: str, ctx: str, cites: Dict[int, str]) -> str:
+    cite_list = '\n'.join([f"[{i}] {c}" for i, c in cites.items()])
+    return (
+        system_instruction() +
+        f"คำถาม:\n{question}\n\nบริบท:\n{ctx}\n\nอ้างอิง:\n{cite_list}\n"
+    )
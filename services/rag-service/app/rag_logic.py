@@ -1,21 +1,67 @@
-from typing import List, Dict, Tuple
-import math
+from typing import List, Dict, Tuple, Optional
+from concurrent.futures import TimeoutError as FutureTimeout
+import time
 
 from .sqlite_client import keyword_search, fetch_docs
 from .chroma_client import semantic_search, embed_texts
-from .config import TOKEN_BUDGET, RRF_K, MAX_CONTEXTS
+from .result_cache import result_cache, index_version, make_key
+from .text_utils import normalize_query, est_tokens
+from .packing import select_contexts, format_blocks
+from .compress import compressor
+from .prompts import build_prompt
+from .reranker import reranker
+from .filters import RagFilter
+from .executors import leg_executor
+from .config import (TOKEN_BUDGET, RRF_K, MAX_CONTEXTS,
+                     SEMANTIC_TIMEOUT_MS, KEYWORD_TIMEOUT_MS, RERANK_ENABLE, RERANK_MODEL,
+                     RERANK_CANDIDATES, RERANK_KEEP, COMPRESS_ENABLE, COMPRESS_BUDGET, COMPRESS_SCORER,
+                     COMPRESS_NEIGHBOURS)
 
-# Simple token counter heuristic (~4 chars/token Thai)
-CHAR_PER_TOKEN = 4.0
+def _keyword_leg(question: str, k_kw: int, filters: Optional[RagFilter]) -> List[Dict]:
+    return fetch_docs(keyword_search(question, limit=k_kw, filters=filters))
 
-def est_tokens(text: str) -> int:
-    return max(1, int(math.ceil(len(text) / CHAR_PER_TOKEN)))
 
+def _run_legs(question: str, k_vec: int, k_kw: int,
+              filters: Optional[RagFilter] = None) -> Tuple[List[Dict], List[Dict], List[str]]:
+    """Run semantic + keyword retrieval concurrently, each with its own deadline.
 
-def hybrid_retrieve(question: str, k_vec: int = 20, k_kw: int = 30) -> List[Dict]:
-    sem = semantic_search(question, top_k=k_vec)
-    kw_ids = keyword_search(question, limit=k_kw)
-    kw_docs = fetch_docs(kw_ids)
+    Legs run on the bounded leg executor: when it is full ExecutorBusy
+    propagates (503) instead of queueing behind legs that already timed out.
+    A leg still queued at its deadline is cancelled and never runs.
+    """
+    start = time.monotonic()
+    sem_fut = leg_executor.submit_future(semantic_search, question, top_k=k_vec, filters=filters)
+    try:
+        kw_fut = leg_executor.submit_future(_keyword_leg, question, k_kw, filters)
+    except Exception:
+        sem_fut.cancel()
+        raise
+    legs = {
+        'semantic': (sem_fut, SEMANTIC_TIMEOUT_MS),
+        'keyword': (kw_fut, KEYWORD_TIMEOUT_MS),
+    }
+    results: Dict[str, List[Dict]] = {}
+    degraded: List[str] = []
+    for name, (fut, timeout_ms) in legs.items():
+        remaining = max(0.0, start + timeout_ms / 1000.0 - time.monotonic())
+        try:
+            results[name] = fut.result(timeout=remaining)
+        except FutureTimeout:
+            fut.cancel()
+            print(f"[retrieval] {name} leg exceeded {timeout_ms} ms; answering without it")
+            degraded.append(name)
+            results[name] = []
+        except Exception as e:
+            print(f"[retrieval] {name} leg failed: {e}")
+            degraded.append(name)
+            results[name] = []
+    return results['semantic'], results['keyword'], degraded
+
+
+def hybrid_retrieve(question: str, k_vec: int = 20, k_kw: int = 30, limit: int = MAX_CONTEXTS,
+                    filters: Optional[RagFilter] = None) -> Tuple[List[Dict], List[str]]:
+    """RRF-merge both legs; returns (contexts, names of legs that were dropped)."""
+    sem, kw_docs, degraded = _run_legs(question, k_vec, k_kw, filters)
     bank: Dict[str, Dict] = {}
     ranks: Dict[str, float] = {}
 
@@ -32,39 +78,39 @@ def hybrid_retrieve(question: str, k_vec: int = 20, k_kw: int = 30) -> List[Dict
 
     merged = [{**bank[k], 'score_rrf': v, 'doc_id': k} for k, v in ranks.items()]
     merged.sort(key=lambda x: x['score_rrf'], reverse=True)
-    return merged[:MAX_CONTEXTS]
+    return merged[:limit], degraded
+
+
+def retrieve(question: str, k_vec: int = 20, k_kw: int = 30,
+             filters: Optional[RagFilter] = None) -> Tuple[List[Dict], List[str]]:
+    """hybrid_retrieve, plus the cross-encoder rerank when RERANK_ENABLE is set."""
+    if not RERANK_ENABLE:
+        return hybrid_retrieve(question, k_vec=k_vec, k_kw=k_kw, filters=filters)
+    candidates, degraded = hybrid_retrieve(question, k_vec=k_vec, k_kw=k_kw, limit=RERANK_CANDIDATES,
+                                           filters=filters)
+    ranked = reranker.rerank(question, candidates)
+    if ranked is None:
+        return candidates[:MAX_CONTEXTS], degraded + ['rerank']
+    return ranked[:RERANK_KEEP], degraded
 
 
 def pack_context(chunks: List[Dict], budget_tokens: int = TOKEN_BUDGET) -> Tuple[str, Dict[int, str]]:
-    packed_blocks = []
-    used = 0
-    cites = {}
-    for i, c in enumerate(chunks, 1):
-        cite = f"{c.get('source') or c.get('path')}:{c.get('page_start')}"
-        block = f"[{i}] {c.get('text','').strip()}"
-        t = est_tokens(block)
-        if used + t > budget_tokens:
-            break
-        packed_blocks.append(block)
-        used += t
-        cites[i] = cite
-    return '\n\n'.join(packed_blocks), cites
-
-
-def build_prompt(question: str, ctx: str, cites: Dict[int, str]) -> str:
-    cite_list = '\n'.join([f"[{i}] {c}" for i, c in cites.items()])
-    return (
-        "คุณคือผู้ช่วยของภาควิชาวิศวกรรมคอมพิวเตอร์ ใช้เฉพาะข้อมูลอ้างอิงในการตอบ ถ้าไม่มีข้อมูลให้ตอบว่าไม่พบ.\n\n"
-        f"คำถาม:\n{question}\n\nบริบท:\n{ctx}\n\nอ้างอิง:\n{cite_list}\n"
-    )
-
-
-def rag_query(question: str) -> Dict:
-    retrieved = hybrid_retrieve(question)
-    ctx, cites = pack_context(retrieved)
-    prompt = build_prompt(question, ctx, cites)
+    return format_blocks(select_contexts(chunks, budget_tokens))
+
+
+def _retrieve_and_pack(question: str, k_vec: int, k_kw: int, filters: Optional[RagFilter]) -> Dict:
+    retrieved, degraded = retrieve(question, k_vec=k_vec, k_kw=k_kw, filters=filters)
+    blocks = select_contexts(retrieved, TOKEN_BUDGET)
+    raw_tokens = est_tokens(format_blocks(blocks)[0])
+    if COMPRESS_ENABLE:
+        # same blocks in the same order, so [n] citations are unchanged
+        blocks = compressor.compress(question, blocks, COMPRESS_BUDGET)
+    ctx, cites = format_blocks(blocks)
+    cite_of = {doc_id: i for i, b in enumerate(blocks, 1) for doc_id in b['doc_ids']}
     return {
-        'prompt': prompt,
+        'context': ctx,
+        # list of pairs so the entry survives a JSON round trip (shared cache backend)
+        'cites': list(cites.items()),
         'contexts': [
             {
                 'doc_id': r.get('doc_id'),
@@ -73,7 +119,40 @@ def rag_query(question: str) -> Dict:
                 'page_start': r.get('page_start'),
                 'page_end': r.get('page_end'),
                 'score_rrf': r.get('score_rrf'),
+                'score_rerank': r.get('score_rerank'),
+                'cite': cite_of.get(r.get('doc_id')),
             } for r in retrieved
         ],
-        'token_est': est_tokens(ctx)
+        'token_est': est_tokens(ctx),
+        'token_est_raw': raw_tokens,
+        'degraded': degraded,
+    }
+
+
+def rag_query(question: str, filters: Optional[RagFilter] = None, k_vec: int = 20, k_kw: int = 30) -> Dict:
+    if filters is not None and filters.is_empty():
+        filters = None
+    packed = None
+    if result_cache is not None:
+        rerank = (RERANK_MODEL, RERANK_CANDIDATES, RERANK_KEEP) if RERANK_ENABLE else None
+        compress = (COMPRESS_BUDGET, COMPRESS_SCORER, COMPRESS_NEIGHBOURS) if COMPRESS_ENABLE else None
+        key = make_key(normalize_query(question), k_vec, k_kw, MAX_CONTEXTS, TOKEN_BUDGET, rerank,
+                       filters.cache_key() if filters is not None else None, compress)
+        # read the version before retrieving: a re-ingest mid-query leaves the entry stale
+        version = index_version()
+        packed = result_cache.get(key, version)
+    if packed is None:
+        packed = _retrieve_and_pack(question, k_vec, k_kw, filters)
+        # degraded results are missing a leg; never pin them in the cache
+        if result_cache is not None and not packed['degraded']:
+            result_cache.put(key, version, packed)
+    cites = {int(i): c for i, c in packed['cites']}
+    prompt = build_prompt(question, packed['context'], cites)
+    return {
+        'prompt': prompt,
+        'citations': cites,
+        'contexts': packed['contexts'],
+        'token_est': packed['token_est'],
+        'token_est_raw': packed.get('token_est_raw', packed['token_est']),
+        'degraded': packed['degraded'],
     }
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Tuple
+
+from .text_utils import normalize_query
+from .result_cache import index_version
+from .config import (RERANK_MODEL, RERANK_BUDGET_MS, RERANK_CACHE_SIZE, RERANK_BATCH,
+                     RERANK_MAX_LENGTH, RERANK_QUEUE)
+
+try:
+    from sentence_transformers import CrossEncoder
+except Exception:
+    CrossEncoder = None  # type: ignore
+
+
+class Reranker:
+    """Cross-encoder rerank of merged candidates under a latency budget.
+
+    Uncached (query, doc_id) pairs are scored in one batched predict call on a
+    single background thread; up to `queue` batches may be running or waiting
+    for it. A request that finds the queue full waits for a slot within its
+    budget. If the scores are not ready within `budget_ms` (or no slot frees
+    up, or the model is unavailable) `rerank` returns None and the caller
+    keeps RRF order; a late batch still lands in the cache for the next query.
+    The cache is dropped when the ingestion index version changes.
+    """
+
+    def __init__(self, model_name: str, budget_ms: float, cache_size: int, batch_size: int, max_length: int,
+                 queue: int = RERANK_QUEUE):
+        self.model_name = model_name
+        self.budget_s = budget_ms / 1000.0
+        self.cache_size = max(0, cache_size)
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._model = None
+        self._load_error: Optional[str] = None
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rerank')
+        self.queue = max(1, queue)
+        self._slots = threading.Semaphore(self.queue)
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[Tuple[str, str], float]' = OrderedDict()
+        self._version: Optional[str] = None
+        self._calls = 0
+        self._reranked = 0
+        self._fallbacks: Dict[str, int] = {}
+        self._pairs_scored = 0
+        self._cache_hits = 0
+        self._score_ms = 0.0
+        self._batches = 0
+
+    def _load(self):
+        if self._model is not None or self._load_error:
+            return
+        if CrossEncoder is None:
+            self._load_error = 'sentence-transformers CrossEncoder not installed'
+            return
+        try:
+            print(f"[rerank] Loading {self.model_name} ...")
+            self._model = CrossEncoder(self.model_name, max_length=self.max_length)
+        except Exception as e:
+            self._load_error = str(e)
+            print(f"[rerank] Load failed: {e}")
+
+    def warm(self):
+        """Load the model and run one pair (startup warmup, before traffic)."""
+        self._load()
+        if self._model is None:
+            raise RuntimeError(self._load_error)
+        self._model.predict([('warmup', 'warmup')], batch_size=1)
+
+    def _score(self, query: str, pairs: List[Tuple[str, str]], version: str) -> Dict[str, float]:
+        try:
+            self._load()
+            if self._model is None:
+                raise RuntimeError(self._load_error)
+            t0 = time.perf_counter()
+            scores = self._model.predict([(query, text) for _, text in pairs], batch_size=self.batch_size)
+            elapsed = (time.perf_counter() - t0) * 1000.0
+            out = {doc_id: float(s) for (doc_id, _), s in zip(pairs, scores)}
+            with self._lock:
+                self._pairs_scored += len(pairs)
+                self._score_ms += elapsed
+                self._batches += 1
+                # scored against texts of an older index: do not cache
+                for doc_id, s in (out.items() if version == self._version else ()):
+                    self._cache[(query, doc_id)] = s
+                    self._cache.move_to_end((query, doc_id))
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return out
+        finally:
+            self._slots.release()
+
+    def _fallback(self, reason: str) -> None:
+        with self._lock:
+            self._fallbacks[reason] = self._fallbacks.get(reason, 0) + 1
+        return None
+
+    def rerank(self, question: str, candidates: List[Dict]) -> Optional[List[Dict]]:
+        """Candidates sorted by cross-encoder score (as 'score_rerank'), or None to keep RRF order."""
+        deadline = time.perf_counter() + self.budget_s
+        query = normalize_query(question)
+        version = index_version()
+        with self._lock:
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+            self._calls += 1
+            scores = {c['doc_id']: self._cache[(query, c['doc_id'])]
+                      for c in candidates if (query, c['doc_id']) in self._cache}
+            self._cache_hits += len(scores)
+        missing = [(c['doc_id'], c.get('text') or '') for c in candidates if c['doc_id'] not in scores]
+        if missing:
+            if self._load_error:
+                return self._fallback('unavailable')
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.perf_counter())):
+                return self._fallback('busy')
+            fut = self._pool.submit(self._score, query, missing, version)
+            try:
+                scores.update(fut.result(timeout=max(0.0, deadline - time.perf_counter())))
+            except FutureTimeout:
+                return self._fallback('timeout')
+            except Exception as e:
+                print(f"[rerank] scoring failed: {e}")
+                return self._fallback('error')
+        with self._lock:
+            self._reranked += 1
+        ranked = [{**c, 'score_rerank': scores[c['doc_id']]} for c in candidates]
+        ranked.sort(key=lambda c: c['score_rerank'], reverse=True)
+        return ranked
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'model': self.model_name,
+                'loaded': self._model is not None,
+                'load_error': self._load_error,
+                'budget_ms': self.budget_s * 1000.0,
+                'queue': self.queue,
+                'calls': self._calls,
+                'reranked': self._reranked,
+                'fallbacks': dict(self._fallbacks),
+                'pairs_scored': self._pairs_scored,
+                'cache_hits': self._cache_hits,
+                'cache_size': len(self._cache),
+                'avg_batch_ms': round(self._score_ms / self._batches, 2) if self._batches else 0.0,
+            }
+
+
+reranker = Reranker(RERANK_MODEL, RERANK_BUDGET_MS, RERANK_CACHE_SIZE, RERANK_BATCH, RERANK_MAX_LENGTH)
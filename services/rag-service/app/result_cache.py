@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .config import (INDEX_VERSION_PATH, RESULT_CACHE_BACKEND, RESULT_CACHE_SIZE,
+                     RESULT_CACHE_TTL_S, RESULT_CACHE_PATH)
+
+_version_lock = threading.Lock()
+_version_state: Tuple[Optional[Tuple[int, int]], str] = (None, '0')
+
+
+def index_version() -> str:
+    """Current ingestion index version; re-read only when the version file changes."""
+    global _version_state
+    try:
+        st = os.stat(INDEX_VERSION_PATH)
+    except FileNotFoundError:
+        return '0'
+    sig = (st.st_ino, st.st_mtime_ns)
+    with _version_lock:
+        if _version_state[0] != sig:
+            _version_state = (sig, INDEX_VERSION_PATH.read_text(encoding='utf-8').strip() or '0')
+        return _version_state[1]
+
+
+def version_order(version: str) -> int:
+    """Index versions are time_ns strings from ingestion; compare them as integers."""
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        return 0
+
+
+def make_key(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class _Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'stale': self.stale,
+                    'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+class MemoryResultCache:
+    """Per-process LRU with TTL; entries carry the index version they were built on."""
+
+    backend = 'memory'
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._data: 'OrderedDict[str, Tuple[float, str, Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = _Counters()
+
+    def get(self, key: str, version: str) -> Optional[Dict]:
+        with self._lock:
+            now = time.time()
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] < now or entry[1] != version):
+                # a reader still on an older version must not drop a newer entry
+                if entry[0] < now or version_order(entry[1]) < version_order(version):
+                    del self._data[key]
+                entry = None
+                self.counters.count('stale')
+            if entry is None:
+                self.counters.count('misses')
+                return None
+            self._data.move_to_end(key)
+        self.counters.count('hits')
+        return entry[2]
+
+    def put(self, key: str, version: str, value: Dict):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and version_order(entry[1]) > version_order(version):
+                return  # built on an older index than the cached answer
+            self._data[key] = (time.time() + self.ttl_s, version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._data)
+        return {'backend': self.backend, 'size': size, 'max_entries': self.max_entries,
+                'ttl_s': self.ttl_s, **self.counters.snapshot()}
+
+
+class SqliteResultCache:
+    """SQLite-file cache shared by every worker process on the host (WAL mode)."""
+
+    backend = 'sqlite'
+
+    def __init__(self, path: Path, max_entries: int, ttl_s: float):
+        self.path = Path(path)
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._local = threading.local()
+        self._puts = 0
+        self.counters = _Counters()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS result_cache (
+                key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                expires REAL NOT NULL,
+                value TEXT NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_result_cache_expires ON result_cache(expires)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, version: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT version, expires, value FROM result_cache WHERE key = ?", (key,)).fetchone()
+        if row is not None and (row[1] < time.time() or row[0] != version):
+            self.counters.count('stale')
+            row = None
+        if row is None:
+            self.counters.count('misses')
+            return None
+        self.counters.count('hits')
+        return json.loads(row[2])
+
+    def put(self, key: str, version: str, value: Dict):
+        conn = self._conn()
+        # a writer that started before an index bump must not replace a newer row
+        conn.execute("""
+            INSERT INTO result_cache(key, version, expires, value) VALUES (?,?,?,?)
+            ON CONFLICT(key) DO UPDATE SET version=excluded.version, expires=excluded.expires, value=excluded.value
+            WHERE CAST(excluded.version AS INTEGER) >= CAST(result_cache.version AS INTEGER)""",
+                     (key, version, time.time() + self.ttl_s, json.dumps(value, ensure_ascii=False)))
+        self._puts += 1
+        if self._puts % 64 == 0:
+            # expired / older-version rows first (versions only move forward, so a
+            # lagging writer never evicts rows of a newer index), then trim to size
+            conn.execute("DELETE FROM result_cache WHERE expires < ? OR CAST(version AS INTEGER) < ?",
+                         (time.time(), version_order(version)))
+            conn.execute("""
+                DELETE FROM result_cache WHERE key IN (
+                    SELECT key FROM result_cache ORDER BY expires DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+        conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        size = self._conn().execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+        return {'backend': self.backend, 'path': str(self.path), 'size': size,
+                'max_entries': self.max_entries, 'ttl_s': self.ttl_s, **self.counters.snapshot()}
+
+
+def _make_cache():
+    if RESULT_CACHE_BACKEND == 'sqlite':
+        return SqliteResultCache(RESULT_CACHE_PATH, RESULT_CACHE_SIZE, RESULT_CACHE_TTL_S)
+    if RESULT_CACHE_BACKEND == 'memory':
+        return MemoryResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL_S)
+    return None
+
+
+result_cache = _make_cache()
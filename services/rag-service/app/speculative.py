@@ -0,0 +1,108 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from .config import LLM_DRAFT_MODEL, LLM_DRAFT_LOOKAHEAD
+
+try:
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+except Exception:
+    AutoTokenizer = None  # type: ignore
+    AutoModelForCausalLM = None  # type: ignore
+
+
+class _CallCounter:
+    """Forward hook counting model calls."""
+
+    def __init__(self, module):
+        self.n = 0
+        module.register_forward_hook(self._hook)
+
+    def _hook(self, module, args, output):
+        self.n += 1
+
+
+class DraftModel:
+    """Small draft model for transformers assisted generation (speculative decoding).
+
+    The draft proposes `lookahead` tokens per step and the main model checks
+    them in one forward pass. Every verification pass yields the accepted
+    drafts plus one token of its own, so accepted = generated - main passes,
+    and the acceptance rate is accepted / draft passes. A draft with a
+    different vocabulary is paired through `assistant_tokenizer`.
+    """
+
+    def __init__(self, model_name: str = LLM_DRAFT_MODEL, lookahead: int = LLM_DRAFT_LOOKAHEAD):
+        self.model_name = model_name
+        self.lookahead = max(1, lookahead)
+        self.model = None
+        self.tokenizer = None
+        self._load_error: Optional[str] = None
+        self._same_vocab = True
+        self._main_calls: Optional[_CallCounter] = None
+        self._draft_calls: Optional[_CallCounter] = None
+        # assisted generation is batch-1; one request at a time keeps the counters exact
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._generated = 0
+        self._accepted = 0
+        self._drafted = 0
+        self._seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def load(self, main_model, main_tokenizer, load_kwargs: Dict):
+        if AutoModelForCausalLM is None:
+            self._load_error = "transformers not installed"
+            return
+        try:
+            print(f"[LLM] Loading draft model {self.model_name} (lookahead={self.lookahead}) ...")
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, trust_remote_code=True)
+            self.model = AutoModelForCausalLM.from_pretrained(self.model_name, **load_kwargs)
+            self.model.generation_config.num_assistant_tokens = self.lookahead
+            self.model.generation_config.num_assistant_tokens_schedule = 'constant'
+            self._same_vocab = len(self.tokenizer) == len(main_tokenizer)
+            self._main_calls = _CallCounter(main_model)
+            self._draft_calls = _CallCounter(self.model)
+            print("[LLM] Draft model loaded.")
+        except Exception as e:
+            self.model = None
+            self._load_error = str(e)
+            print(f"[LLM] Draft load failed, generating without it: {e}")
+
+    def generate_kwargs(self, main_tokenizer) -> Dict:
+        kwargs = {'assistant_model': self.model}
+        if not self._same_vocab:
+            kwargs.update(tokenizer=main_tokenizer, assistant_tokenizer=self.tokenizer)
+        return kwargs
+
+    @contextmanager
+    def measure(self):
+        """Serializes assisted calls; the body sets box['generated'] to the new token count."""
+        with self._lock:
+            main0, draft0 = self._main_calls.n, self._draft_calls.n
+            box = {'generated': 0}
+            t0 = time.perf_counter()
+            yield box
+            main, drafted = self._main_calls.n - main0, self._draft_calls.n - draft0
+            self._requests += 1
+            self._generated += box['generated']
+            self._accepted += max(0, box['generated'] - main)
+            self._drafted += drafted
+            self._seconds += time.perf_counter() - t0
+
+    def stats(self) -> Dict:
+        return {
+            'model': self.model_name,
+            'loaded': self.ready,
+            'load_error': self._load_error,
+            'lookahead': self.lookahead,
+            'same_vocab': self._same_vocab,
+            'requests': self._requests,
+            'generated_tokens': self._generated,
+            'acceptance_rate': round(self._accepted / self._drafted, 4) if self._drafted else 0.0,
+            'tokens_per_s': round(self._generated / self._seconds, 2) if self._seconds else 0.0,
+        }
@@ -1,50 +1,98 @@
+import os
 import sqlite3
-from typing import List, Dict
-from .config import SQLITE_PATH
+import threading
+from typing import List, Dict, Optional, Tuple
+from .filters import RagFilter
+from .config import SQLITE_PATH, SQLITE_MMAP_BYTES, SQLITE_CACHE_KB, SQLITE_STMT_CACHE
+
+_local = threading.local()
+
 
 def get_conn():
+    """Plain read-write connection; used by maintenance scripts, not the query path."""
     return sqlite3.connect(str(SQLITE_PATH))
 
 
-def keyword_search(query: str, limit: int = 30) -> List[str]:
-    conn = get_conn()
-    
+def _db_identity() -> Tuple[int, int]:
+    st = os.stat(SQLITE_PATH)
+    return st.st_dev, st.st_ino
+
+
+def _open_readonly() -> sqlite3.Connection:
+    uri = SQLITE_PATH.resolve().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, cached_statements=SQLITE_STMT_CACHE)
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+def read_conn() -> sqlite3.Connection:
+    """Per-thread read-only connection, reopened when the DB file is replaced.
+
+    Ingestion may swap ingestion.db for a new file (new inode); an open handle
+    would keep reading the unlinked copy, so the identity is checked per call.
+    """
+    ident = _db_identity()
+    conn: Optional[sqlite3.Connection] = getattr(_local, 'conn', None)
+    if conn is not None and _local.ident == ident:
+        return conn
+    if conn is not None:
+        conn.close()
+    _local.conn = _open_readonly()
+    _local.ident = ident
+    return _local.conn
+
+
+def close_thread_conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+def keyword_search(query: str, limit: int = 30, filters: Optional[RagFilter] = None) -> List[str]:
     # Sanitize query for FTS5 - escape special characters
     # FTS5 special chars: " ( ) - / AND OR NOT
     sanitized = query.replace('"', '""')
     # Remove other special characters that might cause syntax errors
     for char in ['/', '(', ')', '-', ':', '*', '?', '[', ']', '{', '}']:
         sanitized = sanitized.replace(char, ' ')
-    
+
     # If query becomes empty after sanitization, return empty list
     if not sanitized.strip():
-        conn.close()
         return []
-    
+
+    where, params = filters.to_sql('d') if filters is not None else ('', [])
     try:
-        cur = conn.execute(
-            "SELECT doc_id FROM docs_fts WHERE docs_fts MATCH ? LIMIT ?",
-            (sanitized, limit)
-        )
+        if where:
+            # predicates run on the joined documents row, so LIMIT counts only matching chunks
+            cur = read_conn().execute(
+                "SELECT docs_fts.doc_id FROM docs_fts JOIN documents d ON d.doc_id = docs_fts.doc_id "
+                f"WHERE docs_fts MATCH ? AND {where} LIMIT ?",
+                [sanitized, *params, limit]
+            )
+        else:
+            cur = read_conn().execute(
+                "SELECT doc_id FROM docs_fts WHERE docs_fts MATCH ? LIMIT ?",
+                (sanitized, limit)
+            )
         ids = [row[0] for row in cur.fetchall()]
     except Exception:
         # If still fails, return empty list
         ids = []
-    
-    conn.close()
+
     return ids
 
 
 def fetch_docs(doc_ids: List[str]) -> List[Dict]:
     if not doc_ids:
         return []
-    conn = get_conn()
     placeholders = ','.join('?' for _ in doc_ids)
-    cur = conn.execute(
+    cur = read_conn().execute(
         f"SELECT doc_id, source, path, file_type, page_start, page_end, owner, sensitivity, updated_at, tokens_est, text FROM documents WHERE doc_id IN ({placeholders})",
         doc_ids
     )
     cols = [c[0] for c in cur.description]
-    base_rows = [dict(zip(cols, r)) for r in cur.fetchall()]
-    conn.close()
-    return base_rows
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
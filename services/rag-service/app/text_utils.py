@@ -0,0 +1,79 @@
+"""Text normalization shared with the ingestion service.
+
+normalize_text, tokenize_thai_words and segment_sentences_thai mirror
+ingestion-service/app/utils.py (the two services are separate `app` packages,
+so they cannot be imported directly).
+"""
+import math
+import re
+import unicodedata
+from typing import List
+
+_SENT_SPLIT = re.compile(r"(?<=[\.!?…\u0E2F\u0E5B\u0E46])\s+")
+
+try:
+    from pythainlp.util import normalize as th_normalize
+    from pythainlp.tokenize import word_tokenize, sent_tokenize
+    _HAS_THAI = True
+except Exception:
+    _HAS_THAI = False
+    def th_normalize(x: str) -> str: return x
+    def word_tokenize(x: str, **kwargs) -> List[str]: return x.split()
+    def sent_tokenize(x: str, **kwargs) -> List[str]: return [x]
+
+
+# Simple token counter heuristic (~4 chars/token Thai)
+CHAR_PER_TOKEN = 4.0
+
+
+def est_tokens(text: str) -> int:
+    return max(1, int(math.ceil(len(text) / CHAR_PER_TOKEN)))
+
+
+def normalize_text(text: str, preserve_newlines: bool = True) -> str:
+    if text is None:
+        return ''
+    t = text.replace('\r\n', '\n').replace('\r', '\n')
+    t = unicodedata.normalize('NFC', t)
+    t = t.replace('\u00A0', ' ')
+    t = re.sub(r'[\u200B-\u200D\uFEFF]', '', t)
+    t = re.sub(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]', '', t)
+    if preserve_newlines:
+        lines = [re.sub(r'[ \t]+', ' ', ln).strip() for ln in t.split('\n')]
+        t = '\n'.join(lines)
+        t = re.sub(r'\n{3,}', '\n\n', t)
+    else:
+        t = re.sub(r'\s+', ' ', t).strip()
+    return t
+
+
+def normalize_query(question: str) -> str:
+    """Canonical form of a user question: NFC, single-line whitespace, Thai mark order."""
+    t = normalize_text(question, preserve_newlines=False)
+    if _HAS_THAI:
+        try: t = th_normalize(t)
+        except Exception: pass
+    return t
+
+
+def tokenize_thai_words(text: str) -> List[str]:
+    """Tokenize Thai text into words using PythaiNLP."""
+    if not text or not _HAS_THAI:
+        return text.split()
+    try:
+        return word_tokenize(text, engine='newmm', keep_whitespace=False)
+    except Exception:
+        return text.split()
+
+
+def segment_sentences_thai(text: str) -> List[str]:
+    """Segment Thai text into sentences using PythaiNLP."""
+    if not text:
+        return []
+    if not _HAS_THAI:
+        return [s.strip() for s in _SENT_SPLIT.split(text) if s.strip()]
+    try:
+        sents = sent_tokenize(text, engine='crfcut')
+        return [s.strip() for s in sents if s.strip()]
+    except Exception:
+        return [s.strip() for s in _SENT_SPLIT.split(text) if s.strip()]
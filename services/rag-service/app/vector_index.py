@@ -0,0 +1,385 @@
+"""Exact in-process vector search over an export of the Chroma collection.
+
+The export is a directory with
+  vectors.npy     float32 (n, dim), L2-normalized, opened with mmap_mode='r'
+  meta.json       ids / documents / metadatas, row-aligned with vectors.npy
+  ids.json        just the ids, for backends that keep text/metadata in SQLite
+  codes_int8.npy  int8 (n, dim) + scales_int8.npy float32 (n,): per-row symmetric quantization
+  codes_bin.npy   uint8 (n, dim/8): sign bits, packed
+  manifest.json   count, dim, and the ingestion index_version it was built from
+Top-k is one matrix product plus argpartition, so a few thousand chunks are
+searched in well under a millisecond without Chroma's HNSW/SQLite layers.
+When ingestion bumps the index version the export is redone on a background
+thread and swapped in once loaded; queries never wait on it.
+
+QuantizedIndex keeps only the int8 or binary codes and the ids resident,
+shortlists candidates with int8 dot products / Hamming distance, rescores the
+shortlist against the float rows of the memory-mapped vectors.npy, and reads
+text/metadata of the final top-k (and filter matches) from SQLite `documents`.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .result_cache import index_version, make_key
+from .filters import RagFilter
+from .sqlite_client import fetch_docs, read_conn
+
+# pause before retrying a background re-export that failed or could not run
+REFRESH_RETRY_S = 30.0
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def quantize_int8(vecs: np.ndarray):
+    """Per-row symmetric int8 codes; row i ~= codes[i] * scales[i]."""
+    vecs = np.asarray(vecs, dtype=np.float32)
+    scales = np.maximum(np.abs(vecs).max(axis=1, initial=0.0), 1e-12) / 127.0
+    codes = np.clip(np.rint(vecs / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def binarize(vecs: np.ndarray) -> np.ndarray:
+    return np.packbits(vecs > 0, axis=1)
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(x) if hasattr(np, 'bitwise_count') else _POPCOUNT[x]
+
+
+def export_collection(collection, out_dir: Path, page: int = 1000) -> Dict:
+    """Dump every embedding + document + metadata from a Chroma collection."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    version = index_version()
+    ids: List[str] = []
+    docs: List[str] = []
+    metas: List[Dict] = []
+    chunks = []
+    offset = 0
+    while True:
+        res = collection.get(include=['embeddings', 'documents', 'metadatas'], limit=page, offset=offset)
+        got = res.get('ids') or []
+        if not got:
+            break
+        ids.extend(got)
+        docs.extend(res.get('documents') or [''] * len(got))
+        metas.extend(m or {} for m in (res.get('metadatas') or [{}] * len(got)))
+        chunks.append(np.asarray(res['embeddings'], dtype=np.float32))
+        offset += len(got)
+    vecs = np.vstack(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+    if len(vecs):
+        vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+
+    # write to temp names, then swap, so a reader never sees a half-written export
+    tmp_vec = out_dir / 'vectors.tmp.npy'
+    np.save(tmp_vec, vecs)
+    codes, scales = quantize_int8(vecs)
+    np.save(out_dir / 'codes_int8.tmp.npy', codes)
+    np.save(out_dir / 'scales_int8.tmp.npy', scales)
+    np.save(out_dir / 'codes_bin.tmp.npy', binarize(vecs))
+    tmp_meta = out_dir / 'meta.json.tmp'
+    tmp_meta.write_text(json.dumps({'ids': ids, 'documents': docs, 'metadatas': metas}, ensure_ascii=False),
+                        encoding='utf-8')
+    tmp_ids = out_dir / 'ids.json.tmp'
+    tmp_ids.write_text(json.dumps(ids, ensure_ascii=False), encoding='utf-8')
+    manifest = {'count': len(ids), 'dim': int(vecs.shape[1]) if len(vecs) else 0,
+                'index_version': version, 'exported_at': time.time()}
+    tmp_man = out_dir / 'manifest.json.tmp'
+    tmp_man.write_text(json.dumps(manifest), encoding='utf-8')
+    os.replace(tmp_vec, out_dir / 'vectors.npy')
+    for name in ('codes_int8', 'scales_int8', 'codes_bin'):
+        os.replace(out_dir / f'{name}.tmp.npy', out_dir / f'{name}.npy')
+    os.replace(tmp_meta, out_dir / 'meta.json')
+    os.replace(tmp_ids, out_dir / 'ids.json')
+    os.replace(tmp_man, out_dir / 'manifest.json')
+    print(f"[vector-index] exported {manifest['count']} vectors (dim={manifest['dim']}) to {out_dir}")
+    return manifest
+
+
+class NumpyIndex:
+    """Memory-mapped exact index; re-exported from Chroma when the index version moves.
+
+    The re-export runs on a background thread; queries keep searching the
+    loaded snapshot until the new one is swapped in.
+    """
+
+    kind = 'numpy'
+
+    def __init__(self, index_dir: Path, collection=None, auto_export: bool = True):
+        self.index_dir = Path(index_dir)
+        self.collection = collection
+        self.auto_export = auto_export
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._retry_at = 0.0
+        self.manifest: Optional[Dict] = None
+        # swapped as one object so searches never mix rows from two exports
+        self._state: Dict = {'ids': []}
+
+    def _read_manifest(self) -> Optional[Dict]:
+        path = self.index_dir / 'manifest.json'
+        return json.loads(path.read_text(encoding='utf-8')) if path.exists() else None
+
+    def _load_state(self) -> Dict:
+        meta = json.loads((self.index_dir / 'meta.json').read_text(encoding='utf-8'))
+        return {
+            'vectors': np.load(self.index_dir / 'vectors.npy', mmap_mode='r'),
+            'ids': meta['ids'],
+            'documents': meta['documents'],
+            'metadatas': meta['metadatas'],
+        }
+
+    def _swap(self, manifest: Dict):
+        if self.manifest is None or manifest.get('exported_at') != self.manifest.get('exported_at'):
+            self._state = self._load_state()
+            self.manifest = manifest
+
+    def _refresh(self):
+        """Re-export when the snapshot on disk is stale, then swap it in (caller holds _lock)."""
+        manifest = self._read_manifest()
+        stale = manifest is None or manifest.get('index_version') != index_version()
+        if stale and self.auto_export and self.collection is not None:
+            # `collection` may be a factory so the Chroma client opens only when needed
+            coll = self.collection() if callable(self.collection) else self.collection
+            manifest = export_collection(coll, self.index_dir)
+        if manifest is not None:
+            self._swap(manifest)
+
+    def _refresh_in_background(self):
+        try:
+            with self._lock:
+                self._refresh()
+        except Exception as e:
+            print(f"[vector-index] background refresh failed: {e}")
+        finally:
+            if (self.manifest or {}).get('index_version') != index_version():
+                # export failed or auto_export is off: don't start a thread per query
+                self._retry_at = time.monotonic() + REFRESH_RETRY_S
+            self._refreshing.release()
+
+    def ensure_current(self):
+        version = index_version()
+        if self.manifest is not None and self.manifest.get('index_version') == version:
+            return
+        if self.manifest is None:
+            # cold start: serve whatever export is on disk, export synchronously only if there is none
+            with self._lock:
+                if self.manifest is None:
+                    manifest = self._read_manifest()
+                    if manifest is not None:
+                        self._swap(manifest)
+                    else:
+                        self._refresh()
+            if self.manifest is None:
+                raise RuntimeError(f"no vector export in {self.index_dir}; run python -m app.vector_index")
+            if self.manifest.get('index_version') == version:
+                return
+        if time.monotonic() >= self._retry_at and self._refreshing.acquire(blocking=False):
+            threading.Thread(target=self._refresh_in_background, name='vector-index-refresh', daemon=True).start()
+
+    def _mask(self, st: Dict, filters: Optional[RagFilter]) -> Optional[np.ndarray]:
+        """Boolean row mask for a filter, memoized per export."""
+        if filters is None or filters.is_empty():
+            return None
+        key = make_key(filters.cache_key())
+        masks = st.setdefault('masks', {})
+        if key not in masks:
+            if len(masks) >= 64:
+                masks.pop(next(iter(masks)))
+            masks[key] = self._filter_rows(st, filters)
+        return masks[key]
+
+    def _filter_rows(self, st: Dict, filters: RagFilter) -> np.ndarray:
+        return np.fromiter((filters.matches(m or {}) for m in st['metadatas']),
+                           dtype=bool, count=len(st['metadatas']))
+
+    def _rank(self, st: Dict, q: np.ndarray, k: int,
+              mask: Optional[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if mask is None:
+            scores = q @ np.asarray(st['vectors']).T
+            return [_top(row, np.arange(len(row)), k) for row in scores]
+        rows = np.flatnonzero(mask)
+        scores = q @ np.asarray(st['vectors'][rows]).T
+        return [_top(row, rows, k) for row in scores]
+
+    def search_batch(self, qvecs: Sequence[Sequence[float]], top_k: int,
+                     filters: Optional[RagFilter] = None) -> List[List[dict]]:
+        self.ensure_current()
+        st = self._state
+        mask = self._mask(st, filters)
+        n = len(st['ids']) if mask is None else int(mask.sum())
+        if not n:
+            return [[] for _ in qvecs]
+        q = np.asarray(qvecs, dtype=np.float32)
+        q /= np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        return self._hits(st, self._rank(st, q, min(top_k, n), mask))
+
+    def _hits(self, st: Dict, ranked: List[Tuple[np.ndarray, np.ndarray]]) -> List[List[dict]]:
+        return [[self._hit(st, int(i), float(sc)) for i, sc in zip(idx, scores)] for idx, scores in ranked]
+
+    def vectors_for(self, doc_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        self.ensure_current()
+        st = self._state
+        if 'row_of' not in st:
+            st['row_of'] = {d: i for i, d in enumerate(st['ids'])}
+        rows = {d: st['row_of'][d] for d in doc_ids if d in st['row_of']}
+        return {d: np.asarray(st['vectors'][i]) for d, i in rows.items()}
+
+    @staticmethod
+    def _hit(st: Dict, i: int, score: float) -> dict:
+        return {
+            'doc_id': st['ids'][i],
+            'text': st['documents'][i],
+            **(st['metadatas'][i] or {}),
+            # squared L2 between unit vectors, the same scale Chroma's default space reports
+            'distance': max(0.0, 2.0 - 2.0 * score),
+        }
+
+    def resident_bytes(self) -> int:
+        """Bytes the search keeps hot; for the float backend that is the whole matrix."""
+        v = self._state.get('vectors')
+        return int(v.nbytes) if v is not None else 0
+
+    def stats(self) -> Dict:
+        n = len(self._state['ids'])
+        resident = self.resident_bytes()
+        return {
+            'backend': self.kind,
+            'count': n,
+            'dim': (self.manifest or {}).get('dim'),
+            'index_version': (self.manifest or {}).get('index_version'),
+            'resident_bytes': resident,
+            'bytes_per_vector': round(resident / n, 1) if n else 0,
+        }
+
+
+def _top(scores: np.ndarray, idx: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k of (idx, scores), sorted descending."""
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+        idx, scores = idx[part], scores[part]
+    order = np.argsort(-scores)
+    return idx[order], scores[order]
+
+
+class QuantizedIndex(NumpyIndex):
+    """int8 or 1-bit codes in RAM for the shortlist, float rows from the mmap for rescoring."""
+
+    def __init__(self, index_dir: Path, collection=None, auto_export: bool = True,
+                 mode: str = 'int8', rescore: int = 100, block: int = 2048):
+        super().__init__(index_dir, collection, auto_export)
+        if mode not in ('int8', 'binary'):
+            raise ValueError(f"unknown quantization mode {mode!r}; expected 'int8' or 'binary'")
+        self.kind = mode
+        self.rescore = rescore
+        self.block = block
+
+    def _load_state(self) -> Dict:
+        ids_path = self.index_dir / 'ids.json'
+        if ids_path.exists():
+            ids = json.loads(ids_path.read_text(encoding='utf-8'))
+        else:  # export from before ids.json existed
+            ids = json.loads((self.index_dir / 'meta.json').read_text(encoding='utf-8'))['ids']
+        st = {
+            'vectors': np.load(self.index_dir / 'vectors.npy', mmap_mode='r'),
+            'ids': ids,
+            'ids_bytes': sys.getsizeof(ids) + sum(sys.getsizeof(i) for i in ids),
+        }
+        if self.kind == 'int8':
+            st['codes'] = np.load(self.index_dir / 'codes_int8.npy')
+            st['scales'] = np.load(self.index_dir / 'scales_int8.npy')
+        else:
+            st['codes'] = np.load(self.index_dir / 'codes_bin.npy')
+        return st
+
+    def _filter_rows(self, st: Dict, filters: RagFilter) -> np.ndarray:
+        where, params = filters.to_sql('d')
+        allowed = {r[0] for r in read_conn().execute(f"SELECT d.doc_id FROM documents d WHERE {where}", params)}
+        return np.fromiter((d in allowed for d in st['ids']), dtype=bool, count=len(st['ids']))
+
+    def _hits(self, st: Dict, ranked: List[Tuple[np.ndarray, np.ndarray]]) -> List[List[dict]]:
+        """Text/metadata for the top-k only; ids no longer in SQLite (snapshot older than a rebuild) are skipped."""
+        ids = st['ids']
+        rows = {r['doc_id']: r for r in fetch_docs(list({ids[int(i)] for idx, _ in ranked for i in idx}))}
+        out = []
+        for idx, scores in ranked:
+            hits = []
+            for i, sc in zip(idx, scores):
+                row = rows.get(ids[int(i)])
+                if row is not None:
+                    hits.append({**{k: v for k, v in row.items() if v is not None},
+                                 'distance': max(0.0, 2.0 - 2.0 * float(sc))})
+            out.append(hits)
+        return out
+
+    def _coarse(self, st: Dict, q: np.ndarray) -> np.ndarray:
+        """Approximate scores (b, n); higher is better."""
+        codes = st['codes']
+        if self.kind == 'binary':
+            qb = binarize(q)
+            return np.stack([-_popcount(codes ^ row).sum(axis=1, dtype=np.int32) for row in qb]).astype(np.float32)
+        qc, qs = quantize_int8(q)
+        qc = qc.astype(np.float32).T
+        out = np.empty((len(q), len(codes)), dtype=np.float32)
+        # int8 x int8 sums stay below 2**24 for dim <= 1040, so float32 BLAS is exact
+        # and much faster than numpy's integer matmul; blocks keep the upcast small
+        for start in range(0, len(codes), self.block):
+            blk = codes[start:start + self.block].astype(np.float32) @ qc
+            out[:, start:start + self.block] = (blk * st['scales'][start:start + self.block, None]).T
+        return out * qs[:, None]
+
+    def _rank(self, st: Dict, q: np.ndarray, k: int,
+              mask: Optional[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        coarse = self._coarse(st, q)
+        if mask is not None:
+            coarse[:, ~mask] = -np.inf
+        n = coarse.shape[1] if mask is None else int(mask.sum())
+        c = min(n, max(k, self.rescore))
+        out = []
+        for row, qv in zip(coarse, q):
+            if c < coarse.shape[1]:
+                cand = np.argpartition(-row, c - 1)[:c]
+            else:
+                cand = np.arange(coarse.shape[1])
+            cand = np.sort(cand)  # sequential reads from the mmap
+            exact = np.asarray(st['vectors'][cand]) @ qv
+            out.append(_top(exact, cand, k))
+        return out
+
+    def resident_bytes(self) -> int:
+        """Codes + scales + ids, plus memoized filter masks and the id->row map once built."""
+        st = self._state
+        if 'codes' not in st:
+            return 0
+        total = st['codes'].nbytes + (st['scales'].nbytes if 'scales' in st else 0) + st['ids_bytes']
+        total += sum(m.nbytes for m in st.get('masks', {}).values())
+        if 'row_of' in st:
+            total += sys.getsizeof(st['row_of'])
+        return int(total)
+
+
+def make_index(backend: str, index_dir: Path, collection=None, rescore: int = 100) -> Optional[NumpyIndex]:
+    """VECTOR_BACKEND -> index object; None means query Chroma directly."""
+    if backend == 'numpy':
+        return NumpyIndex(index_dir, collection)
+    if backend in ('int8', 'binary'):
+        return QuantizedIndex(index_dir, collection, mode=backend, rescore=rescore)
+    return None
+
+
+if __name__ == '__main__':
+    import argparse
+    from .config import VECTOR_INDEX_DIR
+    from .chroma_client import collection
+
+    parser = argparse.ArgumentParser(description='Export the Chroma collection for VECTOR_BACKEND=numpy|int8|binary')
+    parser.add_argument('--out', default=str(VECTOR_INDEX_DIR))
+    args = parser.parse_args()
+    export_collection(collection(), Path(args.out))
@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Callable, Dict
+
+from .chroma_client import collection, load_embedder, embedder_ready, embed_query, vector_index
+from .sqlite_client import read_conn
+from .rag_logic import rag_query
+from .reranker import reranker
+from .llm import llm_engine
+from .config import WARMUP_ENABLE, WARMUP_QUESTION, RERANK_ENABLE, LLM_ENABLE
+
+
+class Warmup:
+    """Background model loading and warm-up queries, reported per component.
+
+    Two threads start at app startup: one opens the stores, loads the
+    embedder and runs a retrieval (plus rerank) for WARMUP_QUESTION; the other
+    loads the LLM and generates a couple of tokens. The service counts as ready
+    once every component is 'ready' or 'disabled'; a 'failed' one keeps it out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self.components: Dict[str, Dict] = {
+            'stores': {'status': 'pending'},
+            'embedder': {'status': 'pending'},
+            'retrieval': {'status': 'pending'},
+            'reranker': {'status': 'pending' if RERANK_ENABLE else 'disabled'},
+            'llm': {'status': 'pending' if LLM_ENABLE else 'disabled'},
+        }
+
+    def _step(self, name: str, fn: Callable[[], None]) -> bool:
+        with self._lock:
+            self.components[name] = {'status': 'loading'}
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f"[warmup] {name} failed: {e}")
+            with self._lock:
+                self.components[name] = {'status': 'failed', 'error': str(e)}
+            return False
+        ms = round((time.perf_counter() - t0) * 1000.0, 1)
+        print(f"[warmup] {name} ready in {ms} ms")
+        with self._lock:
+            self.components[name] = {'status': 'ready', 'ms': ms}
+        return True
+
+    def _stores(self):
+        collection()
+        read_conn().execute("SELECT 1 FROM documents LIMIT 1").fetchall()
+        if vector_index is not None:
+            vector_index.ensure_current()
+
+    def _embedder(self):
+        load_embedder()
+        if not embedder_ready():
+            raise RuntimeError('embedding model not loaded (hash fallback in use)')
+        embed_query(WARMUP_QUESTION)
+
+    def _retrieval_chain(self):
+        stores = self._step('stores', self._stores)
+        embedder = self._step('embedder', self._embedder)
+        if RERANK_ENABLE:
+            self._step('reranker', reranker.warm)
+        if stores and embedder:
+            self._step('retrieval', lambda: rag_query(WARMUP_QUESTION))
+        else:
+            with self._lock:
+                self.components['retrieval'] = {'status': 'failed', 'error': 'stores or embedder unavailable'}
+
+    def start(self):
+        self._started = time.time()
+        if not WARMUP_ENABLE:
+            with self._lock:
+                for c in self.components.values():
+                    if c['status'] == 'pending':
+                        c['status'] = 'skipped'
+            return
+        threading.Thread(target=self._retrieval_chain, name='warmup-retrieval', daemon=True).start()
+        if LLM_ENABLE:
+            threading.Thread(target=self._step, args=('llm', llm_engine.warmup), name='warmup-llm',
+                             daemon=True).start()
+
+    def report(self) -> Dict:
+        with self._lock:
+            return {
+                'ready': all(c['status'] in ('ready', 'disabled', 'skipped') for c in self.components.values()),
+                'uptime_s': round(time.time() - self._started, 1),
+                'components': {k: dict(v) for k, v in self.components.items()},
+            }
+
+
+warmup = Warmup()
@@ -0,0 +1,73 @@
+"""
+Benchmark: query embedding throughput with and without the micro-batcher.
+
+N client threads each embed distinct questions (no cache) either directly,
+one encode call per query, or through EmbeddingBatcher. Prints throughput and
+per-query latency for both modes plus the batcher's batch-size stats.
+
+Usage: python bench_embed_batcher.py --threads 16 --queries 20 --window-ms 5 --max-batch 32
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from app.config import EMBEDDING_MODEL, EMBED_BATCH  # noqa: E402
+from app.embed_batcher import EmbeddingBatcher  # noqa: E402
+
+BASE = ["ค่าเทอมเท่าไหร่", "ปฏิทินการศึกษา", "เกณฑ์การสำเร็จการศึกษา", "วิธีการถอนรายวิชา"]
+
+
+def run(mode: str, embed_one, threads: int, per_thread: int):
+    lat = []
+    lock = threading.Lock()
+
+    def client(t: int):
+        for i in range(per_thread):
+            q = f"{BASE[(t + i) % len(BASE)]} {t}-{i}"
+            t0 = time.perf_counter()
+            embed_one(q)
+            with lock:
+                lat.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(client, range(threads)))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    print(f"  {mode:<8} {len(lat) / wall:8.1f} q/s   p50={statistics.median(lat):7.1f} ms  "
+          f"p95={lat[max(0, int(len(lat) * 0.95) - 1)]:7.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--threads', type=int, default=16)
+    ap.add_argument('--queries', type=int, default=20, help='queries per thread')
+    ap.add_argument('--window-ms', type=float, default=5.0)
+    ap.add_argument('--max-batch', type=int, default=32)
+    ap.add_argument('--model', default=EMBEDDING_MODEL)
+    args = ap.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model)
+    model_lock = threading.Lock()
+
+    def encode(texts):
+        # one forward pass at a time, as in the service
+        with model_lock:
+            return model.encode(texts, batch_size=EMBED_BATCH, normalize_embeddings=True).tolist()
+
+    encode(["warmup"])
+    print(f"{args.threads} threads x {args.queries} queries, model={args.model}")
+    run('direct', lambda q: encode([q])[0], args.threads, args.queries)
+    batcher = EmbeddingBatcher(encode, args.window_ms, args.max_batch)
+    run('batched', batcher.embed, args.threads, args.queries)
+    print(batcher.stats())
+
+
+if __name__ == '__main__':
+    main()
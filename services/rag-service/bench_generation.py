@@ -0,0 +1,66 @@
+"""
+Benchmark: in-process generation throughput vs. concurrency with the batch scheduler.
+
+For each concurrency level, that many client threads each generate answers
+for distinct prompts through TransformersEngine (LLM_BATCH_ENABLE=1). Prints
+wall-clock tokens/s and p50 latency per level plus the scheduler's occupancy;
+with batching, tokens/s should grow with concurrency instead of staying flat.
+
+Usage: LLM_ENABLE=1 LLM_MODEL=<small model> python bench_generation.py --levels 1,2,4,8 --prompts 2
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+os.environ.setdefault('LLM_ENABLE', '1')
+sys.path.insert(0, str(Path(__file__).parent))
+from app.config import LLM_MODEL, LLM_MAX_TOKENS  # noqa: E402
+from app.llm import TransformersEngine  # noqa: E402
+
+BASE = ["ค่าเทอมเท่าไหร่", "ปฏิทินการศึกษา", "เกณฑ์การสำเร็จการศึกษา", "วิธีการถอนรายวิชา"]
+
+
+def run(engine: TransformersEngine, threads: int, per_thread: int):
+    before = engine.scheduler.stats()['generated_tokens']
+    lat = []
+
+    def client(t: int):
+        for i in range(per_thread):
+            t0 = time.perf_counter()
+            engine.generate(f"คำถาม: {BASE[(t + i) % len(BASE)]} ({t}-{i})\nคำตอบ:")
+            lat.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(client, range(threads)))
+    wall = time.perf_counter() - t0
+    tokens = engine.scheduler.stats()['generated_tokens'] - before
+    print(f"  concurrency={threads:<3} {tokens / wall:8.1f} tok/s   p50={statistics.median(lat):8.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--levels', default='1,2,4,8')
+    ap.add_argument('--prompts', type=int, default=2, help='prompts per thread')
+    ap.add_argument('--model', default=LLM_MODEL)
+    args = ap.parse_args()
+
+    engine = TransformersEngine(args.model)
+    if engine.scheduler is None:
+        sys.exit('set LLM_BATCH_ENABLE=1')
+    engine.load()
+    if not engine.ready:
+        sys.exit(f"model not loaded: {engine._load_error}")
+    engine.generate("warmup")
+    print(f"model={args.model} max_new_tokens={LLM_MAX_TOKENS} max_batch={engine.scheduler.max_batch}")
+    for level in (int(x) for x in args.levels.split(',')):
+        run(engine, level, args.prompts)
+    print(engine.scheduler.stats())
+
+
+if __name__ == '__main__':
+    main()
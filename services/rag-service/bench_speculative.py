@@ -0,0 +1,80 @@
+"""
+Benchmark: plain decoding vs. speculative (assisted) decoding on a fixed prompt set.
+
+Each prompt is generated once without and once with the draft model, using
+the same sampling settings as the service. Prints tokens/s for both modes,
+the speed-up and the draft acceptance rate (accepted / drafted tokens).
+Tiny same-tokenizer pairs run fine on a laptop CPU.
+
+Usage: python bench_speculative.py --model HuggingFaceTB/SmolLM2-360M-Instruct \\
+           --draft HuggingFaceTB/SmolLM2-135M-Instruct --lookahead 5 --max-new-tokens 128
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+sys.path.insert(0, str(Path(__file__).parent))
+from app.prompts import build_prompt  # noqa: E402
+from app.speculative import _CallCounter  # noqa: E402
+
+PROMPTS = [
+    ("ค่าธรรมเนียมการศึกษาต่อภาคเรียนเท่าไร", "[1] ค่าธรรมเนียมการศึกษาแบบเหมาจ่าย ภาคเรียนละ 20,000 บาท"),
+    ("ถอนรายวิชาได้ถึงเมื่อไร", "[1] นักศึกษาถอนรายวิชาได้ภายในสัปดาห์ที่ 12 ของภาคการศึกษา"),
+    ("What is the minimum GPA to graduate?", "[1] Students must earn a cumulative GPA of at least 2.00 to graduate."),
+    ("เปิดภาคเรียนที่ 1 วันไหน", "[1] ปฏิทินการศึกษา ภาคเรียนที่ 1 เปิดภาค 16 มิถุนายน"),
+]
+
+
+def run(model, tok, prompts, max_new_tokens: int, seed: int, **extra):
+    tokens, seconds = 0, 0.0
+    for question, ctx in prompts:
+        inputs = tok(build_prompt(question, ctx, {1: 'bench.pdf:1'}), return_tensors='pt').to(model.device)
+        torch.manual_seed(seed)
+        t0 = time.perf_counter()
+        with torch.no_grad():
+            out = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=True, temperature=0.4,
+                                 top_p=0.9, repetition_penalty=1.1, **extra)
+        seconds += time.perf_counter() - t0
+        tokens += out.shape[-1] - inputs['input_ids'].shape[-1]
+    return tokens, seconds
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--model', default='HuggingFaceTB/SmolLM2-360M-Instruct')
+    ap.add_argument('--draft', default='HuggingFaceTB/SmolLM2-135M-Instruct')
+    ap.add_argument('--lookahead', type=int, default=5)
+    ap.add_argument('--max-new-tokens', type=int, default=128)
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+
+    tok = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32)
+    draft_tok = AutoTokenizer.from_pretrained(args.draft)
+    draft = AutoModelForCausalLM.from_pretrained(args.draft, torch_dtype=torch.float32)
+    draft.generation_config.num_assistant_tokens = args.lookahead
+    draft.generation_config.num_assistant_tokens_schedule = 'constant'
+    extra = {'assistant_model': draft}
+    if len(draft_tok) != len(tok):
+        extra.update(tokenizer=tok, assistant_tokenizer=draft_tok)
+
+    run(model, tok, PROMPTS[:1], 8, args.seed)  # warmup
+    base_tokens, base_s = run(model, tok, PROMPTS, args.max_new_tokens, args.seed)
+    main_calls, draft_calls = _CallCounter(model), _CallCounter(draft)
+    spec_tokens, spec_s = run(model, tok, PROMPTS, args.max_new_tokens, args.seed, **extra)
+    accepted = max(0, spec_tokens - main_calls.n)
+
+    print(f"model={args.model} draft={args.draft} lookahead={args.lookahead} prompts={len(PROMPTS)}")
+    print(f"  baseline     {base_tokens / base_s:8.2f} tok/s  ({base_tokens} tokens)")
+    print(f"  speculative  {spec_tokens / spec_s:8.2f} tok/s  ({spec_tokens} tokens)")
+    print(f"  speed-up     {(spec_tokens / spec_s) / (base_tokens / base_s):8.2f}x")
+    print(f"  acceptance   {accepted / draft_calls.n if draft_calls.n else 0.0:8.2%}  "
+          f"({accepted} of {draft_calls.n} drafted)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Microbenchmark: per-query SQLite overhead of the keyword leg (keyword_search + fetch_docs).
+
+  before - a fresh sqlite3.connect per call, no pragmas (old get_conn path)
+  after  - thread-local read-only connection with pragmas and statement cache
+
+Uses the real ingestion.db by default; --synthetic builds a throwaway DB so the
+script runs without ingested data.
+
+Usage: python bench_sqlite.py --iters 2000 [--synthetic 5000]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+QUESTIONS = ["เกณฑ์การสำเร็จการศึกษา", "ค่าธรรมเนียมการศึกษา", "วิธีการถอนรายวิชา", "ตารางสอบ"]
+
+
+def build_synthetic(n_docs: int) -> Path:
+    data_dir = Path(tempfile.mkdtemp(prefix='bench_sqlite_'))
+    db = data_dir / 'db' / 'ingestion.db'
+    db.parent.mkdir(parents=True)
+    conn = sqlite3.connect(str(db))
+    conn.executescript("""
+        CREATE TABLE documents (doc_id TEXT PRIMARY KEY, source TEXT, path TEXT, file_type TEXT,
+            page_start INT, page_end INT, owner TEXT, sensitivity TEXT, updated_at TEXT,
+            tokens_est INT, text TEXT);
+        CREATE VIRTUAL TABLE docs_fts USING fts5(doc_id UNINDEXED, text);
+    """)
+    rows = []
+    for i in range(n_docs):
+        text = f"{QUESTIONS[i % len(QUESTIONS)]} เอกสาร {i} " + "ข้อความตัวอย่าง " * 40
+        rows.append((f'doc-{i}', 'bench.pdf', 'bench.pdf', 'pdf', i, i, None, None, None, 200, text))
+    conn.executemany("INSERT INTO documents VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+    conn.executemany("INSERT INTO docs_fts(doc_id, text) VALUES (?,?)", [(r[0], r[-1]) for r in rows])
+    conn.commit()
+    conn.close()
+    return data_dir
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return xs[max(0, int(len(xs) * q) - 1)]
+
+
+def run(name: str, fn, iters: int):
+    times = []
+    for i in range(iters):
+        t0 = time.perf_counter()
+        fn(QUESTIONS[i % len(QUESTIONS)])
+        times.append((time.perf_counter() - t0) * 1e6)
+    print(f"  {name:<7} p50={statistics.median(times):9.1f} us  p95={_pct(times, 0.95):9.1f} us  "
+          f"mean={statistics.fmean(times):9.1f} us")
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--iters', type=int, default=2000)
+    ap.add_argument('--synthetic', type=int, metavar='N_DOCS', help='benchmark against a generated DB')
+    args = ap.parse_args()
+
+    if args.synthetic:
+        os.environ['DATA_DIR'] = str(build_synthetic(args.synthetic))
+    sys.path.insert(0, str(Path(__file__).parent))
+    from app import sqlite_client as sc
+    print(f"DB: {sc.SQLITE_PATH}")
+
+    def legacy(question):
+        # the pre-pool behaviour: two fresh connections per query
+        conn = sc.get_conn()
+        ids = [r[0] for r in conn.execute(
+            "SELECT doc_id FROM docs_fts WHERE docs_fts MATCH ? LIMIT ?", (question, 30)).fetchall()]
+        conn.close()
+        if ids:
+            conn = sc.get_conn()
+            placeholders = ','.join('?' for _ in ids)
+            conn.execute(f"SELECT doc_id, source, path, file_type, page_start, page_end, owner, sensitivity, "
+                         f"updated_at, tokens_est, text FROM documents WHERE doc_id IN ({placeholders})",
+                         ids).fetchall()
+            conn.close()
+
+    def pooled(question):
+        sc.fetch_docs(sc.keyword_search(question, limit=30))
+
+    # warm the page cache once so both runs read from memory
+    legacy(QUESTIONS[0])
+    pooled(QUESTIONS[0])
+    before = run('before', legacy, args.iters)
+    after = run('after', pooled, args.iters)
+    print(f"  per-query overhead saved: {before - after:.1f} us (x{before / max(after, 1e-9):.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark vector backends on the live collection: Chroma (HNSW), numpy (exact)
+and the int8 / binary quantized indexes (shortlist + float rescoring).
+
+Queries are the stored vectors of randomly sampled chunks plus a little noise,
+so no embedder is needed. Exact brute force is the ground truth for recall@k.
+
+Usage: python bench_vectors.py --queries 200 --k 12 [--batch 32] [--rescore 100]
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from app.chroma_client import collection, _chroma_search  # noqa: E402
+from app.vector_index import NumpyIndex, QuantizedIndex, export_collection  # noqa: E402
+
+
+def _lat(fn, queries):
+    times, results = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        results.append(fn([q])[0])
+        times.append((time.perf_counter() - t0) * 1000.0)
+    times.sort()
+    return results, statistics.median(times), times[max(0, int(len(times) * 0.95) - 1)]
+
+
+def recall(results, truth, k):
+    hits = [len({r['doc_id'] for r in res[:k]} & set(t[:k])) / max(1, min(k, len(t)))
+            for res, t in zip(results, truth)]
+    return statistics.fmean(hits)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--queries', type=int, default=200)
+    ap.add_argument('--k', type=int, default=12)
+    ap.add_argument('--batch', type=int, default=32, help='batch size for the batched-search timing')
+    ap.add_argument('--noise', type=float, default=0.05)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--rescore', type=int, default=100, help='shortlist size rescored with float vectors')
+    args = ap.parse_args()
+
+    out_dir = Path(tempfile.mkdtemp(prefix='bench_vectors_'))
+    manifest = export_collection(collection(), out_dir)
+    if not manifest['count']:
+        print('Collection is empty; ingest something first.')
+        return
+    index = NumpyIndex(out_dir, auto_export=False)
+    index.ensure_current()
+    vecs = np.asarray(index._state['vectors'])
+    ids = index._state['ids']
+
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(vecs), size=args.queries, replace=True)
+    queries = vecs[picks] + rng.normal(0, args.noise, size=(args.queries, vecs.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [[ids[i] for i in np.argsort(-(vecs @ q))[:args.k]] for q in queries]
+    qlist = queries.tolist()
+
+    print(f"{manifest['count']} vectors, dim={manifest['dim']}, {args.queries} queries, k={args.k}")
+    quantized = [QuantizedIndex(out_dir, auto_export=False, mode=m, rescore=args.rescore) for m in ('int8', 'binary')]
+    print(f"{'backend':<8} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9} {'resident MB':>12} {'B/vector':>9}")
+    res, p50, p95 = _lat(lambda q: _chroma_search(q, args.k), qlist)
+    print(f"{'chroma':<8} {p50:8.3f} {p95:8.3f} {recall(res, truth, args.k):9.4f} {'-':>12} {'-':>9}")
+    for idx in [index] + quantized:
+        res, p50, p95 = _lat(lambda q: idx.search_batch(q, args.k), qlist)
+        st = idx.stats()
+        print(f"{st['backend']:<8} {p50:8.3f} {p95:8.3f} {recall(res, truth, args.k):9.4f} "
+              f"{st['resident_bytes'] / 2**20:12.2f} {st['bytes_per_vector']:9.0f}")
+
+    t0 = time.perf_counter()
+    for i in range(0, len(qlist), args.batch):
+        index.search_batch(qlist[i:i + args.batch], args.k)
+    per_q = (time.perf_counter() - t0) * 1000.0 / len(qlist)
+    print(f"numpy batched (batch={args.batch}): {per_q:.3f} ms/query")
+
+
+if __name__ == '__main__':
+    main()
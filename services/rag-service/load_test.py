@@ -0,0 +1,88 @@
+"""
+Load test: /health and /rag/query latency while /rag/answer requests are generating.
+
+Runs two phases against a running server (python run_server.py):
+  1. baseline  - probes only
+  2. loaded    - probes while N concurrent /rag/answer calls keep the generation executor busy
+With retrieval/generation off the event loop both phases should show similar latency.
+
+Usage: python load_test.py --url http://127.0.0.1:8001 --answers 4 --probes 50
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+QUESTIONS = [
+    "เกณฑ์การสำเร็จการศึกษา",
+    "ค่าธรรมเนียมการศึกษา",
+    "วิธีการถอนรายวิชา",
+]
+
+
+def _timed(session: requests.Session, method: str, url: str, **kw) -> float:
+    t0 = time.perf_counter()
+    r = session.request(method, url, timeout=600, **kw)
+    r.raise_for_status()
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def probe(base: str, n: int):
+    s = requests.Session()
+    health, query = [], []
+    for i in range(n):
+        health.append(_timed(s, 'GET', f"{base}/health"))
+        query.append(_timed(s, 'POST', f"{base}/rag/query", json={'question': QUESTIONS[i % len(QUESTIONS)]}))
+    return health, query
+
+
+def _fmt(name: str, xs):
+    xs = sorted(xs)
+    p95 = xs[max(0, int(len(xs) * 0.95) - 1)]
+    print(f"  {name:<11} n={len(xs):<4} p50={statistics.median(xs):8.1f} ms  p95={p95:8.1f} ms  max={xs[-1]:8.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--url', default='http://127.0.0.1:8001')
+    ap.add_argument('--answers', type=int, default=4, help='concurrent /rag/answer requests in phase 2')
+    ap.add_argument('--probes', type=int, default=50, help='probe rounds per phase')
+    args = ap.parse_args()
+    base = args.url.rstrip('/')
+
+    print("Phase 1: baseline")
+    h, q = probe(base, args.probes)
+    _fmt('/health', h)
+    _fmt('/rag/query', q)
+
+    print(f"Phase 2: {args.answers} concurrent /rag/answer in flight")
+    stop = threading.Event()
+    answer_ms = []
+
+    def answer_loop(i: int):
+        s = requests.Session()
+        while not stop.is_set():
+            try:
+                answer_ms.append(_timed(s, 'POST', f"{base}/rag/answer", json={'question': QUESTIONS[i % len(QUESTIONS)]}))
+            except requests.HTTPError:
+                # 503 = generation queue full; back off briefly
+                time.sleep(0.2)
+
+    with ThreadPoolExecutor(max_workers=args.answers) as ex:
+        for i in range(args.answers):
+            ex.submit(answer_loop, i)
+        time.sleep(1.0)  # let generation start
+        h, q = probe(base, args.probes)
+        stop.set()
+    _fmt('/health', h)
+    _fmt('/rag/query', q)
+    if answer_ms:
+        _fmt('/rag/answer', answer_ms)
+    print(requests.get(f"{base}/metrics", timeout=10).json())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Minimal OpenAI-compatible server for exercising LLM_BACKEND=openai without a model.
+
+    python stub_llm_server.py --port 8080 --delay-ms 30
+    LLM_ENABLE=1 LLM_BACKEND=openai LLM_HTTP_URL=http://127.0.0.1:8080 python run_server.py
+
+POST /v1/chat/completions answers with a canned reply that quotes the start of
+the prompt, word by word when "stream": true (SSE, ending with data: [DONE]).
+--fail-first N returns 503 to the first N requests to exercise retries.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_state = {'fail_left': 0}
+_lock = threading.Lock()
+
+
+def _reply(prompt: str) -> str:
+    head = ' '.join(prompt.split()[:12])
+    return f"(stub) ได้รับคำถามแล้ว: {head} ... ตอบจากบริบท [1]"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like real servers
+    delay_s = 0.0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, code: int, obj: dict):
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/v1/models':
+            return self._json(200, {'data': [{'id': 'stub'}]})
+        self._json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        req = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            return self._json(404, {'error': 'not found'})
+        with _lock:
+            fail = _state['fail_left'] > 0
+            _state['fail_left'] -= int(fail)
+        if fail:
+            return self._json(503, {'error': 'stub warming up'})
+        prompt = ''.join(m.get('content') or '' for m in req.get('messages', []))
+        words = _reply(prompt).split(' ')[:int(req.get('max_tokens') or 512)]
+        if not req.get('stream'):
+            time.sleep(self.delay_s * len(words))
+            return self._json(200, {
+                'object': 'chat.completion',
+                'model': req.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ' '.join(words)},
+                             'finish_reason': 'stop'}],
+            })
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        try:
+            for i, w in enumerate(words):
+                time.sleep(self.delay_s)
+                chunk = {'choices': [{'index': 0, 'delta': {'content': w if i == 0 else ' ' + w}}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            print("[stub] client disconnected, generation stopped")
+        self.close_connection = True
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8080)
+    ap.add_argument('--delay-ms', type=float, default=20.0, help='per streamed word')
+    ap.add_argument('--fail-first', type=int, default=0)
+    args = ap.parse_args()
+    Handler.delay_s = args.delay_ms / 1000.0
+    _state['fail_left'] = args.fail_first
+    print(f"[stub] OpenAI-compatible stub on http://{args.host}:{args.port}")
+    ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Bounded executors (pytest test_executors.py, or run directly).
+
+A full executor must reject new work at once with ExecutorBusy, and the
+endpoints must turn that into HTTP 503 instead of queueing without bound.
+The endpoint test needs the service requirements (fastapi, chromadb, ...).
+"""
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.executors import BoundedExecutor, ExecutorBusy  # noqa: E402
+
+
+def check_third_submit_is_rejected():
+    gate = threading.Event()
+
+    async def scenario():
+        ex = BoundedExecutor('test', workers=1, queue_depth=1)
+        running = ex.submit(gate.wait, 5)
+        queued = ex.submit(lambda: 'queued')
+        with pytest.raises(ExecutorBusy):
+            ex.submit(lambda: 'rejected')
+        assert ex.stats()['rejected'] == 1
+        gate.set()
+        assert await running is True
+        assert await queued == 'queued'
+        # slots are released once work completes
+        assert await ex.run(lambda: 'again') == 'again'
+        assert ex.stats()['completed'] == 3
+        ex.shutdown()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        gate.set()
+
+
+def check_cancelled_queued_work_frees_its_slot():
+    gate = threading.Event()
+    ex = BoundedExecutor('test', workers=1, queue_depth=1)
+    try:
+        running = ex.submit_future(gate.wait, 5)
+        queued = ex.submit_future(lambda: 'never runs')
+        assert queued.cancel()
+        again = ex.submit_future(lambda: 'runs')
+        gate.set()
+        assert running.result(5) is True and again.result(5) == 'runs'
+        assert ex.stats()['cancelled'] == 1 and ex.stats()['rejected'] == 0
+    finally:
+        gate.set()
+        ex.shutdown()
+
+
+def test_third_submit_is_rejected():
+    check_third_submit_is_rejected()
+
+
+def test_cancelled_queued_work_frees_its_slot():
+    check_cancelled_queued_work_frees_its_slot()
+
+
+def test_endpoint_maps_busy_to_503(monkeypatch):
+    pytest.importorskip('fastapi')
+    pytest.importorskip('chromadb')
+    from fastapi.testclient import TestClient
+    from app import main
+
+    started, gate = threading.Event(), threading.Event()
+
+    def slow_query(question, filters=None):
+        started.set()
+        gate.wait(5)
+        return {'prompt': '', 'contexts': [], 'token_est': 0}
+
+    monkeypatch.setattr(main, 'retrieval_executor', BoundedExecutor('retrieval', workers=1, queue_depth=0))
+    monkeypatch.setattr(main, 'rag_query', slow_query)
+    client = TestClient(main.app)
+
+    first = {}
+    t = threading.Thread(target=lambda: first.update(r=client.post('/rag/query', json={'question': 'a'})))
+    t.start()
+    try:
+        assert started.wait(5)
+        busy = client.post('/rag/query', json={'question': 'b'})
+        assert busy.status_code == 503
+        assert 'full' in busy.json()['detail']
+    finally:
+        gate.set()
+        t.join(5)
+    assert first['r'].status_code == 200
+
+
+if __name__ == '__main__':
+    check_third_submit_is_rejected()
+    check_cancelled_queued_work_frees_its_slot()
+    print("bounded executor OK (run under pytest for the endpoint test)")
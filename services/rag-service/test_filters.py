@@ -0,0 +1,81 @@
+"""
+RagFilter consistency (pytest test_filters.py, or run directly).
+
+The same filter is evaluated three ways: to_sql() for the keyword leg and
+the quantized vector index, to_chroma_where() for Chroma, and matches() for
+the numpy index. All three must select the same chunks.
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.filters import RagFilter
+
+COLUMNS = ('doc_id', 'source', 'file_type', 'sensitivity', 'owner', 'page_start', 'updated_at')
+
+DOCS = [
+    ('d1', 'a.txt', 'pdf', 'internal', 'owner:hr', 1, 1000),
+    ('d2', 'a.txt', 'pdf', 'internal', 'owner:hr', 5, 2000),
+    ('d3', 'b.txt', 'xlsx', 'public', 'owner:it', 1, 3000),
+    ('d4', 'b.txt', 'xlsx', 'secret', None, 9, 4000),
+    ('d5', 'c.txt', 'pdf', None, 'owner:it', None, None),
+    ('d6', 'c.txt', 'csv', 'public', 'owner:hr', 12, 2500),
+]
+
+FILTERS = [
+    RagFilter(),
+    RagFilter(source=['a.txt']),
+    RagFilter(file_type=['pdf', 'csv']),
+    RagFilter(sensitivity=['internal', 'public']),
+    RagFilter(owner=['owner:it']),
+    RagFilter(page_min=2),
+    RagFilter(page_max=5),
+    RagFilter(page_min=1, page_max=9, file_type=['xlsx']),
+    RagFilter(updated_after=2000),
+    RagFilter(updated_before=2500),
+    RagFilter(updated_after=1000, updated_before=4000, sensitivity=['internal', 'secret']),
+    RagFilter(source=['nope.txt']),
+]
+
+
+def _meta(row):
+    # Chroma drops None metadata values, so a missing field is simply absent
+    return {k: v for k, v in zip(COLUMNS, row) if v is not None}
+
+
+def _chroma_eval(where, meta) -> bool:
+    """Chroma's semantics for the operators to_chroma_where emits."""
+    if where is None:
+        return True
+    if '$and' in where:
+        return all(_chroma_eval(w, meta) for w in where['$and'])
+    (field, cond), = where.items()
+    (op, v), = cond.items()
+    if field not in meta:
+        return False
+    x = meta[field]
+    return {'$in': lambda: x in v, '$gte': lambda: x >= v, '$lte': lambda: x <= v, '$lt': lambda: x < v}[op]()
+
+
+def _sql_ids(conn, f: RagFilter):
+    where, params = f.to_sql('d')
+    sql = "SELECT d.doc_id FROM documents d" + (f" WHERE {where}" if where else "")
+    return {r[0] for r in conn.execute(sql, params)}
+
+
+def test_filter_backends_agree():
+    conn = sqlite3.connect(':memory:')
+    conn.execute(f"CREATE TABLE documents ({', '.join(COLUMNS)})")
+    conn.executemany(f"INSERT INTO documents VALUES ({','.join('?' for _ in COLUMNS)})", DOCS)
+    for f in FILTERS:
+        by_matches = {row[0] for row in DOCS if f.matches(_meta(row))}
+        by_sql = _sql_ids(conn, f)
+        by_chroma = {row[0] for row in DOCS if _chroma_eval(f.to_chroma_where(), _meta(row))}
+        assert by_sql == by_matches == by_chroma, f"{f.cache_key()}: sql={by_sql} matches={by_matches} chroma={by_chroma}"
+
+
+if __name__ == '__main__':
+    test_filter_backends_agree()
+    print("filter backends agree")
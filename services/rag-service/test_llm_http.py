@@ -0,0 +1,145 @@
+"""
+HTTP LLM backend against stub_llm_server.py (pytest test_llm_http.py, or run directly).
+
+Starts the stub on an ephemeral port and checks plain and streamed
+generation, retry of 503s, how errors and timeouts surface (a notice instead
+of an exception, counted in stats) and that LLM_BACKEND selects the engine.
+"""
+import os
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+import stub_llm_server  # noqa: E402
+from app import llm  # noqa: E402
+from app.llm import TokenStream  # noqa: E402
+from app.llm_http import OpenAIHttpEngine  # noqa: E402
+
+PROMPT = 'ระเบียบการลงทะเบียนเรียน ภาคการศึกษาที่หนึ่ง มีขั้นตอนอย่างไร'
+
+
+@contextmanager
+def stub_server(delay_s: float = 0.0, fail_first: int = 0):
+    stub_llm_server.Handler.delay_s = delay_s
+    stub_llm_server._state['fail_left'] = fail_first
+    server = ThreadingHTTPServer(('127.0.0.1', 0), stub_llm_server.Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        stub_llm_server.Handler.delay_s = 0.0
+        stub_llm_server._state['fail_left'] = 0
+
+
+def _drain(stream: TokenStream) -> str:
+    parts = []
+    while True:
+        piece = stream.next(timeout=1.0)
+        if piece is None:
+            return ''.join(parts)
+        parts.append(piece)
+
+
+def check_generate():
+    with stub_server() as url:
+        engine = OpenAIHttpEngine(base_url=url, model='stub')
+        text = engine.generate(PROMPT)
+        assert text.startswith('(stub)') and 'ระเบียบการลงทะเบียนเรียน' in text
+        assert engine.ready and engine.stats()['requests'] == 1
+
+
+def check_stream():
+    with stub_server() as url:
+        engine = OpenAIHttpEngine(base_url=url, model='stub')
+        stream = TokenStream()
+        text = engine.generate(PROMPT, stream)
+        assert _drain(stream) == text
+        assert text.startswith('(stub)')
+
+
+def check_retries_503():
+    # LLM_HTTP_RETRIES (default 2) covers one failing attempt
+    with stub_server(fail_first=1) as url:
+        engine = OpenAIHttpEngine(base_url=url, model='stub')
+        assert engine.generate(PROMPT).startswith('(stub)')
+        assert engine.stats()['errors'] == 0
+
+
+def check_errors_become_notice():
+    with stub_server(fail_first=100) as url:
+        engine = OpenAIHttpEngine(base_url=url, model='stub')
+        stream = TokenStream()
+        text = engine.generate(PROMPT, stream)
+        assert text.startswith('(LLM unavailable:')
+        assert _drain(stream) == text
+        stats = engine.stats()
+        assert stats['errors'] == 1 and not stats['ready'] and stats['last_error']
+
+
+def check_timeout_becomes_notice():
+    with stub_server(delay_s=0.5) as url:
+        engine = OpenAIHttpEngine(base_url=url, model='stub')
+        engine.timeout = (1.0, 0.2)
+        assert engine.generate(PROMPT).startswith('(LLM unavailable:')
+        assert 'timed out' in engine.stats()['last_error'].lower()
+
+
+def check_backend_from_env():
+    def engine_class(backend: str) -> str:
+        env = {**os.environ, 'LLM_BACKEND': backend}
+        out = subprocess.run([sys.executable, '-c', 'from app.llm import llm_engine; print(type(llm_engine).__name__)'],
+                             cwd=SERVICE_DIR, env=env, capture_output=True, text=True, check=True)
+        return out.stdout.strip().splitlines()[-1]
+
+    assert engine_class('openai') == 'OpenAIHttpEngine'
+    assert engine_class('transformers') == 'TransformersEngine'
+
+
+def _enabled(patch):
+    patch(llm, 'LLM_ENABLE', True)
+
+
+def test_generate(monkeypatch):
+    _enabled(monkeypatch.setattr)
+    check_generate()
+
+
+def test_stream(monkeypatch):
+    _enabled(monkeypatch.setattr)
+    check_stream()
+
+
+def test_retries_503(monkeypatch):
+    _enabled(monkeypatch.setattr)
+    check_retries_503()
+
+
+def test_errors_become_notice(monkeypatch):
+    _enabled(monkeypatch.setattr)
+    check_errors_become_notice()
+
+
+def test_timeout_becomes_notice(monkeypatch):
+    _enabled(monkeypatch.setattr)
+    check_timeout_becomes_notice()
+
+
+def test_backend_from_env():
+    check_backend_from_env()
+
+
+if __name__ == '__main__':
+    llm.LLM_ENABLE = True
+    for check in (check_generate, check_stream, check_retries_503, check_errors_become_notice,
+                  check_timeout_becomes_notice, check_backend_from_env):
+        check()
+        print(f"OK  {check.__name__}")
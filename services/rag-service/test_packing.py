@@ -0,0 +1,65 @@
+"""
+Context packing (pytest test_packing.py, or run directly).
+
+select_contexts must keep filling the budget with blocks whose MMR value is
+negative (weakly relevant, partly redundant) and stop only when nothing else
+fits. Needs the service requirements (app.packing imports the Chroma client).
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+pytest.importorskip('chromadb')
+
+from app import packing  # noqa: E402
+
+VECTORS = {
+    'top': np.array([1.0, 0.0], dtype=np.float32),
+    # cosine 0.5 to `top`: redundant enough that its MMR at lambda=0.5 is negative
+    'weak': np.array([0.5, 0.866], dtype=np.float32),
+    'long': np.array([0.0, 1.0], dtype=np.float32),
+}
+
+
+def _chunk(doc_id: str, text: str, score: float):
+    return {'doc_id': doc_id, 'text': text, 'score_rrf': score, 'path': f'{doc_id}.pdf',
+            'source': f'{doc_id}.txt', 'page_start': 1, 'page_end': 1}
+
+
+def _select(budget: int):
+    chunks = [
+        _chunk('top', 'ระเบียบการลงทะเบียนเรียน ภาคการศึกษาที่หนึ่ง', 1.0),
+        _chunk('weak', 'กำหนดการสอบปลายภาค', 0.0),
+        _chunk('long', 'รายละเอียดค่าธรรมเนียม ' * 40, 0.5),
+    ]
+    blocks = packing.select_contexts(chunks, budget, mmr_lambda=0.5, dup_sim=0.9, min_tokens=1)
+    return [b['doc_ids'][0] for b in blocks]
+
+
+def _run(patch):
+    patch(packing, 'get_vectors', lambda ids: {d: VECTORS[d] for d in ids if d in VECTORS})
+    tokens = {c: packing.est_tokens(t) + packing._BLOCK_OVERHEAD for c, t in (
+        ('top', 'ระเบียบการลงทะเบียนเรียน ภาคการศึกษาที่หนึ่ง'), ('weak', 'กำหนดการสอบปลายภาค'))}
+
+    # room for the two short blocks only: the negative-MMR one still gets in
+    picked = _select(tokens['top'] + tokens['weak'])
+    assert picked == ['top', 'weak']
+
+    # a large budget takes everything; order is by relevance
+    assert _select(10_000) == ['top', 'long', 'weak']
+
+    # nothing but the first block fits
+    assert _select(tokens['top']) == ['top']
+
+
+def test_negative_mmr_blocks_fill_the_budget(monkeypatch):
+    _run(monkeypatch.setattr)
+
+
+if __name__ == '__main__':
+    _run(lambda obj, name, value: setattr(obj, name, value))
+    print("packing OK")
@@ -0,0 +1,60 @@
+"""
+Result cache versioning (pytest test_result_cache.py, or run directly).
+
+An index bump must invalidate cached results, and a request that started
+on the previous index version must neither replace nor trim away entries
+written for the newer one.
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.result_cache import MemoryResultCache, SqliteResultCache
+
+OLD, NEW = '1700000000000000000', '1700000000500000000'
+
+
+def _caches(tmp: Path):
+    return [MemoryResultCache(1000, 60.0), SqliteResultCache(tmp / 'result_cache.db', 1000, 60.0)]
+
+
+def _check_bump_invalidates(cache):
+    cache.put('q', OLD, {'answer': 'old'})
+    assert cache.get('q', OLD) == {'answer': 'old'}
+    assert cache.get('q', NEW) is None
+    cache.put('q', NEW, {'answer': 'new'})
+    assert cache.get('q', NEW) == {'answer': 'new'}
+
+
+def _check_old_writer_keeps_newer_rows(cache):
+    cache.put('q', NEW, {'answer': 'new'})
+    cache.put('q', OLD, {'answer': 'old'})  # lagging writer, same key
+    assert cache.get('q', OLD) is None  # the old-version reader misses ...
+    assert cache.get('q', NEW) == {'answer': 'new'}  # ... without dropping the newer entry
+    for i in range(70):
+        cache.put(f'n{i}', NEW, {'i': i})
+    for i in range(70):  # enough old-version puts to run the sqlite trim
+        cache.put(f'o{i}', OLD, {'i': i})
+    assert all(cache.get(f'n{i}', NEW) == {'i': i} for i in range(70))
+
+
+def test_bump_invalidates(tmp_path):
+    for cache in _caches(tmp_path):
+        _check_bump_invalidates(cache)
+
+
+def test_old_version_writer_keeps_newer_rows(tmp_path):
+    for cache in _caches(tmp_path):
+        _check_old_writer_keeps_newer_rows(cache)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as d:
+        for check in (_check_bump_invalidates, _check_old_writer_keeps_newer_rows):
+            sub = Path(d) / check.__name__
+            sub.mkdir()
+            for cache in _caches(sub):
+                check(cache)
+    print("result cache versioning OK")